@@ -0,0 +1,136 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+
+from app.config import ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_WAIT, STAGE_WAIT_BUDGETS
+from app.pipeline import STAGES, RUN_TIME_SMOOTHING
+
+# Admission priorities: a caller who hasn't heard a reply yet goes first
+FIRST_TURN = 0
+LATER_TURN = 1
+
+
+class Overloaded(Exception):
+    """A turn was shed instead of queued; the message says which limit it hit."""
+
+
+class AdmissionController:
+    """
+    Caps how many turns the pipeline works on at once. Turns over the cap
+    wait in a priority queue (first turns of a call ahead of later ones, then
+    in arrival order) for at most max_wait seconds.
+
+    A turn is shed right away when the wait to be admitted, estimated from
+    recent turn times, exceeds max_wait, or when a stage's estimated queue
+    wait exceeds its budget; queueing it would only slow every call down.
+    """
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_wait: float = ADMISSION_MAX_WAIT,
+                 stage_budgets: dict = STAGE_WAIT_BUDGETS, stages: list = STAGES):
+        self.max_in_flight = max_in_flight
+        self.max_wait = max_wait
+        self.stage_budgets = stage_budgets
+        self.stages = stages
+        self.in_flight = 0
+        self.waiting = 0
+        self._waiting = []  # Heap of (priority, arrival, future); cancelled futures are skipped
+        self._arrivals = itertools.count()
+        self.recent_turn_seconds = None
+        self.admitted = 0
+        self.shed = {}  # Limit hit -> turns shed
+
+    def _queued_ahead(self, priority: int) -> int:
+        return sum(1 for entry_priority, _, future in self._waiting
+                   if entry_priority <= priority and not future.done())
+
+    def estimated_wait(self, priority: int = FIRST_TURN) -> float:
+        """Seconds a new turn of this priority would wait to be admitted."""
+        if not self.max_in_flight or (self.in_flight < self.max_in_flight and not self.waiting):
+            return 0.0
+        return (self._queued_ahead(priority) + 1) * (self.recent_turn_seconds or 0.0) / self.max_in_flight
+
+    def _shed(self, limit: str, message: str):
+        self.shed[limit] = self.shed.get(limit, 0) + 1
+        raise Overloaded(message)
+
+    def _check(self, priority: int):
+        wait = self.estimated_wait(priority)
+        if wait > self.max_wait:
+            self._shed("admission", f"estimated admission wait {wait:.1f}s over {self.max_wait:.1f}s")
+        for stage in self.stages:
+            budget = self.stage_budgets.get(stage.name)
+            wait = stage.estimated_wait()
+            if budget is not None and wait > budget:
+                self._shed(stage.name, f"estimated {stage.name} wait {wait:.1f}s over {budget:.1f}s")
+
+    async def _acquire(self, priority: int):
+        if not self.max_in_flight or (self.in_flight < self.max_in_flight and not self.waiting):
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._arrivals), future))
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            self._abandon(future)
+            raise
+        if not future.done():
+            self._abandon(future)
+            self._shed("admission", f"not admitted within {self.max_wait:.1f}s")
+        # Otherwise a finishing turn handed its slot over
+
+    def _abandon(self, future: asyncio.Future):
+        if future.done():
+            self._release()  # A slot was handed over just now; pass it on
+        else:
+            future.cancel()
+            self.waiting -= 1
+
+    def _release(self):
+        # Hands the slot straight to the best waiting turn, if any
+        while self._waiting:
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                future.set_result(True)
+                self.waiting -= 1
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def turn(self, priority: int = FIRST_TURN):
+        """
+        Holds an admission slot for the duration of the block. Raises
+        Overloaded if the turn is shed.
+        """
+        self._check(priority)
+        await self._acquire(priority)
+        self.admitted += 1
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release()
+            seconds = time.perf_counter() - started_at
+            if self.recent_turn_seconds is None:
+                self.recent_turn_seconds = seconds
+            else:
+                self.recent_turn_seconds += RUN_TIME_SMOOTHING * (seconds - self.recent_turn_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "estimated_wait_s": round(self.estimated_wait(), 3),
+            "recent_turn_s": round(self.recent_turn_seconds or 0.0, 3),
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+        }
+
+
+admission = AdmissionController()
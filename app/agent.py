@@ -1,108 +1,295 @@
-import httpx
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
+import re
+import time
 import os
 
-from app.config import CHROMA_DB_PATH
+from loguru import logger
 
-# Ollama API configuration
-OLLAMA_BASE_URL = "http://localhost:11434"
-OLLAMA_MODEL = "travel-ai-fast:latest"
+from app.config import CHROMA_DB_PATH, EMBEDDING_MATRIX_DIR, RETRIEVER_BACKEND, RETRIEVER_MMAP, SESSION_CONTEXT_TOKENS
+from app.components import register
+from app.customers import customer_store, trip_details
+from app.embeddings import get_embedding_service
+from app.memory_retriever import NumpyRetriever
+from app.pipeline import retrieval_stage, llm_stage
+from app.metrics import record
+from app.llm_backends import LLMSession, create_llm_backend
+from app.semantic_cache import response_cache
+from app.sessions import (
+    llm_sessions, get_history, add_turn, estimate_tokens, get_trip_context, set_trip_context, sessions_nearly_full,
+)
 
-# Load the embeddings model
-try:
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-except Exception as e:
-    print(f"Error loading embeddings model for RAG: {e}")
-    embeddings = None
 
-# Load the Chroma vector store
-try:
-    vectorstore = Chroma(persist_directory=CHROMA_DB_PATH, embedding_function=embeddings)
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 2})
-except Exception as e:
-    print(f"Error loading Chroma vector store: {e}")
-    vectorstore = None
-    retriever = None
+def load_retriever():
+    """
+    Loads the configured retriever: Chroma, or the in-memory NumPy matrix for
+    small knowledge bases.
+    """
+    if RETRIEVER_BACKEND == "memory":
+        return NumpyRetriever.from_directory(EMBEDDING_MATRIX_DIR, embeddings_model.get(), k=2, mmap=RETRIEVER_MMAP)
+    from langchain_community.vectorstores import Chroma
+    vectorstore = Chroma(persist_directory=CHROMA_DB_PATH, embedding_function=embeddings_model.get())
+    return vectorstore.as_retriever(search_kwargs={"k": 2})
+
 
 # System prompt for the feedback caller
 SYSTEM_PROMPT = """You are a friendly travel feedback caller from Paradise Holidays. 
 Use the trip details below to personalize your conversation. 
 Keep your response to 1-2 short sentences, suitable for a phone call."""
 
+# Reply length limit passed to the LLM backend
+MAX_REPLY_TOKENS = 64
+
+# Sentence boundary used to cut the streamed reply into TTS-sized chunks
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+# Generates the replies: Ollama, or llama.cpp in-process (LLM_BACKEND)
+llm_backend = create_llm_backend(SYSTEM_PROMPT)
+
+
+# Heavy components load on first use or in the concurrent startup warm-up, not at import
+embeddings_model = register("embeddings", get_embedding_service)
+rag_retriever = register("retriever", load_retriever)
+llm_model = register("llm", llm_backend.warm_up)
 
-def warm_up_ollama():
+
+def reload_index():
     """
-    Sends a dummy request to Ollama to pre-load the model into GPU memory.
-    This eliminates the cold start delay on the first real request.
+    Incrementally re-indexes the knowledge base and, if anything changed, swaps
+    in a fresh retriever so a running server picks up the new trip details.
+    Cached replies are dropped since they may quote the old details.
+    Returns the indexing summary, or None on error.
     """
-    try:
-        print(f"Warming up Ollama model '{OLLAMA_MODEL}'...")
-        with httpx.Client(timeout=120.0) as client:
-            response = client.post(
-                f"{OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": OLLAMA_MODEL,
-                    "prompt": "Hello",
-                    "stream": False,
-                    "options": {
-                        "num_predict": 1,  # Minimal tokens just to load the model
-                    }
-                }
-            )
-            response.raise_for_status()
-        print(f"Ollama model '{OLLAMA_MODEL}' is warm and ready on GPU!")
-    except Exception as e:
-        print(f"Warning: Failed to warm up Ollama model: {e}")
+    from app.vector_search import build_vector_index
+    summary = build_vector_index(embeddings_model.get())
+    if summary and (summary["added"] or summary["removed"]):
+        rag_retriever.set(load_retriever())
+        if response_cache is not None:
+            response_cache.clear()
+    return summary
+
+
+def retrieve_context(query: str) -> str:
+    """Retrieves the knowledge base passages for the query, one per line."""
+    docs = rag_retriever.get().invoke(query)
+    return "\n".join([doc.page_content for doc in docs])
+
+
+def prompt_prefix(context: str) -> str:
+    """
+    The start of a call's prompt, known before the customer speaks:
+    SYSTEM_PROMPT, whose KV cache the llama.cpp backend reuses, and the trip
+    details. continuation_prompt() completes it for the first turn.
+    """
+    return f"""{SYSTEM_PROMPT}
+
+Trip Details: {context}
+"""
+
+
+def build_prompt(query: str, history: list = None, context: str = None) -> str:
+    """
+    Builds the LLM prompt with the call's earlier turns if any. The trip
+    context is the one prefetched for the call or, without one, retrieved
+    for the query.
+    """
+    if context is None:
+        context = retrieve_context(query)
+    conversation = "".join(f"Customer: {customer}\nYou: {agent}\n" for customer, agent in history or [])
+    if conversation:
+        conversation = f"\nConversation so far:\n{conversation}"
+    return prompt_prefix(context) + conversation + continuation_prompt(query)
+
+
+def continuation_prompt(query: str) -> str:
+    """The next turn of a call whose saved LLM context already holds the earlier ones."""
+    return f"""
+Customer said: {query}
+Your response:"""
+
+
+def embed_query(query: str):
+    """
+    Embeds the utterance for the semantic response cache.
+    Returns None when the cache is disabled or embeddings are unavailable.
+    """
+    embeddings = embeddings_model.get()
+    if response_cache is None or embeddings is None:
+        return None
+    return embeddings.embed_query(query)
+
+
+def split_sentences(buffer: str) -> tuple[list[str], str]:
+    """
+    Splits off every complete sentence from the buffer.
+    Returns the finished sentences and the unfinished remainder.
+    """
+    parts = SENTENCE_END_RE.split(buffer)
+    sentences = [p.strip() for p in parts[:-1] if p.strip()]
+    return sentences, parts[-1]
 
 
 def get_rag_response(query: str) -> str:
     """
-    Generates a feedback-oriented response using RAG context + Ollama.
+    Generates a feedback-oriented response using RAG context + the LLM backend.
     """
-    if retriever is None:
+    if rag_retriever.get() is None:
         return "RAG system not initialized. Cannot generate context-aware reply."
     
     try:
-        # Retrieve relevant context from the vector store
-        docs = retriever.invoke(query)
-        context = "\n".join([doc.page_content for doc in docs])
-        
-        # Build the prompt with RAG context
-        prompt = f"""{SYSTEM_PROMPT}
+        # Near-duplicate utterances reuse a recent reply and skip retrieval + LLM
+        query_vector = embed_query(query)
+        if query_vector is not None:
+            cached = response_cache.lookup(query_vector)
+            if cached:
+                return cached["reply"]
+        start = time.perf_counter()
 
-Trip Details: {context}
+        # Retrieve relevant context and build the prompt
+        prompt = build_prompt(query)
 
-Customer said: {query}
-Your response:"""
+        reply = llm_backend.generate(prompt, max_tokens=MAX_REPLY_TOKENS).strip()
+        if query_vector is not None and reply:
+            response_cache.put(query_vector, query, reply, (time.perf_counter() - start) * 1000)
+        return reply
 
-        # Call Ollama API directly (fast, model already warm on GPU)
-        with httpx.Client(timeout=30.0) as client:
-            response = client.post(
-                f"{OLLAMA_BASE_URL}/api/generate",
-                json={
-                    "model": OLLAMA_MODEL,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "num_predict": 64,  # Keep response short for phone calls
-                        "temperature": 0.7,
-                    }
-                }
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result.get("response", "").strip()
-
-    except httpx.TimeoutException:
-        return "Error: Ollama request timed out."
+    except RuntimeError as e:
+        return str(e)
     except Exception as e:
         return f"Error generating RAG response: {e}"
 
 
+def _prefetch_context(phone: str):
+    """
+    The trip details and knowledge base passages for the caller, or None for
+    an unknown number. Blocking: loads the stores on first use.
+    """
+    customers = customer_store.get()
+    customer = customers.lookup(phone) if customers else None
+    if customer is None or rag_retriever.get() is None:
+        return None
+    details = trip_details(customer)
+    return f"{details}\n{retrieve_context(details)}"
+
+
+async def prefetch_call(call_sid: str, phone: str):
+    """
+    Runs while the intro plays: looks up the customer's trip by phone number,
+    retrieves the knowledge base passages about it and, if the LLM has a free
+    slot and the saved contexts have room, has it evaluate the personalized
+    prompt prefix, so the first turn only processes the utterance. Unknown
+    numbers are skipped; a failure only loses the head start.
+    """
+    start = time.perf_counter()
+    try:
+        context = await retrieval_stage.call_blocking(_prefetch_context, phone)
+        if context is None:
+            return
+        set_trip_context(call_sid, context)
+        # A prefill must not hold up callers who are already waiting for a reply,
+        # nor evict the saved contexts of calls already in conversation
+        if llm_stage.active < llm_stage.max_concurrency and not sessions_nearly_full():
+            session = LLMSession()
+            await llm_backend.prefill(prompt_prefix(context), session)
+            # If the first turn already finished, its session is the newer one
+            if session.state is not None and not get_history(call_sid):
+                llm_sessions.set(call_sid, session)
+        record("prefetch", time.perf_counter() - start)
+    except Exception:
+        logger.exception(f"Prefetch failed for call {call_sid}")
+
+
+async def stream_rag_response(query: str, call_sid: str = None):
+    """
+    Streams the RAG reply from the LLM backend and yields it one sentence at a
+    time, so TTS can start on the first sentence while the rest is still
+    generating. Raises RuntimeError on failure.
+
+    With a call_sid the reply is one turn of that call: later turns continue
+    the LLM context saved at the end of the previous reply, so only the new
+    utterance is evaluated, and fall back to a prompt with the compact
+    history when that context is missing or over SESSION_CONTEXT_TOKENS.
+    A first turn likewise continues the prompt prefix prefetched when the
+    call started.
+    """
+    if await rag_retriever.aget() is None:
+        raise RuntimeError("Error: RAG system not initialized.")
+
+    history = get_history(call_sid) if call_sid else []
+    session = llm_sessions.get(call_sid) if call_sid else None
+    context = get_trip_context(call_sid) if call_sid else None
+
+    # Cached replies know neither the conversation nor the customer's trip, so
+    # only first turns of calls without prefetched trip details use them.
+    # Embedding and retrieval are blocking, so they run on the retrieval stage pool
+    query_vector = None
+    if not history and context is None:
+        query_vector = await retrieval_stage.call_blocking(embed_query, query)
+    if query_vector is not None:
+        cached = response_cache.lookup(query_vector)
+        if cached:
+            if call_sid:
+                add_turn(call_sid, query, cached["reply"])
+            sentences, rest = split_sentences(cached["reply"])
+            for sentence in sentences + [rest.strip()]:
+                if sentence:
+                    yield sentence
+            return
+
+    start = time.perf_counter()
+    prompt = continuation_prompt(query)
+    if (session is None or session.state is None
+            or session.tokens + estimate_tokens(prompt) + MAX_REPLY_TOKENS > SESSION_CONTEXT_TOKENS):
+        session = LLMSession() if call_sid else None
+        if context is None:
+            prompt = await retrieval_stage.call_blocking(build_prompt, query, history)
+        else:
+            prompt = build_prompt(query, history, context)
+    buffer = ""
+    reply = ""
+    try:
+        async with llm_stage.slot():
+            requested_at = time.perf_counter()
+            pieces = llm_backend.stream(prompt, max_tokens=MAX_REPLY_TOKENS, session=session)
+            try:
+                async for piece in pieces:
+                    if not reply:
+                        record("llm_first_token", time.perf_counter() - requested_at)
+                    reply += piece
+                    buffer += piece
+                    sentences, buffer = split_sentences(buffer)
+                    for sentence in sentences:
+                        yield sentence
+            finally:
+                # Stops generation right away if the caller stopped early
+                await pieces.aclose()
+    finally:
+        # Recorded even if the caller stopped early; the session then holds
+        # no context and the next turn re-sends the history
+        if call_sid and reply.strip():
+            add_turn(call_sid, query, reply.strip())
+            llm_sessions.set(call_sid, session)
+
+    # Only complete replies are cached; this is skipped if the caller stopped early
+    if query_vector is not None and reply.strip():
+        response_cache.put(query_vector, query, reply.strip(), (time.perf_counter() - start) * 1000)
+    if buffer.strip():
+        yield buffer.strip()
+
+
+async def get_rag_response_async(query: str) -> str:
+    """
+    Non-blocking version of get_rag_response that collects the streamed reply.
+    """
+    try:
+        return " ".join([sentence async for sentence in stream_rag_response(query)])
+    except RuntimeError as e:
+        return str(e)
+
+
 if __name__ == "__main__":
-    warm_up_ollama()
-    if retriever:
+    import asyncio
+    asyncio.run(llm_model.warm_up())
+    if rag_retriever.get():
         print("RAG system loaded successfully. Testing feedback response...")
         test_query = "The hotel was really nice but the food could have been better."
         response = get_rag_response(test_query)
@@ -0,0 +1,188 @@
+import io
+import struct
+
+import numpy as np
+
+# faster-whisper expects mono float32 PCM at 16 kHz
+WHISPER_SAMPLE_RATE = 16000
+
+# The phone network carries 8 kHz G.711 μ-law; audio in any other format is
+# transcoded by Twilio before playback
+TELEPHONY_SAMPLE_RATE = 8000
+
+# Output formats for synthesized speech: name -> (file extension, media type)
+AUDIO_FORMATS = {
+    "mulaw": (".wav", "audio/wav"),    # 8 kHz μ-law WAV, plays without transcoding
+    "mp3_8k": (".mp3", "audio/mpeg"),  # 8 kHz 16 kbit/s MP3, smallest download
+    "mp3": (".mp3", "audio/mpeg"),     # Edge-TTS output as is (24 kHz 48 kbit/s)
+}
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_MULAW = 0x0007
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _mulaw_table() -> np.ndarray:
+    """G.711 μ-law byte -> linear sample, as float32 in [-1, 1]."""
+    codes = ~np.arange(256, dtype=np.uint8)
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = ((mantissa.astype(np.int32) << 3) + 0x84) << exponent
+    samples = np.where(codes & 0x80, 0x84 - magnitude, magnitude - 0x84)
+    return (samples / 32768.0).astype(np.float32)
+
+
+MULAW_TO_FLOAT = _mulaw_table()
+
+
+def encode_mulaw(samples: np.ndarray) -> np.ndarray:
+    """G.711 μ-law encodes int16 samples."""
+    samples = samples.astype(np.int32)
+    sign = np.where(samples < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(samples), 32635) + 0x84
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 7
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+def mulaw_wav(samples: np.ndarray, rate: int = TELEPHONY_SAMPLE_RATE) -> bytes:
+    """Wraps int16 samples as a mono 8-bit μ-law WAV file."""
+    data = encode_mulaw(samples).tobytes()
+    # μ-law (format 7) needs the extended fmt chunk with cbSize and a fact chunk
+    fmt = struct.pack("<HHIIHHH", WAVE_FORMAT_MULAW, 1, rate, rate, 1, 8, 0)
+    fact = struct.pack("<I", len(data))
+    body = (b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"fact" + struct.pack("<I", len(fact)) + fact
+            + b"data" + struct.pack("<I", len(data)) + data + b"\0" * (len(data) & 1))
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def _decode_to_telephony_pcm(data: bytes) -> np.ndarray:
+    """Decodes compressed audio into mono int16 samples at 8 kHz with PyAV."""
+    import av
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=TELEPHONY_SAMPLE_RATE)
+    chunks = []
+    with av.open(io.BytesIO(data)) as container:
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                chunks.append(resampled.to_ndarray().reshape(-1))
+        for resampled in resampler.resample(None):
+            chunks.append(resampled.to_ndarray().reshape(-1))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+
+
+def _encode_mp3(samples: np.ndarray, rate: int, bit_rate: int) -> bytes:
+    import av
+    output = io.BytesIO()
+    with av.open(output, "w", format="mp3") as container:
+        stream = container.add_stream("libmp3lame", rate=rate)
+        stream.bit_rate = bit_rate
+        stream.layout = "mono"
+        frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = rate
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return output.getvalue()
+
+
+def transcode_for_telephony(data: bytes, audio_format: str) -> bytes:
+    """
+    Converts synthesized MP3 into one of AUDIO_FORMATS, so the conversion is
+    paid once per phrase at synthesis time instead of on every playback.
+    """
+    if audio_format == "mp3":
+        return data
+    samples = _decode_to_telephony_pcm(data)
+    if audio_format == "mulaw":
+        return mulaw_wav(samples)
+    if audio_format == "mp3_8k":
+        return _encode_mp3(samples, TELEPHONY_SAMPLE_RATE, 16000)
+    raise ValueError(f"Unknown audio format: {audio_format}")
+
+
+def audio_duration(data: bytes) -> float:
+    """Playing time in seconds of a WAV file, or of any format PyAV reads."""
+    wav = _parse_wav(data)
+    if wav is not None:
+        _, channels, rate, bits, _, size = wav
+        return size / (rate * channels * max(1, bits // 8))
+    import av
+    with av.open(io.BytesIO(data)) as container:
+        if container.duration is not None:
+            return container.duration / av.time_base
+        return sum(frame.samples / frame.sample_rate for frame in container.decode(audio=0))
+
+
+def _parse_wav(data) -> tuple:
+    """
+    Finds the format and sample data of a RIFF/WAVE buffer without copying it.
+    Returns (format, channels, sample_rate, bits, data_offset, data_size),
+    or None if the buffer isn't a WAV file this module can read.
+    """
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset:offset + 4])
+        (size,) = struct.unpack_from("<I", data, offset + 4)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            audio_format, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", data, body)
+            if audio_format == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                (audio_format,) = struct.unpack_from("<H", data, body + 24)
+            fmt = (audio_format, channels, rate, bits)
+        elif chunk_id == b"data" and fmt is not None:
+            # Streamed recordings may carry a placeholder size; trust the buffer
+            return fmt + (body, min(size, len(data) - body))
+        offset = body + size + (size & 1)
+    return None
+
+
+def resample(audio: np.ndarray, rate: int, target_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """Linear resampling; plenty for 8 kHz telephone audio going to Whisper."""
+    if rate == target_rate or not len(audio):
+        return audio
+    if target_rate % rate == 0:
+        # Integer upsampling (8 kHz telephone audio -> 16 kHz): interleave the
+        # samples with evenly spaced points between neighbours
+        factor = target_rate // rate
+        out = np.empty((len(audio), factor), dtype=np.float32)
+        out[:, 0] = audio
+        step = np.empty_like(audio)
+        step[:-1] = np.diff(audio)
+        step[-1] = 0.0
+        for i in range(1, factor):
+            np.multiply(step, i / factor, out=out[:, i])
+            out[:, i] += audio
+        return out.reshape(-1)
+    positions = np.arange(int(len(audio) * target_rate / rate)) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def decode_audio_bytes(data) -> np.ndarray:
+    """
+    Decodes an in-memory recording (bytes, bytearray or memoryview) into mono
+    16 kHz float32 PCM for Whisper. 16-bit PCM and μ-law WAV, what Twilio
+    serves, are read straight out of the buffer with NumPy; anything else
+    (MP3, OGG, ...) is decoded in memory by faster-whisper's PyAV decoder.
+    """
+    wav = _parse_wav(data)
+    if wav is not None:
+        audio_format, channels, rate, bits, offset, size = wav
+        if audio_format == WAVE_FORMAT_PCM and bits == 16:
+            samples = np.frombuffer(data, dtype="<i2", count=size // 2, offset=offset)
+            audio = samples.astype(np.float32)
+            audio *= 1.0 / 32768
+        elif audio_format == WAVE_FORMAT_MULAW and bits == 8:
+            audio = MULAW_TO_FLOAT[np.frombuffer(data, dtype=np.uint8, count=size, offset=offset)]
+        else:
+            audio = None
+        if audio is not None:
+            if channels > 1:
+                audio = audio[:len(audio) - len(audio) % channels].reshape(-1, channels).mean(axis=1)
+            return resample(audio, rate)
+
+    from faster_whisper.audio import decode_audio
+    return decode_audio(io.BytesIO(data), sampling_rate=WHISPER_SAMPLE_RATE)
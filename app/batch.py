@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import bisect
+import glob
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from app.audio import WHISPER_SAMPLE_RATE, decode_audio_bytes
+from app.config import (
+    BATCH_WHISPER_MODEL, BATCH_STT_PROCESSES, BATCH_STT_THREADS, BATCH_STT_BATCH_SIZE, BATCH_LLM_BATCH_SIZE,
+)
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg")
+
+# Whisper's window; a clip passed to the batched pipeline must fit in it
+CLIP_SECONDS = 30.0
+
+# Silence between recordings laid end to end, so a segment's start time
+# always falls inside the recording it came from
+GAP_SECONDS = 1.0
+
+# Per-process Whisper pipeline, created by the pool initializer
+_pipeline = None
+
+
+def resolve_under(root: str, path: str) -> str:
+    """
+    Resolves path (relative paths against root, symlinks followed) and
+    returns it if it lies inside root; raises ValueError otherwise.
+    """
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Path is outside {root}: {path}")
+    return resolved
+
+
+def list_recordings(source: str, root: str = None) -> list:
+    """
+    Returns the recordings to process: every audio file in a directory, or
+    the paths listed in a manifest (one path per line, or JSONL with "path").
+    Relative manifest paths are resolved against the manifest's folder.
+    With a root, raises ValueError if any recording lies outside it.
+    """
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "**", "*"), recursive=True)
+                       if p.lower().endswith(AUDIO_EXTENSIONS))
+    else:
+        base_dir = os.path.dirname(os.path.abspath(source))
+        paths = []
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                path = json.loads(line)["path"] if line.startswith("{") else line
+                paths.append(path if os.path.isabs(path) else os.path.join(base_dir, path))
+    if root is not None:
+        for path in paths:
+            resolve_under(root, path)
+    return paths
+
+
+def load_checkpoint(output_path: str) -> set:
+    """
+    Paths already processed successfully according to the output JSONL; a
+    rerun skips them and retries the ones that failed.
+    """
+    done = set()
+    if os.path.exists(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Partial last line from an interrupted run
+                if "path" in record and "error" not in record:
+                    done.add(record["path"])
+    return done
+
+
+def _end_partial_line(output_path: str):
+    """Terminates a line cut off by a crash so appended records stay parseable."""
+    if os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+
+def _init_worker(model_size: str, cpu_threads: int):
+    global _pipeline
+    from faster_whisper import WhisperModel, BatchedInferencePipeline
+    model = WhisperModel(model_size, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+    _pipeline = BatchedInferencePipeline(model=model)
+
+
+def _speech_clips(audio: np.ndarray, offset: float) -> list:
+    """
+    The speech in one recording as clips of at most CLIP_SECONDS, in seconds
+    from `offset`: VAD speech spans, merged while they fit in one clip.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+    spans = get_speech_timestamps(audio, VadOptions(max_speech_duration_s=CLIP_SECONDS, min_silence_duration_ms=160))
+    clips = []
+    for span in spans:
+        start, end = offset + span["start"] / WHISPER_SAMPLE_RATE, offset + span["end"] / WHISPER_SAMPLE_RATE
+        if clips and end - clips[-1]["start"] <= CLIP_SECONDS:
+            clips[-1]["end"] = end
+        else:
+            clips.append({"start": start, "end": end})
+    return clips
+
+
+def transcribe_files(paths: list, batch_size: int) -> list:
+    """
+    Runs in a pool process: transcribes a group of recordings with batched
+    inference across all of them. The recordings are decoded and laid end to
+    end, and the speech clips of every recording go to the pipeline
+    together, so short recordings (one clip each) still fill whole batches.
+    Each segment is credited to the recording its start time falls in.
+    """
+    start = time.perf_counter()
+    records, audios, clips, starts = [], [], [], []
+    offset = 0.0
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                audio = decode_audio_bytes(f.read())
+        except Exception as e:
+            records.append({"path": path, "error": f"Error transcribing audio: {e}"})
+            continue
+        duration = len(audio) / WHISPER_SAMPLE_RATE
+        records.append({"path": path, "transcript": "", "audio_seconds": duration})
+        starts.append((offset, records[-1]))
+        clips.extend(_speech_clips(audio, offset))
+        audios += [audio, np.zeros(int(GAP_SECONDS * WHISPER_SAMPLE_RATE), dtype=np.float32)]
+        offset += duration + GAP_SECONDS
+
+    decoded = [record for _, record in starts]
+    try:
+        texts = [[] for _ in starts]
+        if clips:
+            offsets = [start_seconds for start_seconds, _ in starts]
+            # vad_filter off: the pipeline would otherwise find its own clips in the joined audio
+            segments, _ = _pipeline.transcribe(np.concatenate(audios), batch_size=batch_size,
+                                               clip_timestamps=clips, vad_filter=False)
+            for segment in segments:
+                texts[max(0, bisect.bisect_right(offsets, segment.start + GAP_SECONDS / 2) - 1)].append(segment.text)
+    except Exception as e:
+        for record in decoded:
+            del record["transcript"]
+            record["error"] = f"Error transcribing audio: {e}"
+        return records
+    # The group is decoded together, so each recording is charged an equal share of the time
+    seconds = (time.perf_counter() - start) / len(paths)
+    for record, text in zip(decoded, texts):
+        record["transcript"] = "".join(text).strip()
+        record["stt_seconds"] = seconds
+    return records
+
+
+async def _generate_replies(records: list):
+    """Sends one batch of transcripts to the LLM concurrently."""
+    from app.agent import get_rag_response_async
+
+    async def reply(record):
+        if "error" in record or not record["transcript"]:
+            return
+        start = time.perf_counter()
+        reply_text = await get_rag_response_async(record["transcript"])
+        if "Error" in reply_text:
+            record["error"] = reply_text  # Not checkpointed, so a rerun retries it
+        else:
+            record["reply"] = reply_text
+            record["llm_seconds"] = time.perf_counter() - start
+
+    await asyncio.gather(*[reply(record) for record in records])
+
+
+class BatchJob:
+    """
+    Transcribes a set of recordings on a process pool (one batched Whisper
+    pipeline per process, fed groups of BATCH_STT_BATCH_SIZE recordings),
+    generates replies in concurrent LLM batches and appends one JSON line per
+    recording to the output file. The output file is the checkpoint:
+    recordings that succeeded are skipped on a rerun, failed ones retried.
+    With a root, every recording must lie inside it. File writes and pool
+    shutdown run on threads, so a job started through the API never blocks
+    the server's event loop.
+    """
+
+    def __init__(self, source: str, output_path: str, processes: int = BATCH_STT_PROCESSES,
+                 generate_replies: bool = True, root: str = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.output_path = output_path
+        self.root = root
+        self.processes = processes
+        self.generate_replies = generate_replies
+        self.state = "pending"
+        self.total = 0
+        self.skipped = 0
+        self.completed = 0
+        self.failed = 0
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+    def _write(self, out, records: list):
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if "error" in record:
+                self.failed += 1
+            else:
+                self.completed += 1
+        out.flush()
+        os.fsync(out.fileno())
+
+    async def run(self):
+        self.state = "running"
+        self.started_at = time.time()
+        pool = None
+        try:
+            recordings = await asyncio.to_thread(list_recordings, self.source, self.root)
+            done = await asyncio.to_thread(load_checkpoint, self.output_path)
+            pending = [path for path in recordings if path not in done]
+            self.total = len(recordings)
+            self.skipped = len(recordings) - len(pending)
+            await asyncio.to_thread(_end_partial_line, self.output_path)
+
+            loop = asyncio.get_running_loop()
+            # Spawned rather than forked: a fork of the API server would inherit its threads' held locks
+            pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker, initargs=(BATCH_WHISPER_MODEL, BATCH_STT_THREADS))
+            groups = [pending[i:i + BATCH_STT_BATCH_SIZE] for i in range(0, len(pending), BATCH_STT_BATCH_SIZE)]
+            futures = [loop.run_in_executor(pool, transcribe_files, group, BATCH_STT_BATCH_SIZE) for group in groups]
+            with open(self.output_path, "a", encoding="utf-8") as out:
+                batch = []
+                for future in asyncio.as_completed(futures):
+                    batch.extend(await future)
+                    if len(batch) >= BATCH_LLM_BATCH_SIZE:
+                        await self._flush(out, batch)
+                        batch = []
+                if batch:
+                    await self._flush(out, batch)
+            self.state = "done"
+        except Exception as e:
+            self.state = "error"
+            self.error = str(e)
+        finally:
+            if pool is not None:
+                await asyncio.to_thread(pool.shutdown, cancel_futures=True)
+            self.finished_at = time.time()
+        return self.status()
+
+    async def _flush(self, out, batch: list):
+        if self.generate_replies:
+            await _generate_replies(batch)
+        await asyncio.to_thread(self._write, out, batch)
+
+    def status(self) -> dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            "id": self.id,
+            "state": self.state,
+            "source": self.source,
+            "output": self.output_path,
+            "total": self.total,
+            "skipped": self.skipped,
+            "completed": self.completed,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 1),
+            "recordings_per_minute": round((self.completed + self.failed) / elapsed * 60, 1) if elapsed else 0.0,
+            "error": self.error,
+        }
+
+
+# Jobs started through the API, by id
+batch_jobs = {}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe recordings and generate replies in bulk (resumable).")
+    parser.add_argument("source", help="Directory of recordings, or a manifest (.txt paths or .jsonl with 'path')")
+    parser.add_argument("output", help="Results JSONL; also the checkpoint for resuming")
+    parser.add_argument("--processes", type=int, default=BATCH_STT_PROCESSES)
+    parser.add_argument("--no-replies", action="store_true", help="Only transcribe")
+    args = parser.parse_args()
+
+    job = BatchJob(args.source, args.output, processes=args.processes, generate_replies=not args.no_replies)
+    print(json.dumps(asyncio.run(job.run()), indent=2))
@@ -0,0 +1,126 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import CALL_STATE_BACKEND, CALL_STATE_DB_PATH, CALL_STATE_MAX_ENTRIES, CALL_STATE_TTL
+
+
+class MemoryCallStore:
+    """
+    Per-process call state with a TTL and an entry cap (least recently written
+    entries go first). Only correct with a single uvicorn worker. With
+    max_bytes and a sizeof(value) function, the total size of the values is
+    capped the same way.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int = None, sizeof=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self.bytes = 0
+        self.evictions = 0
+        # key -> (expires_at, value, size), least recently written first
+        self._entries = OrderedDict()
+
+    def get(self, key: str):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            self._remove(key)
+            return None
+        return item[1]
+
+    def set(self, key: str, value):
+        if key in self._entries:
+            self._remove(key)
+        size = self._sizeof(value) if self._sizeof else 0
+        self._entries[key] = (time.monotonic() + self.ttl, value, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        self._purge_expired()
+
+    def delete(self, *keys: str):
+        for key in keys:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        self.bytes -= self._entries.pop(key)[2]
+
+    def _purge_expired(self):
+        # Entries are in write order and share one TTL, so expired ones are at the front
+        now = time.monotonic()
+        while self._entries:
+            key, (expires_at, _, _) = next(iter(self._entries.items()))
+            if expires_at >= now:
+                break
+            self._remove(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCallStore:
+    """
+    Call state shared by every uvicorn worker on the host, in a SQLite database
+    in WAL mode (readers don't block the writer). Values are JSON. Expired rows
+    are ignored on read and purged periodically.
+    """
+
+    PURGE_EVERY = 200
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS call_state (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM call_state WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO call_state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM call_state WHERE expires_at < ?", (time.time(),))
+
+    def delete(self, *keys: str):
+        with self._lock:
+            self._conn.executemany("DELETE FROM call_state WHERE key = ?", [(key,) for key in keys])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM call_state WHERE expires_at >= ?", (time.time(),)
+            ).fetchone()[0]
+
+
+def create_call_store():
+    """Returns the store selected by CALL_STATE_BACKEND ("memory" or "sqlite")."""
+    if CALL_STATE_BACKEND == "sqlite":
+        return SQLiteCallStore(CALL_STATE_DB_PATH, CALL_STATE_TTL)
+    return MemoryCallStore(CALL_STATE_TTL, CALL_STATE_MAX_ENTRIES)
+
+
+call_store = create_call_store()
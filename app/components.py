@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+from app.config import COMPONENT_RETRY_SECONDS, COMPONENT_RETRY_MAX_SECONDS
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class Component:
+    """
+    A heavy dependency (model, index, warm-up step) that is loaded on first use
+    instead of at import time. Sync loaders run once behind a lock, so callers
+    racing a background warm-up wait for it rather than loading twice; async
+    loaders (e.g. an Ollama warm-up request) are awaited by warm_up(). Async
+    code uses aget(), which loads on a thread instead of the event loop.
+    A failed load is retried with exponential backoff: warm_up() keeps
+    retrying until it succeeds, and get() retries once the backoff has passed.
+    Tracks state and load time for the /ready endpoint.
+    """
+
+    def __init__(self, name: str, loader):
+        self.name = name
+        self.loader = loader
+        self.state = NOT_LOADED
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self.failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def _start(self):
+        self.state = LOADING
+        return time.perf_counter()
+
+    def _finish(self, start: float, value=None, error: Exception = None):
+        self.load_seconds = round(time.perf_counter() - start, 3)
+        if error is None:
+            self.value = value
+            self.error = None
+            self.failures = 0
+            self.state = READY
+        else:
+            self.error = str(error)
+            self.failures += 1
+            backoff = min(COMPONENT_RETRY_MAX_SECONDS, COMPONENT_RETRY_SECONDS * 2 ** (self.failures - 1))
+            self._retry_at = time.monotonic() + backoff
+            self.state = FAILED
+            print(f"Error loading {self.name} (attempt {self.failures}, retrying in {backoff:g}s): {error}")
+
+    def _needs_load(self) -> bool:
+        if self.state == FAILED:
+            return time.monotonic() >= self._retry_at
+        return self.state != READY
+
+    def get(self):
+        """
+        Returns the loaded value, loading it now if needed (or retrying a failed
+        load whose backoff has passed); None if it is not loaded. Blocks while
+        another thread loads it, so async code should use aget().
+        """
+        if not self._needs_load() or asyncio.iscoroutinefunction(self.loader):
+            return self.value
+        with self._lock:
+            if self._needs_load():
+                start = self._start()
+                try:
+                    self._finish(start, value=self.loader())
+                except Exception as e:
+                    self._finish(start, error=e)
+        return self.value
+
+    async def aget(self):
+        """get() for code on the event loop: a load, or waiting for one in progress, happens on a thread."""
+        if not self._needs_load() or asyncio.iscoroutinefunction(self.loader):
+            return self.value
+        return await asyncio.to_thread(self.get)
+
+    def set(self, value):
+        """Replaces the loaded value, e.g. after a hot reload or with a stand-in."""
+        self.value = value
+        self.error = None
+        self.failures = 0
+        self.state = READY
+
+    async def warm_up(self):
+        """Loads the component, retrying with backoff until it is loaded."""
+        while self.state != READY:
+            if asyncio.iscoroutinefunction(self.loader):
+                if self.state == LOADING:
+                    return
+                start = self._start()
+                try:
+                    self._finish(start, value=await self.loader())
+                except Exception as e:
+                    self._finish(start, error=e)
+            else:
+                await asyncio.to_thread(self.get)
+            if self.state == FAILED:
+                await asyncio.sleep(max(0.0, self._retry_at - time.monotonic()))
+
+    def status(self) -> dict:
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error, "failures": self.failures}
+
+
+COMPONENTS = {}
+
+
+def register(name: str, loader) -> Component:
+    """Creates a lazily loaded component and lists it on /ready."""
+    component = Component(name, loader)
+    COMPONENTS[name] = component
+    return component
+
+
+async def warm_up_all():
+    """Loads every registered component concurrently."""
+    await asyncio.gather(*[component.warm_up() for component in COMPONENTS.values()])
+
+
+def readiness() -> dict:
+    return {
+        "ready": all(c.state == READY for c in COMPONENTS.values()),
+        "components": {name: c.status() for name, c in COMPONENTS.items()},
+    }
@@ -6,13 +6,36 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 KNOWLEDGE_BASE_PATH = os.path.join(BASE_DIR, "data", "knowledge_base.md")
 CHROMA_DB_PATH = os.path.join(BASE_DIR, "embeddings", "chroma_db")
+EMBEDDING_MATRIX_DIR = os.path.join(BASE_DIR, "embeddings", "matrix")
+INDEX_MANIFEST_PATH = os.path.join(BASE_DIR, "embeddings", "manifest.json")
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", 32))
+
+# Retrieval backend: "chroma", or "memory" for the in-process NumPy matrix
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "chroma")
+RETRIEVER_MMAP = os.getenv("RETRIEVER_MMAP", "false").lower() == "true"
 MODEL_DIR = os.path.join(BASE_DIR, "models")
+
+# Embeddings shared by retrieval, the semantic cache and the indexer:
+# "sentence_transformers" (PyTorch) or "onnx" (int8 ONNX Runtime export of
+# the same model, created with `python -m app.embeddings export`)
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence_transformers")
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", os.path.join(MODEL_DIR, "all-MiniLM-L6-v2-onnx-int8"))
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))  # 0 lets ONNX Runtime choose
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 2.0))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", 32))
+EMBEDDING_QUERY_CACHE = int(os.getenv("EMBEDDING_QUERY_CACHE", 1024))  # Recent query embeddings kept
 PHI2_MODEL_PATH = os.path.join(MODEL_DIR, "phi-2.Q4_K_M.gguf")
 LLAMA3B_MODEL_PATH = os.path.join(MODEL_DIR, "llama-3b.gguf")
 TRAVEL_AI_MODEL_PATH = os.path.join(MODEL_DIR, "my_model.gguf")
 
 AUDIO_UPLOAD_DIR = os.path.join(BASE_DIR, "audio_uploads")
 AUDIO_OUTPUT_DIR = os.path.join(BASE_DIR, "audio_output")
+TTS_CACHE_DIR = os.path.join(AUDIO_OUTPUT_DIR, "cache")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+# Format of synthesized speech: "mulaw" (8 kHz μ-law WAV, what the phone network
+# plays natively), "mp3_8k" (8 kHz 16 kbit/s MP3) or "mp3" (Edge-TTS output as is)
+TTS_AUDIO_FORMAT = os.getenv("TTS_AUDIO_FORMAT", "mulaw")
 
 # Twilio Credentials
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
@@ -20,7 +43,118 @@ TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 NGROK_URL = os.getenv("NGROK_URL", "https://your-ngrok-url.ngrok-free.app")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
 YOUR_PHONE_NUMBER = os.getenv("YOUR_PHONE_NUMBER")
+TWILIO_API_BASE = os.getenv("TWILIO_API_BASE", "https://api.twilio.com")
+
+# Speech-to-text engine. "auto" picks device, precision and model size from the hardware:
+# CUDA -> float16, CPU -> int8. Profiles: fast (greedy), balanced (beam 2), accurate (beam 5).
+STT_DEVICE = os.getenv("STT_DEVICE", "auto")
+STT_COMPUTE_TYPE = os.getenv("STT_COMPUTE_TYPE", "auto")
+STT_MODEL_SIZE = os.getenv("STT_MODEL_SIZE", "auto")
+STT_PROFILE = os.getenv("STT_PROFILE", "fast")
+STT_VAD = os.getenv("STT_VAD", "true").lower() == "true"
+
+# LLM backend: "ollama" (HTTP) or "llama_cpp" (in-process, concurrent calls
+# decoded together in shared batches)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "ollama")
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "travel-ai-fast:latest")
+LLAMA_MODEL_PATH = os.getenv("LLAMA_MODEL_PATH", os.path.join(MODEL_DIR, "phi-2.gguf"))
+LLAMA_GPU_LAYERS = int(os.getenv("LLAMA_GPU_LAYERS", -1))  # -1 offloads all layers to the GPU
+LLAMA_THREADS = int(os.getenv("LLAMA_THREADS", os.cpu_count() or 1))
+LLAMA_CTX = int(os.getenv("LLAMA_CTX", 4096))  # KV cache shared by all sequences
+LLAMA_MAX_SEQUENCES = int(os.getenv("LLAMA_MAX_SEQUENCES", 16))
+LLAMA_BATCH_TOKENS = int(os.getenv("LLAMA_BATCH_TOKENS", 512))
+
+# Retry backoff for a model or warm-up step that failed to load: doubles from
+# COMPONENT_RETRY_SECONDS after each failure, up to COMPONENT_RETRY_MAX_SECONDS
+COMPONENT_RETRY_SECONDS = float(os.getenv("COMPONENT_RETRY_SECONDS", 2.0))
+COMPONENT_RETRY_MAX_SECONDS = float(os.getenv("COMPONENT_RETRY_MAX_SECONDS", 60.0))
+
+# Pipeline stage limits (max calls in each stage at once)
+STT_WORKERS = int(os.getenv("STT_WORKERS", os.cpu_count() or 1))
+STT_CONCURRENCY = int(os.getenv("STT_CONCURRENCY", STT_WORKERS))
+RETRIEVAL_CONCURRENCY = int(os.getenv("RETRIEVAL_CONCURRENCY", 4))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", LLAMA_MAX_SEQUENCES if LLM_BACKEND == "llama_cpp" else 4))
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", 8))
+
+# Admission control: turns processed at once (0 for no cap), the longest a turn
+# may wait to be admitted, and the longest it may expect to queue at each
+# stage (empty for no budgets). A turn over any of these is shed: the caller
+# hears a fallback clip. The controller is per process: with N uvicorn workers
+# up to N x ADMISSION_MAX_IN_FLIGHT turns are in flight on the host.
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 4 * STT_CONCURRENCY))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", 4.0))
+STAGE_WAIT_BUDGETS = {
+    stage: float(seconds) for stage, seconds in
+    (item.split("=") for item in os.getenv("STAGE_WAIT_BUDGETS", "stt=5,retrieval=2,llm=5,tts=3").split(",") if item)
+}
+
+# Shared HTTP client pools (per upstream) and retry policy
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", LLM_CONCURRENCY))
+TWILIO_MAX_CONNECTIONS = int(os.getenv("TWILIO_MAX_CONNECTIONS", 10))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", 0.2))
+
+# Semantic response cache: replies reused for near-duplicate utterances
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", 512))  # 0 disables it
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", 3600))
+
+# Per-call state: "memory" (single worker) or "sqlite" (shared by all uvicorn workers)
+CALL_STATE_BACKEND = os.getenv("CALL_STATE_BACKEND", "memory")
+CALL_STATE_DB_PATH = os.path.join(BASE_DIR, "data", "call_state.db")
+CALL_STATE_TTL = float(os.getenv("CALL_STATE_TTL", 2 * 60 * 60))
+CALL_STATE_MAX_ENTRIES = int(os.getenv("CALL_STATE_MAX_ENTRIES", 10000))
+
+# Multi-turn calls: replies per call, the compact history re-sent when a call's
+# saved LLM context is missing or too long, and the limit on that context
+CALL_MAX_TURNS = int(os.getenv("CALL_MAX_TURNS", 4))
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", 256))
+SESSION_CONTEXT_TOKENS = int(os.getenv("SESSION_CONTEXT_TOKENS", 1024))
+SESSION_MAX_CALLS = int(os.getenv("SESSION_MAX_CALLS", 1000))  # Saved LLM contexts kept in memory
+# A llama.cpp context is a KV state blob of up to hundreds of MB, so saved
+# contexts are also capped by total size, least recently saved dropped first.
+# A call's context is freed when it ends, or once it hasn't had a turn for
+# SESSION_IDLE_SECONDS (a caller who hung up mid-reply sends no webhook).
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", 512 * 1024 * 1024))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", 10 * 60))
+
+# Customer records by phone number (CSV, or SQLite with a "customers" table;
+# columns phone, name, booking, hotel, trip). When the intro plays, the customer's
+# trip is looked up, retrieval runs and the prompt prefix is pre-evaluated.
+CUSTOMER_STORE_PATH = os.getenv("CUSTOMER_STORE_PATH", os.path.join(BASE_DIR, "data", "customers.csv"))
+CALL_PREFETCH_ENABLED = os.getenv("CALL_PREFETCH_ENABLED", "true").lower() == "true"
+
+# /twilio_result holds Twilio's request until reply audio is ready, up to this
+# many seconds (Twilio gives up on a webhook after 15)
+RESULT_LONG_POLL_SECONDS = float(os.getenv("RESULT_LONG_POLL_SECONDS", 5.0))
+
+# Offline batch transcription (python -m app.batch, POST /batch_jobs); CPU int8.
+# Each pool process transcribes BATCH_STT_BATCH_SIZE recordings at a time, their
+# speech clips batched together. Jobs started through the API may only read
+# and write files inside BATCH_DIR.
+BATCH_DIR = os.getenv("BATCH_DIR", os.path.join(BASE_DIR, "data", "batch"))
+BATCH_WHISPER_MODEL = os.getenv("BATCH_WHISPER_MODEL", "base")
+BATCH_STT_PROCESSES = int(os.getenv("BATCH_STT_PROCESSES", max(1, (os.cpu_count() or 1) // 2)))
+BATCH_STT_THREADS = int(os.getenv("BATCH_STT_THREADS", 2))
+BATCH_STT_BATCH_SIZE = int(os.getenv("BATCH_STT_BATCH_SIZE", 8))
+BATCH_LLM_BATCH_SIZE = int(os.getenv("BATCH_LLM_BATCH_SIZE", 8))
+
+# Per-call stage traces written to logs/traces/<CallSid>.jsonl (off by default)
+CALL_TRACE_ENABLED = os.getenv("CALL_TRACE_ENABLED", "false").lower() == "true"
+CALL_TRACE_DIR = os.path.join(BASE_DIR, "logs", "traces")
+
+# Call journal: one record per turn (transcript, reply, stage timings, outcome)
+# written in batches off the event loop to SQLite files in JOURNAL_DIR. The
+# current file is rolled over once it reaches JOURNAL_MAX_BYTES; query them
+# all with `python -m app.journal`.
+JOURNAL_ENABLED = os.getenv("JOURNAL_ENABLED", "true").lower() == "true"
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", os.path.join(BASE_DIR, "data", "journal"))
+JOURNAL_MAX_BYTES = int(os.getenv("JOURNAL_MAX_BYTES", 64 * 1024 * 1024))
+JOURNAL_BATCH_SIZE = int(os.getenv("JOURNAL_BATCH_SIZE", 200))
+JOURNAL_FLUSH_SECONDS = float(os.getenv("JOURNAL_FLUSH_SECONDS", 1.0))
+JOURNAL_MAX_QUEUE = int(os.getenv("JOURNAL_MAX_QUEUE", 10000))  # Records dropped beyond this backlog
 
 # Ensure directories exist
-for d in [AUDIO_UPLOAD_DIR, AUDIO_OUTPUT_DIR]:
+for d in [AUDIO_UPLOAD_DIR, AUDIO_OUTPUT_DIR, TTS_CACHE_DIR] + ([CALL_TRACE_DIR] if CALL_TRACE_ENABLED else []):
     os.makedirs(d, exist_ok=True)
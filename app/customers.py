@@ -0,0 +1,49 @@
+import os
+import re
+
+from app.components import register
+from app.config import CUSTOMER_STORE_PATH
+from app.dialer import load_customers
+
+
+def normalize_phone(phone: str) -> str:
+    """Strips spaces, dashes and brackets so "+91 98100-00001" matches Twilio's "+919810000001"."""
+    return re.sub(r"[^\d+]", "", phone or "")
+
+
+class CustomerStore:
+    """
+    Customer records indexed by phone number, read once from a CSV file or a
+    SQLite "customers" table (the same files campaigns dial from).
+    """
+
+    def __init__(self, customers: list):
+        self._by_phone = {normalize_phone(c["phone"]): c for c in customers}
+
+    @classmethod
+    def from_path(cls, path: str = CUSTOMER_STORE_PATH):
+        """Loads the store; a missing file gives an empty store, so calls just aren't personalized."""
+        if not os.path.exists(path):
+            print(f"No customer store at {path}; calls won't be personalized.")
+            return cls([])
+        return cls(load_customers(path))
+
+    def lookup(self, phone: str):
+        """Returns the customer's record, or None if the number is unknown."""
+        return self._by_phone.get(normalize_phone(phone))
+
+    def __len__(self) -> int:
+        return len(self._by_phone)
+
+
+def trip_details(customer: dict) -> str:
+    """The customer's trip record as a line of prompt text."""
+    parts = [f"Customer: {customer['name']}."] if customer.get("name") else []
+    if customer.get("booking"):
+        parts.append(f"Booking #{customer['booking']}:")
+    if customer.get("trip"):
+        parts.append(customer["trip"])
+    return " ".join(parts)
+
+
+customer_store = register("customers", CustomerStore.from_path)
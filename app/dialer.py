@@ -0,0 +1,197 @@
+import asyncio
+import csv
+import os
+import sqlite3
+import time
+
+import httpx
+
+from app.config import (
+    TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER, NGROK_URL, TWILIO_API_BASE,
+)
+
+# Twilio call statuses after which the call is over
+FINAL_STATUSES = {"completed", "busy", "no-answer", "failed", "canceled"}
+
+
+def load_customers(path: str, table: str = "customers") -> list:
+    """
+    Reads customers from a CSV file (needs a "phone" column) or from a
+    SQLite database table with a "phone" column. Returns a list of dicts.
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            return [row for row in csv.DictReader(f) if row.get("phone")]
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(f"SELECT * FROM {table} WHERE phone IS NOT NULL")]
+    finally:
+        conn.close()
+
+
+class CampaignLog:
+    """
+    Durable per-call record of a campaign in SQLite. Customers are imported
+    once; each dial stores the call SID before waiting on the outcome, so a
+    restarted campaign re-dials nobody: finished calls are skipped and calls
+    that were in progress are only polled until they end.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS calls (
+                phone TEXT PRIMARY KEY,
+                name TEXT,
+                call_sid TEXT,
+                status TEXT,
+                dial_ms REAL,
+                duration_s REAL,
+                error TEXT,
+                started_at REAL,
+                finished_at REAL
+            )"""
+        )
+
+    def import_customers(self, customers: list):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO calls (phone, name) VALUES (?, ?)",
+            [(c["phone"], c.get("name")) for c in customers],
+        )
+
+    def pending(self) -> list:
+        """Customers without a final outcome, as (phone, call_sid or None)."""
+        return self._conn.execute(
+            "SELECT phone, call_sid FROM calls WHERE finished_at IS NULL ORDER BY rowid"
+        ).fetchall()
+
+    def dialed(self, phone: str, call_sid: str, dial_ms: float):
+        self._conn.execute(
+            "UPDATE calls SET call_sid = ?, status = 'queued', dial_ms = ?, started_at = ? WHERE phone = ?",
+            (call_sid, dial_ms, time.time(), phone),
+        )
+
+    def finished(self, phone: str, status: str, duration_s: float = None, error: str = None):
+        self._conn.execute(
+            "UPDATE calls SET status = ?, duration_s = ?, error = ?, finished_at = ? WHERE phone = ?",
+            (status, duration_s, error, time.time(), phone),
+        )
+
+    def summary(self) -> dict:
+        rows = self._conn.execute(
+            "SELECT COALESCE(status, 'pending'), COUNT(*) FROM calls GROUP BY 1"
+        ).fetchall()
+        return dict(rows)
+
+    def dial_latencies(self) -> list:
+        return [row[0] for row in self._conn.execute("SELECT dial_ms FROM calls WHERE dial_ms IS NOT NULL")]
+
+
+class RateLimiter:
+    """Spaces out acquisitions to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CampaignDialer:
+    """
+    Dials a campaign through the Twilio REST API, at most `rate` new calls per
+    second and `max_in_flight` calls connected at once. Before each dial it
+    checks the server's /pipeline/stats and holds off while more than
+    `max_queue` turns are waiting in the pipeline stages.
+    """
+
+    def __init__(self, log: CampaignLog, rate: float = 1.0, max_in_flight: int = 5,
+                 max_queue: int = 10, poll_interval: float = 5.0,
+                 api_base: str = TWILIO_API_BASE, capacity_url: str = f"{NGROK_URL}/pipeline/stats"):
+        self.log = log
+        self.rate_limiter = RateLimiter(rate)
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.max_queue = max_queue
+        self.poll_interval = poll_interval
+        self.calls_url = f"{api_base}/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Calls"
+        self.capacity_url = capacity_url
+
+    async def _wait_for_capacity(self, stats_client: httpx.AsyncClient):
+        while self.capacity_url:
+            try:
+                stats = (await stats_client.get(self.capacity_url)).json()
+            except (httpx.HTTPError, ValueError):
+                return  # Server stats unavailable; rely on rate and in-flight limits
+            if sum(stage["queued"] for stage in stats.values()) <= self.max_queue:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def _dial(self, client: httpx.AsyncClient, phone: str) -> str:
+        start = time.perf_counter()
+        response = await client.post(
+            f"{self.calls_url}.json",
+            data={"To": phone, "From": TWILIO_PHONE_NUMBER, "Url": f"{NGROK_URL}/twilio_voice",
+                  "StatusCallback": f"{NGROK_URL}/twilio_status"},
+        )
+        response.raise_for_status()
+        call_sid = response.json()["sid"]
+        self.log.dialed(phone, call_sid, (time.perf_counter() - start) * 1000)
+        return call_sid
+
+    async def _wait_for_outcome(self, client: httpx.AsyncClient, phone: str, call_sid: str):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            response = await client.get(f"{self.calls_url}/{call_sid}.json")
+            response.raise_for_status()
+            call = response.json()
+            if call["status"] in FINAL_STATUSES:
+                duration = call.get("duration")
+                self.log.finished(phone, call["status"], float(duration) if duration else None)
+                return
+
+    async def _run_one(self, client: httpx.AsyncClient, stats_client: httpx.AsyncClient,
+                       phone: str, call_sid: str):
+        async with self.in_flight:
+            try:
+                if call_sid is None:
+                    await self._wait_for_capacity(stats_client)
+                    await self.rate_limiter.acquire()
+                    call_sid = await self._dial(client, phone)
+                await self._wait_for_outcome(client, phone, call_sid)
+            except Exception as e:
+                self.log.finished(phone, "dial-error" if call_sid is None else "poll-error", error=str(e))
+
+    async def run(self) -> dict:
+        pending = self.log.pending()
+        print(f"Campaign: {len(pending)} customers left to call.")
+        # The capacity check goes to our own server through the public tunnel,
+        # so it gets a client without the Twilio credentials
+        async with httpx.AsyncClient(auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN), timeout=15.0) as client, \
+                httpx.AsyncClient(timeout=2.0) as stats_client:
+            await asyncio.gather(*[self._run_one(client, stats_client, phone, call_sid)
+                                   for phone, call_sid in pending])
+        return self.log.summary()
+
+
+def run_campaign(customers_path: str, log_path: str = None, **dialer_options) -> dict:
+    """
+    Dials every customer in the CSV/SQLite file that has no outcome yet and
+    returns a count of call outcomes. Progress is kept in log_path (defaults
+    to <customers>.campaign.db), so re-running resumes where it stopped.
+    """
+    log = CampaignLog(log_path or f"{os.path.splitext(customers_path)[0]}.campaign.db")
+    log.import_customers(load_customers(customers_path))
+
+    async def dial_all():
+        return await CampaignDialer(log, **dialer_options).run()
+
+    return asyncio.run(dial_all())
@@ -0,0 +1,214 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from app.config import (
+    EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_ONNX_DIR, EMBEDDING_THREADS,
+    EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_MAX_BATCH, EMBEDDING_QUERY_CACHE,
+)
+from app.memory_retriever import normalize_rows
+
+# all-MiniLM-L6-v2 truncates its input to this many tokens
+MAX_SEQ_LENGTH = 256
+
+ONNX_MODEL_FILE = "model_int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class SentenceTransformerEncoder:
+    """The model through sentence-transformers on PyTorch."""
+
+    name = "sentence_transformers"
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        self.model = HuggingFaceEmbeddings(model_name=model_name)
+
+    def encode(self, texts: list) -> np.ndarray:
+        return np.asarray(self.model.embed_documents(texts), dtype=np.float32)
+
+
+class OnnxEncoder:
+    """
+    The model exported to ONNX with int8 weights (see export_onnx_model) on
+    ONNX Runtime. Mean pooling over the attention mask and L2 normalisation
+    reproduce the sentence-transformers pipeline.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str = EMBEDDING_ONNX_DIR, threads: int = EMBEDDING_THREADS):
+        import onnxruntime
+        from tokenizers import Tokenizer
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE), options, providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+    def encode(self, texts: list) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, inputs)[0]
+        weights = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+        return normalize_rows(pooled)
+
+
+class EmbeddingService:
+    """
+    Embeddings with the LangChain interface (embed_query, embed_documents),
+    shared by retrieval, the semantic cache and the indexer so the model is
+    loaded once per process.
+
+    Query embeddings are memoized (least recently used go first), so the
+    semantic cache and the retriever embedding the same utterance encode it
+    once. Queries from concurrent threads are encoded together: a batcher
+    thread waits up to window_ms after the first query for others and
+    encodes them in one pass.
+    """
+
+    def __init__(self, encoder, window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+                 max_batch: int = EMBEDDING_MAX_BATCH, cache_size: int = EMBEDDING_QUERY_CACHE):
+        self.encoder = encoder
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._requests = queue.Queue()
+        self.queries = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def embed_documents(self, texts: list) -> list:
+        vectors = []
+        for start in range(0, len(texts), self.max_batch):
+            vectors.extend(self.encoder.encode(texts[start:start + self.max_batch]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> list:
+        with self._cache_lock:
+            self.queries += 1
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+                self.cache_hits += 1
+                return vector
+        future = Future()
+        self._requests.put((text, future))
+        vector = future.result().tolist()
+        with self._cache_lock:
+            self._cache[text] = vector
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return vector
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._requests.get(timeout=max(0.0, deadline - time.perf_counter())))
+                except queue.Empty:
+                    break
+            # A query asked twice in one window is encoded once
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = dict(zip(texts, self.encoder.encode(texts)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.batched_queries += len(texts)
+            for text, future in batch:
+                future.set_result(vectors[text])
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.encoder.name,
+            "queries": self.queries,
+            "cache_hits": self.cache_hits,
+            "hit_rate": round(self.cache_hits / self.queries, 3) if self.queries else 0.0,
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_queries / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+def create_encoder(backend: str = EMBEDDING_BACKEND):
+    if backend == "onnx":
+        return OnnxEncoder()
+    return SentenceTransformerEncoder()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    """Returns the process-wide EmbeddingService, loading the model on first use."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService(create_encoder())
+        return _service
+
+
+def export_onnx_model(model_name: str = EMBEDDING_MODEL_NAME, output_dir: str = EMBEDDING_ONNX_DIR):
+    """
+    Exports the sentence-transformers model to ONNX, quantizes its weights to
+    int8 and saves it with its tokenizer in output_dir. Needs torch and
+    transformers (installed with sentence-transformers) only for the export.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(repo)
+    model = AutoModel.from_pretrained(repo).eval()
+    os.makedirs(output_dir, exist_ok=True)
+
+    inputs = ["input_ids", "attention_mask", "token_type_ids"]
+    sample = tokenizer(["How was your trip?"], return_tensors="pt")
+    fp32_path = os.path.join(output_dir, "model.onnx")
+    torch.onnx.export(
+        model, tuple(sample[name] for name in inputs), fp32_path,
+        input_names=inputs, output_names=["last_hidden_state"],
+        dynamic_axes={name: {0: "batch", 1: "sequence"} for name in inputs + ["last_hidden_state"]},
+        opset_version=14, dynamo=False,
+    )
+    quantize_dynamic(fp32_path, os.path.join(output_dir, ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    tokenizer.save_pretrained(output_dir)
+    print(f"Exported int8 ONNX model of {repo} to: {output_dir}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Embedding model tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Export the embedding model to int8 ONNX for EMBEDDING_BACKEND=onnx")
+    export.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    export.add_argument("--output", default=EMBEDDING_ONNX_DIR)
+    args = parser.parse_args()
+    export_onnx_model(args.model, args.output)
@@ -0,0 +1,107 @@
+import asyncio
+import importlib.util
+import random
+
+import httpx
+
+from app.config import (
+    TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN,
+    OLLAMA_MAX_CONNECTIONS, TWILIO_MAX_CONNECTIONS, HTTP_RETRIES, HTTP_RETRY_BACKOFF,
+)
+
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Statuses worth retrying: the upstream was reachable but temporarily unable to answer
+RETRY_STATUSES = {502, 503, 504}
+
+# One long-lived client per upstream, created on first use and closed on shutdown
+_clients = {}
+_sync_clients = {}
+
+
+def _client_options(name: str) -> dict:
+    if name == "ollama":
+        # Ollama is local; long timeout because generation can take a while
+        return {
+            "timeout": httpx.Timeout(30.0, connect=5.0),
+            "limits": httpx.Limits(max_connections=OLLAMA_MAX_CONNECTIONS,
+                                   max_keepalive_connections=OLLAMA_MAX_CONNECTIONS),
+        }
+    if name == "twilio":
+        # Recording URLs redirect to the media host, so follow redirects
+        return {
+            # Without credentials (e.g. local stand-ins) requests go unauthenticated
+            "auth": (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN else None,
+            "timeout": httpx.Timeout(15.0, connect=5.0),
+            "limits": httpx.Limits(max_connections=TWILIO_MAX_CONNECTIONS,
+                                   max_keepalive_connections=TWILIO_MAX_CONNECTIONS),
+            "follow_redirects": True,
+            "http2": HTTP2_AVAILABLE,
+        }
+    raise KeyError(f"Unknown upstream: {name}")
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """
+    Returns the shared async client for an upstream ("ollama" or "twilio").
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_options(name))
+        _clients[name] = client
+    return client
+
+
+def get_sync_client(name: str) -> httpx.Client:
+    """
+    Returns the shared blocking client for an upstream, for sync callers
+    such as scripts and the __main__ smoke tests.
+    """
+    client = _sync_clients.get(name)
+    if client is None or client.is_closed:
+        client = httpx.Client(**_client_options(name))
+        _sync_clients[name] = client
+    return client
+
+
+async def start_clients():
+    """Opens the shared clients up front; called from the FastAPI lifespan."""
+    for name in ("ollama", "twilio"):
+        get_client(name)
+
+
+async def close_clients():
+    """Closes every shared client and its connection pool."""
+    for client in _clients.values():
+        await client.aclose()
+    for client in _sync_clients.values():
+        client.close()
+    _clients.clear()
+    _sync_clients.clear()
+
+
+def _backoff(attempt: int) -> float:
+    # Exponential backoff with full jitter, so retries from many calls don't line up
+    return random.uniform(0, HTTP_RETRY_BACKOFF * (2 ** attempt))
+
+
+async def send_with_retry(client: httpx.AsyncClient, method: str, url: str,
+                          stream: bool = False, **kwargs) -> httpx.Response:
+    """
+    Sends a request on a shared client, retrying connection failures and
+    502/503/504 responses up to HTTP_RETRIES times. With stream=True the
+    caller must close the returned response.
+    """
+    for attempt in range(HTTP_RETRIES + 1):
+        request = client.build_request(method, url, **kwargs)
+        try:
+            response = await client.send(request, stream=stream)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout):
+            if attempt == HTTP_RETRIES:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == HTTP_RETRIES:
+                return response
+            await response.aclose()
+        await asyncio.sleep(_backoff(attempt))
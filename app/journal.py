@@ -0,0 +1,310 @@
+import glob
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+from app.config import (
+    JOURNAL_ENABLED, JOURNAL_DIR, JOURNAL_MAX_BYTES, JOURNAL_BATCH_SIZE, JOURNAL_FLUSH_SECONDS, JOURNAL_MAX_QUEUE,
+)
+
+CURRENT_FILE = "turns.db"
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS turns (
+    call_sid TEXT,
+    turn INTEGER,
+    started_at REAL,
+    phone TEXT,
+    booking TEXT,
+    hotel TEXT,
+    transcript TEXT,
+    reply TEXT,
+    sentiment REAL,
+    outcome TEXT,
+    turn_s REAL,
+    first_audio_s REAL,
+    stages TEXT
+)"""
+
+COLUMNS = ["call_sid", "turn", "started_at", "phone", "booking", "hotel", "transcript", "reply",
+           "sentiment", "outcome", "turn_s", "first_audio_s", "stages"]
+
+# Word lists for a rough sentiment score of what the customer said
+POSITIVE_WORDS = {
+    "good", "great", "nice", "excellent", "amazing", "love", "loved", "lovely", "wonderful", "fantastic",
+    "helpful", "clean", "friendly", "comfortable", "beautiful", "enjoyed", "perfect", "happy", "recommend",
+    "best", "awesome", "delicious", "smooth", "fine",
+}
+NEGATIVE_WORDS = {
+    "bad", "poor", "terrible", "awful", "cold", "dirty", "late", "delayed", "rude", "noisy", "worst",
+    "disappointed", "disappointing", "horrible", "problem", "issue", "complaint", "broken", "expensive",
+    "slow", "uncomfortable", "lost", "cancelled", "unhelpful",
+}
+NEGATIONS = {"not", "no", "never", "wasn't", "isn't", "didn't", "don't", "weren't", "hardly"}
+
+
+def sentiment_score(text: str) -> float:
+    """
+    Scores text from -1 (negative) to 1 (positive) by counting opinion
+    words; a negation up to two words before one flips it. 0 if there are none.
+    """
+    words = re.findall(r"[a-z']+", (text or "").lower())
+    positive = negative = 0
+    for i, word in enumerate(words):
+        polarity = 1 if word in POSITIVE_WORDS else -1 if word in NEGATIVE_WORDS else 0
+        if polarity and NEGATIONS.intersection(words[max(0, i - 2):i]):
+            polarity = -polarity
+        positive += polarity > 0
+        negative += polarity < 0
+    return round((positive - negative) / (positive + negative), 3) if positive + negative else 0.0
+
+
+@dataclass
+class TurnRecord:
+    """One turn of a call as journaled: who, what was said, how long each stage took, how it ended."""
+
+    call_sid: str
+    turn: int
+    started_at: float
+    phone: str = None
+    booking: str = None
+    hotel: str = None
+    transcript: str = None
+    reply: str = None
+    sentiment: float = None
+    outcome: str = None
+    turn_s: float = None
+    first_audio_s: float = None
+    stages: dict = field(default_factory=dict)  # Stage -> seconds (TTS chunks summed)
+
+    def row(self) -> tuple:
+        values = [getattr(self, name) for name in COLUMNS]
+        values[-1] = json.dumps({stage: round(seconds, 4) for stage, seconds in self.stages.items()})
+        return tuple(values)
+
+
+class CallJournal:
+    """
+    Writes TurnRecords to SQLite without blocking the event loop: log_turn()
+    only queues the record, and a writer thread inserts queued records in
+    one transaction per batch (up to batch_size, or what arrived within
+    flush_seconds). Once the current file reaches max_bytes it is renamed to
+    turns-<timestamp>.db and a new one started. If the writer falls more than
+    max_queue records behind, new records are dropped and counted.
+    """
+
+    def __init__(self, directory: str = JOURNAL_DIR, max_bytes: int = JOURNAL_MAX_BYTES,
+                 batch_size: int = JOURNAL_BATCH_SIZE, flush_seconds: float = JOURNAL_FLUSH_SECONDS,
+                 max_queue: int = JOURNAL_MAX_QUEUE):
+        self.directory = directory
+        self.path = os.path.join(directory, CURRENT_FILE)
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rollovers = 0
+
+    def log_turn(self, record: TurnRecord):
+        """Queues the record for the writer thread; never blocks."""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="call-journal", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 5.0):
+        """
+        Writes what is still queued and stops the writer thread, giving up
+        after `timeout` seconds (a stuck writer must not hang shutdown).
+        """
+        if self._thread is not None:
+            deadline = time.monotonic() + timeout
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                print(f"Call journal writer is stuck; {self._queue.qsize()} records not written")
+                return
+            self._thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _open(self) -> sqlite3.Connection:
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(SCHEMA)
+        return conn
+
+    def _roll_over(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        conn.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        rolled = os.path.join(self.directory, f"turns-{stamp}.db")
+        suffix = 1
+        while os.path.exists(rolled):
+            rolled = os.path.join(self.directory, f"turns-{stamp}-{suffix}.db")
+            suffix += 1
+        os.replace(self.path, rolled)
+        self.rollovers += 1
+        return self._open()
+
+    def _run(self):
+        conn = self._open()
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [record for record in batch if record is not None]
+            if not batch:
+                continue
+            try:
+                with conn:
+                    conn.executemany(
+                        f"INSERT INTO turns ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        [record.row() for record in batch],
+                    )
+                self.written += len(batch)
+                self.batches += 1
+                if os.path.getsize(self.path) >= self.max_bytes:
+                    conn = self._roll_over(conn)
+            except Exception as e:
+                self.dropped += len(batch)
+                print(f"Error writing call journal: {e}")
+        conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "mean_batch_size": round(self.written / self.batches, 1) if self.batches else 0.0,
+            "rollovers": self.rollovers,
+        }
+
+
+journal = CallJournal() if JOURNAL_ENABLED else None
+
+
+def journal_files(directory: str = JOURNAL_DIR) -> list:
+    """The rolled-over journal files, oldest first, then the current one."""
+    files = sorted(glob.glob(os.path.join(directory, "turns-*.db")))
+    current = os.path.join(directory, CURRENT_FILE)
+    return files + [current] if os.path.exists(current) else files
+
+
+def open_journal(directory: str = JOURNAL_DIR, since_hours: float = None) -> sqlite3.Connection:
+    """
+    Loads the turns of every journal file into one in-memory `turns` table
+    for querying; with since_hours, only turns that started in that window.
+    """
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute(SCHEMA)
+    since = time.time() - since_hours * 3600 if since_hours else 0.0
+    for path in journal_files(directory):
+        conn.execute("ATTACH DATABASE ? AS part", (path,))
+        conn.execute(f"INSERT INTO turns SELECT {', '.join(COLUMNS)} FROM part.turns WHERE started_at >= ?", (since,))
+        conn.execute("DETACH DATABASE part")
+    return conn
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def print_rows(header: list, rows: list):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) if rows else len(str(h))
+              for i, h in enumerate(header)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(header, widths)))
+    for row in rows:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+
+def report_summary(conn: sqlite3.Connection):
+    calls, turns, first_audio, turn_s = conn.execute(
+        "SELECT COUNT(DISTINCT call_sid), COUNT(*), AVG(first_audio_s), AVG(turn_s) FROM turns"
+    ).fetchone()
+    print(f"{calls} calls, {turns} turns; mean first audio {first_audio or 0:.2f}s, mean turn {turn_s or 0:.2f}s")
+    print_rows(["outcome", "turns"], conn.execute(
+        "SELECT outcome, COUNT(*) FROM turns GROUP BY outcome ORDER BY COUNT(*) DESC"
+    ).fetchall())
+
+
+def report_sentiment(conn: sqlite3.Connection, by: str):
+    rows = conn.execute(
+        f"""SELECT COALESCE({by}, '(unknown)'), COUNT(*), ROUND(AVG(sentiment), 3),
+                   SUM(sentiment < 0), COUNT(DISTINCT call_sid)
+            FROM turns WHERE transcript IS NOT NULL GROUP BY 1 ORDER BY 3"""
+    ).fetchall()
+    print_rows([by, "turns", "mean sentiment", "negative turns", "calls"], rows)
+
+
+def report_stages(conn: sqlite3.Connection):
+    seconds = {}
+    for stage, value in conn.execute("SELECT key, value FROM turns, json_each(turns.stages)"):
+        seconds.setdefault(stage, []).append(value)
+    rows = [(stage, len(values), f"{sum(values) / len(values):.3f}", f"{percentile(values, 95):.3f}",
+             f"{max(values):.3f}") for stage, values in seconds.items()]
+    rows.sort(key=lambda row: -float(row[2]))
+    print_rows(["stage", "runs", "mean s", "p95 s", "max s"], rows)
+
+
+def report_slowest(conn: sqlite3.Connection, limit: int):
+    rows = []
+    for call_sid, turn, turn_s, stages, transcript in conn.execute(
+        "SELECT call_sid, turn, turn_s, stages, transcript FROM turns ORDER BY turn_s DESC LIMIT ?", (limit,)
+    ):
+        stages = json.loads(stages or "{}")
+        slowest = max(stages, key=stages.get) if stages else "-"
+        rows.append((call_sid, turn, f"{turn_s:.2f}", f"{slowest} {stages.get(slowest, 0):.2f}s",
+                     (transcript or "")[:50]))
+    print_rows(["call_sid", "turn", "turn s", "slowest stage", "transcript"], rows)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Query the call journal.")
+    parser.add_argument("--dir", default=JOURNAL_DIR, help="Journal directory")
+    parser.add_argument("--since", type=float, help="Only turns from the last this many hours")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("summary", help="Calls, turns and outcomes")
+    sentiment = subparsers.add_parser("sentiment", help="Mean sentiment of what customers said, grouped")
+    sentiment.add_argument("--by", choices=["hotel", "booking", "outcome", "phone"], default="hotel")
+    subparsers.add_parser("stages", help="Stage timings, slowest first")
+    slowest = subparsers.add_parser("slowest", help="Slowest turns and their slowest stage")
+    slowest.add_argument("--limit", type=int, default=10)
+    sql = subparsers.add_parser("sql", help="Run a query against the `turns` table")
+    sql.add_argument("query")
+    args = parser.parse_args()
+
+    conn = open_journal(args.dir, args.since)
+    if args.command == "summary":
+        report_summary(conn)
+    elif args.command == "sentiment":
+        report_sentiment(conn, args.by)
+    elif args.command == "stages":
+        report_stages(conn)
+    elif args.command == "slowest":
+        report_slowest(conn, args.limit)
+    else:
+        cursor = conn.execute(args.query)
+        print_rows([column[0] for column in cursor.description or []], cursor.fetchall())
@@ -1,21 +1,42 @@
-from llama_cpp import Llama
-import os
+import asyncio
+import codecs
+import ctypes
+import queue
+import threading
+import time
+from collections import deque
 
-# Determine the base directory of the project
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_PATH = os.path.join(BASE_DIR, "models", "phi-2.gguf") # Adjust if using llama-3b.gguf
+import numpy as np
+
+from app.components import Component
+from app.config import (
+    LLAMA_MODEL_PATH, LLAMA_GPU_LAYERS, LLAMA_THREADS, LLAMA_CTX, LLAMA_MAX_SEQUENCES, LLAMA_BATCH_TOKENS,
+)
+from app.llm_backends import LLMBackend, LLMSession
+
+MODEL_PATH = LLAMA_MODEL_PATH
+
+# KV sequence holding the evaluated system prompt; calls use 1..LLAMA_MAX_SEQUENCES
+PREFIX_SEQ = 0
+
+# Sampling: temperature over the TOP_K most likely tokens
+TOP_K = 40
+
+
+def _load_llama():
+    from llama_cpp import Llama
+    return Llama(model_path=MODEL_PATH, n_ctx=2048, n_gpu_layers=LLAMA_GPU_LAYERS) # n_gpu_layers=-1 to offload all layers to GPU
+
+
+# Loaded on first generate_reply() call; the server doesn't use it, so it is not on /ready
+llama_model = Component("llama_cpp", _load_llama)
 
-# Load the LLM model
-try:
-    llm = Llama(model_path=MODEL_PATH, n_ctx=2048, n_gpu_layers=-1) # n_gpu_layers=-1 to offload all layers to GPU
-except Exception as e:
-    print(f"Error loading LLM model: {e}")
-    llm = None
 
 def generate_reply(prompt: str) -> str:
     """
     Generates a reply from the loaded LLM model based on the given prompt.
     """
+    llm = llama_model.get()
     if llm is None:
         return "LLM model not loaded. Cannot generate reply."
     try:
@@ -24,13 +45,384 @@ def generate_reply(prompt: str) -> str:
     except Exception as e:
         return f"Error generating reply: {e}"
 
+
+def _kv(name: str, ctx, *args):
+    """
+    Calls a KV cache sequence function (seq_rm, seq_cp) under whichever name
+    the installed llama-cpp-python has: llama_memory_* (current),
+    llama_kv_self_* or llama_kv_cache_* (older releases).
+    """
+    import llama_cpp
+    if hasattr(llama_cpp, f"llama_memory_{name}"):
+        return getattr(llama_cpp, f"llama_memory_{name}")(llama_cpp.llama_get_memory(ctx), *args)
+    if hasattr(llama_cpp, f"llama_kv_self_{name}"):
+        return getattr(llama_cpp, f"llama_kv_self_{name}")(ctx, *args)
+    return getattr(llama_cpp, f"llama_kv_cache_{name}")(ctx, *args)
+
+
+class _Sequence:
+    """One call's generation: its KV sequence, tokens still to evaluate and output so far."""
+
+    def __init__(self, tokens: list, reuses_prefix: bool, max_tokens: int, temperature: float, emit,
+                 session: LLMSession = None, restore: tuple = None):
+        self.pending = tokens  # Prompt tokens, then the last sampled token
+        self.reuses_prefix = reuses_prefix
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.emit = emit  # Called with each text piece, then None; or with an exception
+        self.session = session  # Receives the sequence state once the reply is finished
+        self.restore = restore  # (state, n_past) of the call's previous turn
+        self.seq_id = None
+        self.n_past = 0
+        # KV cells this sequence may use
+        self.reserved = len(tokens) + max_tokens + (restore[1] if restore else 0)
+        self.generated = 0
+        self.text = ""
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self.cancelled = False
+        self.submitted_at = time.perf_counter()
+
+
+class LlamaCppBackend(LLMBackend):
+    """
+    llama.cpp in-process with continuous batching. One scheduler thread owns
+    a context with LLAMA_MAX_SEQUENCES parallel KV sequences; every step it
+    admits waiting calls into free sequences and decodes one shared batch
+    holding the next token of every generating call plus prompt chunks of
+    newly admitted ones, so concurrent calls share each forward pass.
+
+    The system prompt is evaluated once into its own sequence; a call whose
+    prompt starts with it gets those KV cells copied into its sequence and
+    only evaluates the rest of its prompt. A call's later turns restore the
+    sequence state saved in its LLMSession at the end of the previous reply
+    and evaluate only the new utterance. A prefill is a sequence with no
+    tokens to generate: its prompt is evaluated and saved, nothing sampled.
+    """
+
+    name = "llama_cpp"
+
+    def __init__(self, system_prompt: str = "", model_path: str = LLAMA_MODEL_PATH,
+                 max_sequences: int = LLAMA_MAX_SEQUENCES, n_ctx: int = LLAMA_CTX,
+                 batch_tokens: int = LLAMA_BATCH_TOKENS, n_threads: int = LLAMA_THREADS):
+        self.system_prompt = system_prompt
+        self.model_path = model_path
+        self.max_sequences = max_sequences
+        self.n_ctx = n_ctx
+        self.batch_tokens = batch_tokens
+        self.n_threads = n_threads
+        self._requests = queue.Queue()
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self.llm = None
+        self.prefix_tokens = []
+        self.batches = 0
+        self.batched_tokens = 0
+        self.generated_tokens = 0
+        self.prefix_hits = 0
+        self.session_restores = 0
+        self.active = 0
+        self.waiting = 0
+
+    def load(self):
+        """Loads the model, creates the multi-sequence context and starts the scheduler."""
+        with self._load_lock:
+            if self._thread is not None:
+                return
+            import llama_cpp
+            from llama_cpp import Llama
+            # The Llama object is used for the weights and tokenizer; its own
+            # single-sequence context is kept tiny since decoding uses ours
+            self.llm = Llama(model_path=self.model_path, n_ctx=256, n_batch=256,
+                             n_gpu_layers=LLAMA_GPU_LAYERS, verbose=False)
+            params = llama_cpp.llama_context_default_params()
+            params.n_ctx = self.n_ctx
+            params.n_batch = self.batch_tokens
+            params.n_ubatch = self.batch_tokens
+            params.n_seq_max = self.max_sequences + 1
+            params.n_threads = self.n_threads
+            params.n_threads_batch = self.n_threads
+            if hasattr(params, "kv_unified"):
+                params.kv_unified = True  # One KV pool, so the prefix cells are shared, not copied
+            new_context = getattr(llama_cpp, "llama_init_from_model", None) or llama_cpp.llama_new_context_with_model
+            self.ctx = new_context(self.llm._model.model, params)
+            if not self.ctx:
+                raise RuntimeError(f"Failed to create llama.cpp context for {self.model_path}")
+            self.batch = llama_cpp.llama_batch_init(self.batch_tokens, 0, 1)
+            self.n_vocab = self.llm.n_vocab()
+            self.eos = self.llm.token_eos()
+            vocab = getattr(self.llm._model, "vocab", None)
+            if vocab is not None and hasattr(llama_cpp, "llama_vocab_is_eog"):
+                self._is_eog = lambda token: bool(llama_cpp.llama_vocab_is_eog(vocab, token))
+            else:
+                self._is_eog = lambda token: token == self.eos
+
+            self.prefix_tokens = self.llm.tokenize(self.system_prompt.encode("utf-8"), add_bos=True)
+            for start in range(0, len(self.prefix_tokens), self.batch_tokens):
+                chunk = self.prefix_tokens[start:start + self.batch_tokens]
+                self._decode([(token, start + i, PREFIX_SEQ, False) for i, token in enumerate(chunk)])
+
+            self._thread = threading.Thread(target=self._run, name="llama-scheduler", daemon=True)
+            self._thread.start()
+            print(f"llama.cpp backend ready: {self.model_path}, {self.max_sequences} sequences, "
+                  f"{len(self.prefix_tokens)} system prompt tokens cached")
+
+    async def warm_up(self):
+        await asyncio.to_thread(self.load)
+
+    def tokenize_prompt(self, prompt: str) -> tuple:
+        """Returns (tokens after the cached prefix, True) or (all tokens, False)."""
+        if self.system_prompt and prompt.startswith(self.system_prompt):
+            rest = prompt[len(self.system_prompt):].encode("utf-8")
+            return self.llm.tokenize(rest, add_bos=False), True
+        return self.llm.tokenize(prompt.encode("utf-8"), add_bos=True), False
+
+    def submit(self, prompt: str, max_tokens: int, temperature: float, emit,
+               session: LLMSession = None) -> _Sequence:
+        self.load()
+        restore = None
+        if session is not None and session.state is not None:
+            # The prompt continues the saved context of the call's previous turn
+            state, n_past, tail = session.state
+            tokens, reuses_prefix = tail + self.llm.tokenize(prompt.encode("utf-8"), add_bos=False), False
+            restore = (state, n_past)
+        else:
+            tokens, reuses_prefix = self.tokenize_prompt(prompt)
+        if session is not None:
+            session.state, session.tokens = None, 0
+        sequence = _Sequence(tokens, reuses_prefix, max_tokens, temperature, emit, session, restore)
+        # The same budget the scheduler admits against: the context minus the system prompt's cells
+        if sequence.reserved > self.n_ctx - len(self.prefix_tokens):
+            raise RuntimeError("Error generating RAG response: prompt is longer than the llama.cpp context.")
+        self._requests.put(sequence)
+        return sequence
+
+    async def stream(self, prompt: str, max_tokens: int = 64, temperature: float = 0.7,
+                     session: LLMSession = None):
+        loop = asyncio.get_running_loop()
+        pieces = asyncio.Queue()
+
+        def emit(item):
+            try:
+                loop.call_soon_threadsafe(pieces.put_nowait, item)
+            except RuntimeError:
+                pass  # Event loop already closed
+
+        if self._thread is None:
+            await asyncio.to_thread(self.load)
+        sequence = self.submit(prompt, max_tokens, temperature, emit, session)
+        try:
+            while True:
+                item = await pieces.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise RuntimeError(f"Error generating RAG response: {item}")
+                yield item
+        finally:
+            # Frees the sequence at the next step if the caller stopped early
+            sequence.cancelled = True
+
+    async def prefill(self, prompt: str, session: LLMSession):
+        async for _ in self.stream(prompt, max_tokens=0, session=session):
+            pass
+
+    def generate(self, prompt: str, max_tokens: int = 64, temperature: float = 0.7) -> str:
+        pieces = queue.Queue()
+        self.submit(prompt, max_tokens, temperature, pieces.put)
+        text = ""
+        while True:
+            item = pieces.get()
+            if item is None:
+                return text
+            if isinstance(item, Exception):
+                raise RuntimeError(f"Error generating RAG response: {item}")
+            text += item
+
+    def _decode(self, entries: list):
+        """Decodes one batch of (token, position, seq_id, wants_logits) entries."""
+        import llama_cpp
+        batch = self.batch
+        for i, (token, pos, seq_id, logits) in enumerate(entries):
+            batch.token[i] = token
+            batch.pos[i] = pos
+            batch.n_seq_id[i] = 1
+            batch.seq_id[i][0] = seq_id
+            batch.logits[i] = logits
+        batch.n_tokens = len(entries)
+        result = llama_cpp.llama_decode(self.ctx, batch)
+        if result != 0:
+            raise RuntimeError(f"llama_decode returned {result}")
+        self.batches += 1
+        self.batched_tokens += len(entries)
+
+    def _sample(self, index: int, temperature: float) -> int:
+        import llama_cpp
+        logits = np.ctypeslib.as_array(llama_cpp.llama_get_logits_ith(self.ctx, index), shape=(self.n_vocab,))
+        if temperature <= 0:
+            return int(np.argmax(logits))
+        top = np.argpartition(logits, -TOP_K)[-TOP_K:]
+        weights = np.exp((logits[top] - logits[top].max()) / temperature)
+        return int(np.random.choice(top, p=weights / weights.sum()))
+
+    def _restore(self, sequence: _Sequence):
+        """Loads the KV cells saved at the end of the call's previous turn into its sequence."""
+        import llama_cpp
+        state, n_past = sequence.restore
+        sequence.restore = None
+        buffer = (ctypes.c_ubyte * len(state)).from_buffer_copy(state)
+        if llama_cpp.llama_state_seq_set_data(self.ctx, buffer, len(state), sequence.seq_id) == 0:
+            raise RuntimeError("failed to restore the call's saved context")
+        sequence.n_past = n_past
+        self.session_restores += 1
+
+    def _save(self, sequence: _Sequence):
+        """Copies a finished sequence's KV cells into its session for the call's next turn."""
+        import llama_cpp
+        size = llama_cpp.llama_state_seq_get_size(self.ctx, sequence.seq_id)
+        buffer = (ctypes.c_ubyte * size)()
+        written = llama_cpp.llama_state_seq_get_data(self.ctx, buffer, size, sequence.seq_id)
+        if written:
+            # The last sampled token, if the reply hit max_tokens, was never evaluated
+            sequence.session.state = (ctypes.string_at(buffer, written), sequence.n_past, list(sequence.pending))
+            sequence.session.tokens = sequence.n_past + len(sequence.pending)
+
+    def _release(self, sequence: _Sequence, free_ids: list, item=None):
+        _kv("seq_rm", self.ctx, sequence.seq_id, -1, -1)
+        free_ids.append(sequence.seq_id)
+        sequence.emit(item)
+
+    def _accept(self, sequence: _Sequence, token: int) -> bool:
+        """Emits a sampled token's text; returns True once the reply is finished."""
+        sequence.generated += 1
+        self.generated_tokens += 1
+        if self._is_eog(token):
+            return True
+        piece = sequence.decoder.decode(self.llm.detokenize([token]))
+        # A reply is one short paragraph: stop at the first line break after some text
+        if "\n" in piece and sequence.text.strip():
+            piece = piece.split("\n", 1)[0]
+            if piece:
+                sequence.emit(piece)
+            return True
+        if piece:
+            sequence.text += piece
+            sequence.emit(piece)
+        sequence.pending = [token]
+        return sequence.generated >= sequence.max_tokens
+
+    def _run(self):
+        free_ids = list(range(1, self.max_sequences + 1))
+        active = []
+        waiting = deque()
+        reserved = 0
+        while True:
+            # Collect new calls; block only when there is nothing to decode
+            try:
+                waiting.append(self._requests.get(block=not active and not waiting))
+                while True:
+                    waiting.append(self._requests.get_nowait())
+            except queue.Empty:
+                pass
+
+            # Continuous batching: admit waiting calls whenever a sequence and KV space are free
+            budget = self.n_ctx - len(self.prefix_tokens)
+            while waiting and free_ids:
+                if waiting[0].reserved > budget:
+                    # Would not fit even in an empty context; failing it keeps the queue moving
+                    waiting.popleft().emit(RuntimeError("prompt is longer than the llama.cpp context"))
+                    continue
+                if reserved + waiting[0].reserved > budget:
+                    break
+                sequence = waiting.popleft()
+                if sequence.cancelled:
+                    sequence.emit(None)
+                    continue
+                sequence.seq_id = free_ids.pop()
+                if sequence.restore is not None:
+                    try:
+                        self._restore(sequence)
+                    except Exception as e:
+                        self._release(sequence, free_ids, e)
+                        continue
+                elif sequence.reuses_prefix:
+                    _kv("seq_cp", self.ctx, PREFIX_SEQ, sequence.seq_id, -1, -1)
+                    sequence.n_past = len(self.prefix_tokens)
+                    self.prefix_hits += 1
+                reserved += sequence.reserved
+                active.append(sequence)
+
+            for sequence in [s for s in active if s.cancelled]:
+                active.remove(sequence)
+                reserved -= sequence.reserved
+                self._release(sequence, free_ids)
+            self.active, self.waiting = len(active), len(waiting)
+            if not active:
+                continue
+
+            # Generating calls go first (one token each) so streaming stays smooth;
+            # prompt evaluation of new calls fills the rest of the batch
+            entries, sampled, prefilled = [], [], []
+            room = self.batch_tokens
+            for sequence in sorted(active, key=lambda s: len(s.pending)):
+                take = min(len(sequence.pending), room)
+                if take == 0:
+                    break
+                chunk, sequence.pending = sequence.pending[:take], sequence.pending[take:]
+                finishes = not sequence.pending
+                samples = finishes and sequence.max_tokens > 0
+                for i, token in enumerate(chunk):
+                    entries.append((token, sequence.n_past + i, sequence.seq_id, samples and i == take - 1))
+                sequence.n_past += take
+                room -= take
+                if samples:
+                    sampled.append((sequence, len(entries) - 1))
+                elif finishes:
+                    prefilled.append(sequence)
+
+            try:
+                self._decode(entries)
+                finished = prefilled + [sequence for sequence, index in sampled
+                                        if self._accept(sequence, self._sample(index, sequence.temperature))]
+            except Exception as e:
+                # Fail every call in the batch rather than leave them waiting forever
+                for sequence in active:
+                    reserved -= sequence.reserved
+                    self._release(sequence, free_ids, e)
+                active = []
+                continue
+
+            for sequence in finished:
+                active.remove(sequence)
+                reserved -= sequence.reserved
+                if sequence.session is not None:
+                    try:
+                        self._save(sequence)
+                    except Exception as e:
+                        print(f"Could not save llama.cpp session state: {e}")  # Next turn re-sends the history
+                self._release(sequence, free_ids)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "loaded": self._thread is not None,
+            "active_sequences": self.active,
+            "waiting": self.waiting,
+            "batches": self.batches,
+            "mean_batch_tokens": round(self.batched_tokens / self.batches, 1) if self.batches else 0.0,
+            "generated_tokens": self.generated_tokens,
+            "prefix_tokens": len(self.prefix_tokens),
+            "prefix_hits": self.prefix_hits,
+            "session_restores": self.session_restores,
+        }
+
+
 if __name__ == "__main__":
     # Simple test to ensure the model loads and responds
-    if llm:
+    if llama_model.get():
         print("LLM model loaded successfully. Testing generate_reply...")
         test_prompt = "Hello, how are you today?"
         response = generate_reply(test_prompt)
         print(f"Prompt: {test_prompt}")
         print(f"Response: {response}")
     else:
-        print("LLM model failed to load. Cannot run test.")
\ No newline at end of file
+        print("LLM model failed to load. Cannot run test.")
@@ -0,0 +1,186 @@
+import json
+
+import httpx
+
+from app.config import LLM_BACKEND, OLLAMA_BASE_URL, OLLAMA_MODEL
+from app.http_clients import get_client, get_sync_client, send_with_retry
+
+
+class LLMSession:
+    """
+    The model context a call leaves behind after a reply (Ollama's context
+    array, a llama.cpp sequence state), so the next turn only evaluates its
+    new text. state is None until a reply finishes, and again after a reply
+    stopped early; tokens is the context length.
+    """
+
+    def __init__(self):
+        self.state = None
+        self.tokens = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Rough memory held by the saved context: a llama.cpp state blob, or 8 bytes per Ollama token."""
+        if self.state is None:
+            return 0
+        if isinstance(self.state, tuple):
+            return len(self.state[0])
+        return 8 * len(self.state)
+
+
+class LLMBackend:
+    """
+    Where replies are generated. stream() yields the reply text piece by piece
+    as it is generated and generate() returns it whole; both raise
+    RuntimeError("Error: ...") on failure. warm_up() loads the model and
+    raises if that fails, so /ready reports the LLM as failed.
+
+    stream() given an LLMSession continues from its saved context, if any,
+    and saves the context including this reply once it is complete.
+    prefill() evaluates the start of a call's first prompt ahead of time,
+    while the caller is still listening to the intro.
+    """
+
+    name = "base"
+
+    async def warm_up(self):
+        pass
+
+    async def stream(self, prompt: str, max_tokens: int = 64, temperature: float = 0.7,
+                     session: LLMSession = None):
+        raise NotImplementedError
+        yield
+
+    async def prefill(self, prompt: str, session: LLMSession):
+        """
+        Evaluates prompt, the start of the call's first prompt, without
+        replying. If the backend can save the result, session then continues
+        from it and the first turn only sends the rest of its prompt.
+        """
+
+    def generate(self, prompt: str, max_tokens: int = 64, temperature: float = 0.7) -> str:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class OllamaBackend(LLMBackend):
+    """Ollama over HTTP, one /api/generate request per reply."""
+
+    name = "ollama"
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, model: str = OLLAMA_MODEL):
+        self.base_url = base_url
+        self.model = model
+
+    def _request(self, prompt: str, max_tokens: int, temperature: float, stream: bool, context: list = None) -> dict:
+        request = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "num_predict": max_tokens,  # Keep response short for phone calls
+                "temperature": temperature,
+            }
+        }
+        if context:
+            # Tokens of the earlier turns; Ollama reuses their KV cache when it still holds them
+            request["context"] = context
+        return request
+
+    async def warm_up(self):
+        """
+        Sends a dummy request to Ollama to pre-load the model into GPU memory.
+        This eliminates the cold start delay on the first real request.
+        """
+        print(f"Warming up Ollama model '{self.model}'...")
+        response = await send_with_retry(
+            get_client("ollama"),
+            "POST",
+            f"{self.base_url}/api/generate",
+            json=self._request("Hello", max_tokens=1, temperature=0.7, stream=False),
+            timeout=120.0,
+        )
+        response.raise_for_status()
+        print(f"Ollama model '{self.model}' is warm and ready on GPU!")
+
+    async def stream(self, prompt: str, max_tokens: int = 64, temperature: float = 0.7,
+                     session: LLMSession = None):
+        context = None
+        if session is not None:
+            context, session.state, session.tokens = session.state, None, 0
+        try:
+            response = await send_with_retry(
+                get_client("ollama"),
+                "POST",
+                f"{self.base_url}/api/generate",
+                stream=True,
+                json=self._request(prompt, max_tokens, temperature, stream=True, context=context),
+            )
+            try:
+                response.raise_for_status()
+                # Ollama streams one JSON object per line (NDJSON)
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        if session is not None and chunk.get("context"):
+                            session.state = chunk["context"]
+                            session.tokens = len(session.state)
+                        break
+            finally:
+                # Returns the connection to the keep-alive pool
+                await response.aclose()
+        except httpx.TimeoutException:
+            raise RuntimeError("Error: Ollama request timed out.")
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Error generating RAG response: {e}")
+
+    async def prefill(self, prompt: str, session: LLMSession):
+        """
+        Ollama can't save a context without replying, and the context of a
+        one-token reply would put that token in the conversation. Instead this
+        warms Ollama's prompt cache: the first turn's full prompt starts with
+        the same text, so Ollama only evaluates the part after it. session is
+        left empty.
+        """
+        try:
+            response = await send_with_retry(
+                get_client("ollama"),
+                "POST",
+                f"{self.base_url}/api/generate",
+                json=self._request(prompt, max_tokens=1, temperature=0.0, stream=False),
+            )
+            response.raise_for_status()
+        except httpx.TimeoutException:
+            raise RuntimeError("Error: Ollama request timed out.")
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Error prefilling prompt: {e}")
+
+    def generate(self, prompt: str, max_tokens: int = 64, temperature: float = 0.7) -> str:
+        try:
+            response = get_sync_client("ollama").post(
+                f"{self.base_url}/api/generate",
+                json=self._request(prompt, max_tokens, temperature, stream=False),
+            )
+            response.raise_for_status()
+            return response.json().get("response", "")
+        except httpx.TimeoutException:
+            raise RuntimeError("Error: Ollama request timed out.")
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Error generating RAG response: {e}")
+
+
+def create_llm_backend(system_prompt: str = "") -> LLMBackend:
+    """
+    Creates the LLM_BACKEND backend. The llama.cpp backend keeps the KV cache
+    of system_prompt, the constant start of every prompt, and reuses it.
+    """
+    if LLM_BACKEND == "llama_cpp":
+        from app.llm import LlamaCppBackend
+        return LlamaCppBackend(system_prompt)
+    return OllamaBackend()
@@ -1,106 +1,352 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
-from fastapi.responses import FileResponse, Response
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Body
+from fastapi.responses import FileResponse, JSONResponse, Response
 import os
-import shutil
-import uuid
 import asyncio
-import httpx
+import threading
+import time
+import zipfile
+from contextlib import asynccontextmanager
 from twilio.twiml.voice_response import VoiceResponse, Play
 from loguru import logger
 
 from app.stt import transcribe_audio
-from app.agent import get_rag_response, warm_up_ollama
-from app.tts import synthesize_speech_async
-from app.config import AUDIO_UPLOAD_DIR, AUDIO_OUTPUT_DIR, BASE_DIR, TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, NGROK_URL
+from app.agent import (
+    get_rag_response_async, stream_rag_response, prefetch_call, reload_index, llm_backend, embeddings_model,
+)
+from app.tts import (
+    synthesize_speech_async, synthesize_cached_async, tts_cache, hot_audio, media_type_for, AUDIO_EXTENSION,
+)
+from app.components import register, warm_up_all, readiness
+from app.http_clients import get_client, send_with_retry, start_clients, close_clients
+from app.semantic_cache import response_cache
+from app.call_state import call_store
+from app.customers import customer_store
+from app.journal import TurnRecord, journal, sentiment_score
+from app.sessions import end_session, session_stats
+from app.batch import BatchJob, batch_jobs, resolve_under
+from app.dialer import FINAL_STATUSES
+from app.admission import admission, Overloaded, FIRST_TURN, LATER_TURN
+from app.pipeline import stt_stage, retrieval_stage, tts_stage, pipeline_stats, shutdown_executors
+from app.metrics import timed, start_turn, first_audio, expected_first_audio, finish_turn, metrics_payload
+from app.audio import audio_duration
+from app.config import (
+    AUDIO_OUTPUT_DIR, BASE_DIR, BATCH_DIR, NGROK_URL, TTS_AUDIO_FORMAT, CALL_MAX_TURNS, RESULT_LONG_POLL_SECONDS,
+    CALL_PREFETCH_ENABLED,
+)
+
+
+def compress_in_background(path: str):
+    """
+    Zips a rotated log file on a thread. Loguru rotates inside the logging
+    call, so zipping 500 MB there would stall the event loop for seconds.
+    """
+    def compress():
+        with zipfile.ZipFile(f"{path}.zip", "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.write(path, os.path.basename(path))
+        os.remove(path)
+    threading.Thread(target=compress, name="log-compression", daemon=True).start()
+
 
 # Configure Loguru logger
 LOG_FILE_PATH = os.path.join(BASE_DIR, "logs", "agent.log")
-logger.add(LOG_FILE_PATH, rotation="500 MB", compression="zip", level="INFO")
+logger.add(LOG_FILE_PATH, rotation="500 MB", compression=compress_in_background, level="INFO")
+
+# Per-call state lives in call_store (see app/call_state.py) under these keys:
+#   turns:{call_sid}        number of replies started in the call
+#   result:{call_sid}       processing result of the current turn, written only by process_recording
+#   played:{call_sid}       number of reply chunks already played, written only by /twilio_result
+#   history:{call_sid}      compact conversation history (see app/sessions.py)
+#   trip:{call_sid}         trip details prefetched when the call started (see app/sessions.py)
+
+
+# Cache lifetimes for /audio responses. TTS cache files are named by the hash
+# of their content, so they never change; prompts may change between deploys.
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+PROMPT_CACHE_CONTROL = "public, max-age=3600"
+
+# Played right after a recording while the reply is being prepared, shortest first
+ACK_TEXTS = [
+    "Got it.",
+    "Thanks, one moment.",
+    "Thank you for sharing that. Give me just a second.",
+]
+
+# (clip name, text) played instead of a reply when a turn is shed under
+# overload: to a caller who has had no reply yet, and to one who has
+FALLBACK_CLIPS = [
+    ("callback", "We're getting a lot of calls right now, so we'll call you back shortly. Thank you!"),
+    ("fallback_reply", "Thank you, that's really helpful feedback. Have a great day!"),
+]
 
-app = FastAPI()
+# (seconds, filename) of the pre-generated acknowledgement clips, shortest first
+ack_clips = []
 
-# Global dict to track if first reply was given for each call
-first_reply_given = {}
+# call_sid -> Event set whenever this process saves the call's result; wakes
+# a /twilio_result long-poll waiting for it
+_result_events = {}
 
-# Global dict to store processing results for async pattern
-call_results = {}
+# How often a long-poll re-reads call_store, for results saved by other workers
+RESULT_RECHECK_SECONDS = 0.25
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Warm up models and pre-generate intro audio on server start."""
-    warm_up_ollama()
-    # Pre-generate intro and goodbye audio with Edge-TTS voice
+async def pregenerate_prompts():
+    """
+    Pre-generates intro, goodbye, acknowledgement and fallback audio with the Edge-TTS
+    voice, concurrently, in TTS_AUDIO_FORMAT, and keeps them in memory for /audio.
+    """
     intro_text = "Hi there! Calling from Paradise Holidays, your travel assistant calling to collect feedback. How is your trip going so far?"
-    await synthesize_speech_async(intro_text, "intro.mp3")
     goodbye_text = "Thank you for your time. Have a great day!"
-    await synthesize_speech_async(goodbye_text, "goodbye.mp3")
-    logger.info("Intro and goodbye audio pre-generated with Edge-TTS voice.")
+    ack_names = [f"ack_{i}{AUDIO_EXTENSION}" for i in range(len(ACK_TEXTS))]
+    results = await asyncio.gather(
+        synthesize_speech_async(intro_text, f"intro{AUDIO_EXTENSION}", TTS_AUDIO_FORMAT),
+        synthesize_speech_async(goodbye_text, f"goodbye{AUDIO_EXTENSION}", TTS_AUDIO_FORMAT),
+        *[synthesize_speech_async(text, name, TTS_AUDIO_FORMAT) for text, name in zip(ACK_TEXTS, ack_names)],
+        *[synthesize_speech_async(text, f"{clip}{AUDIO_EXTENSION}", TTS_AUDIO_FORMAT) for clip, text in FALLBACK_CLIPS],
+    )
+    for result in results:
+        if "Error" in result:
+            raise RuntimeError(result)
+        hot_audio.load(result)
+    ack_clips[:] = sorted((audio_duration(hot_audio.get(name)[0]), name) for name in ack_names)
+    logger.info("Intro, goodbye, acknowledgement and fallback audio pre-generated with Edge-TTS voice.")
+
+
+prompt_audio = register("prompts", pregenerate_prompts)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens shared clients and starts warming up STT, embeddings, retriever, LLM
+    and prompt audio concurrently in the background, so the server accepts
+    requests right away; /ready reports when everything is loaded.
+    """
+    await start_clients()
+    warm_up_task = asyncio.create_task(warm_up_all())
+    yield
+    warm_up_task.cancel()
+    await close_clients()
+    shutdown_executors()
+    if journal is not None:
+        journal.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
 
+def save_result(call_sid: str, result: dict):
+    call_store.set(f"result:{call_sid}", result)
+    event = _result_events.get(call_sid)
+    if event is not None:
+        event.set()
 
-async def process_recording(call_sid: str, recording_url: str):
+
+def customer_phone(form_data) -> str:
+    """The customer's number: the dialled one on our outbound calls, the caller's on inbound ones."""
+    outbound = (form_data.get("Direction") or "").startswith("outbound")
+    return form_data.get("To" if outbound else "From")
+
+
+def choose_ack():
+    """
+    Picks the longest acknowledgement clip that should end before the reply
+    audio is ready, judging by recent turns; the shortest one before any turn
+    has been measured. Returns its filename, or None if replies come faster
+    than any clip.
     """
-    Background task: downloads recording, transcribes, generates LLM reply, synthesizes audio.
-    Stores the result in call_results[call_sid] when done.
+    if not ack_clips:
+        return None
+    expected = expected_first_audio()
+    if expected is None:
+        return ack_clips[0][1]
+    fitting = [name for seconds, name in ack_clips if seconds <= expected]
+    return fitting[-1] if fitting else None
+
+
+async def wait_for_result(call_sid: str, played: int):
     """
+    Long-poll: returns the call's result as soon as it has a chunk beyond the
+    `played` ones or is no longer streaming, or whatever it is after
+    RESULT_LONG_POLL_SECONDS.
+    """
+    deadline = asyncio.get_running_loop().time() + RESULT_LONG_POLL_SECONDS
+    event = _result_events.setdefault(call_sid, asyncio.Event())
     try:
-        logger.info(f"[BG] Starting processing for call {call_sid}")
-
-        # Download the recorded audio from Twilio
-        async with httpx.AsyncClient(auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)) as client:
-            audio_content = await client.get(recording_url)
-            audio_content.raise_for_status()
-
-        # Save the downloaded audio temporarily
-        unique_filename = f"{call_sid}_recorded.wav"
-        recorded_audio_path = os.path.join(AUDIO_UPLOAD_DIR, unique_filename)
-        with open(recorded_audio_path, "wb") as f:
-            f.write(audio_content.content)
-        logger.info(f"[BG] Recorded audio saved to: {recorded_audio_path}")
-
-        # 1. Transcribe audio
-        transcribed_text = transcribe_audio(recorded_audio_path)
-        os.remove(recorded_audio_path)
-        logger.info(f"[BG] Transcribed text for {call_sid}: {transcribed_text}")
-
-        if "Error" in transcribed_text:
-            call_results[call_sid] = {"status": "error", "error": "transcription_failed"}
-            return
-
-        # 2. Generate LLM reply using RAG
-        llm_reply = get_rag_response(transcribed_text)
-        if "Error" in llm_reply:
-            call_results[call_sid] = {"status": "error", "error": "llm_failed"}
-            return
-        logger.info(f"[BG] LLM Reply for {call_sid}: {llm_reply}")
-
-        # 3. Synthesize speech from LLM reply
-        if not first_reply_given.get(call_sid):
-            max_tts_length = 200
-            first_reply_given[call_sid] = True
-        else:
-            max_tts_length = 100
-        short_reply = llm_reply[:max_tts_length]
-        output_audio_filename = f"reply_{call_sid}.mp3"
-        synthesized_audio_path = await synthesize_speech_async(short_reply, output_audio_filename)
+        while True:
+            # Cleared before reading, so a save that lands after the read still wakes us
+            event.clear()
+            result = call_store.get(f"result:{call_sid}")
+            if result and (result["status"] != "streaming" or len(result["audio_urls"]) > played):
+                return result
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return result
+            try:
+                await asyncio.wait_for(event.wait(), min(remaining, RESULT_RECHECK_SECONDS))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        _result_events.pop(call_sid, None)
+
+
+def end_call(call_sid: str):
+    """Frees everything kept for a call that is over."""
+    call_store.delete(f"result:{call_sid}", f"played:{call_sid}", f"turns:{call_sid}")
+    end_session(call_sid)
+
+
+async def synthesize_chunk(call_sid: str, result: dict, text: str, previous_chunk: asyncio.Task = None):
+    """
+    Synthesizes one reply sentence (or reuses it from the TTS cache), then
+    publishes its URL to result["audio_urls"]. Chunks synthesize concurrently
+    but are published in order: each one waits for the previous chunk before
+    appending. Raises RuntimeError on TTS failure.
+    """
+    audio_filename = await tts_stage.call(synthesize_cached_async, text)
+    if previous_chunk is not None:
+        await previous_chunk
+    if "Error" in audio_filename:
+        raise RuntimeError(f"TTS failed for \"{text}\": {audio_filename}")
+    if result["status"] == "error":
+        # The reply was abandoned; don't overwrite the error
+        return
+    result["audio_urls"].append(f"{NGROK_URL}/audio/{audio_filename}")
+    save_result(call_sid, result)
+    if len(result["audio_urls"]) == 1:
+        first_audio()
+
+
+async def process_recording(call_sid: str, recording_url: str, phone: str = None, call_over: bool = False):
+    """
+    Background task: downloads recording, transcribes, streams the LLM reply and
+    synthesizes it sentence by sentence. Audio chunks are published to
+    the call's result in call_store as soon as each one is ready.
+    Stage latencies are recorded in app.metrics under this call's CallSid.
+
+    The turn runs under admission control; if it is shed, the caller hears a
+    pre-generated fallback clip and the call ends instead of stalling.
+    Every turn is recorded in the call journal. If the caller already hung
+    up (call_over), everything kept for the call is freed afterwards.
+    """
+    start_turn(call_sid)
+    outcome = "error"
+    turn = call_store.get(f"turns:{call_sid}") or 0
+    record = await new_turn_record(call_sid, turn, phone)
+    try:
+        async with admission.turn(FIRST_TURN if turn == 0 else LATER_TURN):
+            outcome = await run_turn(call_sid, recording_url, turn, record)
+    except Overloaded as e:
+        logger.warning(f"[BG] Shedding turn {turn} of call {call_sid}: {e}")
+        result = fallback_result(turn)
+        save_result(call_sid, result)
+        record.reply = result["text"]
+        outcome = "shed"
+    except Exception as e:
+        logger.error(f"[BG] Error processing call {call_sid}: {e}")
+        save_result(call_sid, {"status": "error", "error": str(e)})
+    finally:
+        timings = finish_turn(call_sid, outcome)
+        if journal is not None:
+            record.outcome = outcome
+            record.turn_s = timings["turn"]
+            record.first_audio_s = timings["first_audio"]
+            record.stages = timings["stages"]
+            journal.log_turn(record)
+        if call_over:
+            end_call(call_sid)
+
+
+async def new_turn_record(call_sid: str, turn: int, phone: str = None) -> TurnRecord:
+    """
+    A journal record for the turn, with the customer's booking and hotel if
+    the number is known. Loading the customer store happens on a thread.
+    """
+    customers = await customer_store.aget()
+    customer = (customers.lookup(phone) if customers and phone else None) or {}
+    return TurnRecord(call_sid, turn, time.time(), phone=phone,
+                      booking=customer.get("booking"), hotel=customer.get("hotel"))
 
-        if "Error" in synthesized_audio_path:
-            call_results[call_sid] = {"status": "error", "error": "tts_failed"}
-            return
 
-        logger.info(f"[BG] Audio ready for {call_sid}: {synthesized_audio_path}")
+def fallback_result(turn: int) -> dict:
+    """
+    The result of a shed turn: a "we'll call you back" clip if the caller has
+    had no reply yet, a generic reply otherwise. Either way the call ends.
+    """
+    clip, text = FALLBACK_CLIPS[0 if turn == 0 else 1]
+    return {"status": "done", "audio_urls": [f"{NGROK_URL}/audio/{clip}{AUDIO_EXTENSION}"],
+            "text": text, "end_call": True}
 
-        # Store result
-        audio_url = f"{NGROK_URL}/audio/{output_audio_filename}"
-        call_results[call_sid] = {
-            "status": "done",
-            "audio_url": audio_url,
-            "text": llm_reply
-        }
 
-    except Exception as e:
-        logger.error(f"[BG] Error processing call {call_sid}: {e}")
-        call_results[call_sid] = {"status": "error", "error": str(e)}
+async def run_turn(call_sid: str, recording_url: str, turn: int, record: TurnRecord) -> str:
+    """
+    Processes one admitted turn; returns its outcome, "done" or "error".
+    Fills in the transcript and reply of the turn's journal record.
+    """
+    logger.info(f"[BG] Starting processing for call {call_sid}")
+
+    # Download the recorded audio from Twilio into memory
+    with timed("download"):
+        audio_content = await send_with_retry(get_client("twilio"), "GET", recording_url)
+        audio_content.raise_for_status()
+    logger.info(f"[BG] Recorded audio downloaded for {call_sid}: {len(audio_content.content)} bytes")
+
+    # 1. Transcribe audio (off the event loop, on the STT worker pool).
+    # The WAV body is decoded straight into a NumPy buffer; nothing touches disk.
+    transcribed_text = await stt_stage.call_blocking(transcribe_audio, audio_content.content)
+    logger.info(f"[BG] Transcribed text for {call_sid}: {transcribed_text}")
+
+    if "Error" in transcribed_text:
+        save_result(call_sid, {"status": "error", "error": "transcription_failed"})
+        return "error"
+    record.transcript = transcribed_text
+    record.sentiment = sentiment_score(transcribed_text)
+
+    # 2+3. Stream the LLM reply and synthesize each sentence as soon as it is complete
+    max_tts_length = 200 if turn == 0 else 100
+    call_store.set(f"turns:{call_sid}", turn + 1)
+
+    # The result is published before the reply is finished; /twilio_result
+    # plays audio_urls as they appear and listens again once status is "done".
+    result = {"status": "streaming", "audio_urls": [], "text": ""}
+    save_result(call_sid, result)
+
+    chunk_task = None
+    spoken_length = 0
+    reply_sentences = stream_rag_response(transcribed_text, call_sid)
+    try:
+        async for sentence in reply_sentences:
+            result["text"] = f"{result['text']} {sentence}".strip()
+            short_sentence = sentence[:max_tts_length - spoken_length]
+            spoken_length += len(short_sentence)
+            chunk_task = asyncio.create_task(synthesize_chunk(call_sid, result, short_sentence, chunk_task))
+            if spoken_length >= max_tts_length:
+                break
+    except RuntimeError as e:
+        logger.error(f"[BG] LLM streaming failed for {call_sid}: {e}")
+        if chunk_task is not None:
+            chunk_task.cancel()
+        result.update({"status": "error", "error": "llm_failed"})
+        save_result(call_sid, result)
+        return "error"
+    finally:
+        # Stops generation right away if we broke out at the length limit
+        await reply_sentences.aclose()
+        record.reply = result["text"] or None
+    logger.info(f"[BG] LLM Reply for {call_sid}: {result['text']}")
+
+    if chunk_task is not None:
+        try:
+            await chunk_task
+        except RuntimeError as e:
+            logger.error(f"[BG] {e}")
+            result.update({"status": "error", "error": "tts_failed"})
+            save_result(call_sid, result)
+            return "error"
+
+    logger.info(f"[BG] Audio ready for {call_sid}: {len(result['audio_urls'])} chunk(s)")
+    result["status"] = "done"
+    save_result(call_sid, result)
+    return "done"
 
 
 @app.post("/twilio_voice")
@@ -115,15 +361,23 @@ async def twilio_voice(request: Request):
     if recording_url:
         logger.info(f"Recording URL received for {call_sid}. Starting background processing.")
 
-        # Kick off processing in the background
-        asyncio.create_task(process_recording(call_sid, recording_url))
-
-        # Respond IMMEDIATELY to Twilio — silent pause then check for results
-        response.pause(length=2)
+        # Kick off processing in the background. A caller who hangs up while
+        # being recorded still sends the recording, with a final CallStatus;
+        # this is the only sign an inbound call has ended (they have no status callback).
+        call_over = form_data.get("CallStatus") in FINAL_STATUSES
+        asyncio.create_task(process_recording(call_sid, recording_url, customer_phone(form_data), call_over))
+
+        # Respond IMMEDIATELY to Twilio: acknowledge the caller while the reply
+        # is prepared, then long-poll /twilio_result for it
+        ack = choose_ack()
+        if ack:
+            response.play(f"{NGROK_URL}/audio/{ack}")
         response.redirect(f"{NGROK_URL}/twilio_result/{call_sid}", method="POST")
     else:
         logger.info(f"No recording URL for {call_sid}. Starting conversation.")
-        intro_audio_url = f"{NGROK_URL}/audio/intro.mp3"
+        if CALL_PREFETCH_ENABLED:
+            asyncio.create_task(prefetch_call(call_sid, customer_phone(form_data)))
+        intro_audio_url = f"{NGROK_URL}/audio/intro{AUDIO_EXTENSION}"
         response.play(intro_audio_url)
         response.record(action="/twilio_voice", maxLength="15", timeout="5", transcribe=True)
 
@@ -133,35 +387,75 @@ async def twilio_voice(request: Request):
 @app.post("/twilio_result/{call_sid}")
 async def twilio_result(call_sid: str, request: Request):
     """
-    Polling endpoint — Twilio redirects here to check if processing is done.
-    If done: plays the audio response.
-    If not done: pauses briefly and redirects back (retry loop).
+    Long-polling endpoint — Twilio redirects here to fetch the reply. Holds
+    the request until a reply chunk is ready (or RESULT_LONG_POLL_SECONDS
+    pass), plays every ready chunk, then redirects back for the rest.
+    Once the last chunk of a finished reply has been played, records the
+    caller's answer for the next turn, up to CALL_MAX_TURNS replies, unless
+    the turn was shed.
     """
     response = VoiceResponse()
-    result = call_results.get(call_sid)
-
-    if result and result["status"] == "done":
-        logger.info(f"Result ready for {call_sid}. Playing audio: {result['audio_url']}")
-        # Clean up
-        del call_results[call_sid]
-        # Play the response and end the call
-        response.play(result["audio_url"])
-        response.hangup()
+    played = call_store.get(f"played:{call_sid}") or 0
+    result = await wait_for_result(call_sid, played)
 
-    elif result and result["status"] == "error":
+    if result and result["status"] == "error":
         logger.error(f"Processing failed for {call_sid}: {result['error']}")
-        del call_results[call_sid]
+        end_call(call_sid)
         response.say("I apologize, but I encountered an error processing your feedback.")
 
+    elif result and result["status"] in ("streaming", "done"):
+        # Play every chunk that is ready but has not been played yet
+        pending_urls = result["audio_urls"][played:]
+        for audio_url in pending_urls:
+            logger.info(f"Chunk ready for {call_sid}. Playing audio: {audio_url}")
+            response.play(audio_url)
+        played += len(pending_urls)
+
+        if result["status"] == "done" and played == len(result["audio_urls"]):
+            call_store.delete(f"result:{call_sid}", f"played:{call_sid}")
+            if not result.get("end_call") and (call_store.get(f"turns:{call_sid}") or 0) < CALL_MAX_TURNS:
+                # Listen for the next turn; Twilio only moves on to the goodbye if the caller stays silent
+                response.record(action="/twilio_voice", maxLength="15", timeout="5")
+            response.redirect(f"{NGROK_URL}/twilio_goodbye/{call_sid}", method="POST")
+        else:
+            call_store.set(f"played:{call_sid}", played)
+            if not pending_urls:
+                logger.info(f"Still processing {call_sid}. Waiting...")
+            response.redirect(f"{NGROK_URL}/twilio_result/{call_sid}", method="POST")
+
     else:
-        # Still processing — wait and check again
+        # Still processing after the long-poll deadline — ask again right away
         logger.info(f"Still processing {call_sid}. Waiting...")
-        response.pause(length=2)
         response.redirect(f"{NGROK_URL}/twilio_result/{call_sid}", method="POST")
 
     return Response(content=str(response), media_type="application/xml")
 
 
+@app.post("/twilio_goodbye/{call_sid}")
+async def twilio_goodbye(call_sid: str):
+    """
+    Ends the conversation: frees the call's session and plays the goodbye.
+    """
+    logger.info(f"Ending call {call_sid}.")
+    end_call(call_sid)
+    response = VoiceResponse()
+    response.play(f"{NGROK_URL}/audio/goodbye{AUDIO_EXTENSION}")
+    response.hangup()
+    return Response(content=str(response), media_type="application/xml")
+
+
+@app.post("/twilio_status")
+async def twilio_status(request: Request):
+    """
+    Twilio status callback: frees the session of a call the customer hung up
+    on mid-conversation.
+    """
+    form_data = await request.form()
+    if form_data.get("CallStatus") in FINAL_STATUSES:
+        end_call(form_data.get("CallSid"))
+    return Response(status_code=204)
+
+
 @app.post("/process_audio/")
 async def process_audio(audio_file: UploadFile = File(...)):
     logger.info(f"Received audio processing request for file: {audio_file.filename}")
@@ -169,46 +463,218 @@ async def process_audio(audio_file: UploadFile = File(...)):
         logger.error(f"Invalid file format received: {audio_file.filename}")
         raise HTTPException(status_code=400, detail="Invalid file format. Only WAV, MP3, OGG are supported.")
 
-    unique_filename = f"{uuid.uuid4()}_{audio_file.filename}"
-    audio_path = os.path.join(AUDIO_UPLOAD_DIR, unique_filename)
-    with open(audio_path, "wb") as buffer:
-        shutil.copyfileobj(audio_file.file, buffer)
-    logger.info(f"Audio file saved temporarily to: {audio_path}")
+    audio_bytes = await audio_file.read()
+    logger.info(f"Audio file received in memory: {len(audio_bytes)} bytes")
 
-    transcribed_text = transcribe_audio(audio_path)
+    transcribed_text = await stt_stage.call_blocking(transcribe_audio, audio_bytes)
     if "Error" in transcribed_text:
         logger.error(f"STT Error for {audio_file.filename}: {transcribed_text}")
         raise HTTPException(status_code=500, detail=f"STT Error: {transcribed_text}")
     logger.info(f"Transcribed text: {transcribed_text}")
 
-    llm_reply = get_rag_response(transcribed_text)
+    llm_reply = await get_rag_response_async(transcribed_text)
     if "Error" in llm_reply:
         logger.error(f"RAG Error for \"{transcribed_text}\": {llm_reply}")
         raise HTTPException(status_code=500, detail=f"RAG Error: {llm_reply}")
     logger.info(f"LLM Reply (from RAG): {llm_reply}")
 
-    output_audio_filename = f"reply_{uuid.uuid4()}.mp3"
-    synthesized_audio_path = await synthesize_speech_async(llm_reply, output_audio_filename)
-    if "Error" in synthesized_audio_path:
-        logger.error(f"TTS Error for \"{llm_reply}\": {synthesized_audio_path}")
-        raise HTTPException(status_code=500, detail=f"TTS Error: {synthesized_audio_path}")
+    audio_filename = await tts_stage.call(synthesize_cached_async, llm_reply)
+    if "Error" in audio_filename:
+        logger.error(f"TTS Error for \"{llm_reply}\": {audio_filename}")
+        raise HTTPException(status_code=500, detail=f"TTS Error: {audio_filename}")
+    synthesized_audio_path = tts_cache.path_for(audio_filename)
     logger.info(f"Synthesized audio saved to: {synthesized_audio_path}")
 
-    os.remove(audio_path)
-    logger.info(f"Cleaned up temporary audio file: {audio_path}")
-
     return {"transcribed_text": transcribed_text, "llm_reply": llm_reply, "reply_audio_path": synthesized_audio_path}
 
 
+@app.post("/admin/reload_index")
+async def reload_knowledge_base():
+    """
+    Re-indexes data/knowledge_base.md incrementally and hot-swaps the retriever.
+    """
+    summary = await retrieval_stage.call_blocking(reload_index)
+    if summary is None:
+        raise HTTPException(status_code=500, detail="Re-indexing failed. Check the server log.")
+    logger.info(f"Knowledge base re-indexed: {summary}")
+    return summary
+
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once every component is loaded, 503 until then.
+    Reports each component's state and load time.
+    """
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/pipeline/stats")
+async def get_pipeline_stats():
+    """
+    Reports concurrency limit, queue depth and activity for each pipeline stage.
+    """
+    return pipeline_stats()
+
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    """
+    Reports turns in flight and waiting for admission, the estimated wait and turns shed by limit.
+    """
+    return admission.stats()
+
+
+@app.get("/journal/stats")
+async def get_journal_stats():
+    """
+    Reports call journal records written, queued and dropped, batch sizes and file rollovers.
+    """
+    return journal.stats() if journal else {"enabled": False}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics: per-stage latency histograms (use histogram_quantile for
+    p50/p95/p99), time to first audio, turns in flight and stage queue depth.
+    """
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/tts/cache")
+async def get_tts_cache_stats():
+    """
+    Reports TTS cache size, hit/miss counters and evictions.
+    """
+    return tts_cache.stats()
+
+
+@app.get("/llm/cache")
+async def get_llm_cache_stats():
+    """
+    Reports semantic response cache hit rate and LLM time saved, for tuning the threshold.
+    """
+    return response_cache.stats() if response_cache else {"enabled": False}
+
+
+@app.get("/embeddings/stats")
+async def get_embedding_stats():
+    """
+    Reports the embedding backend, query memo hit rate and micro-batch sizes.
+    """
+    service = embeddings_model.value
+    return service.stats() if service else {"loaded": False}
+
+
+@app.get("/llm/stats")
+async def get_llm_stats():
+    """
+    Reports the LLM backend, the saved LLM contexts (calls, bytes, evictions) and, for
+    llama.cpp, batch sizes, system prompt reuse and session restores.
+    """
+    return {**llm_backend.stats(), **session_stats()}
+
+
+@app.post("/batch_jobs")
+async def start_batch_job(source: str = Body(...), output: str = Body(...), generate_replies: bool = Body(True)):
+    """
+    Starts an offline batch job over a directory or manifest of recordings on
+    the server. Both paths are relative to BATCH_DIR and must stay inside it.
+    Results are appended to the output JSONL; resubmitting the same job resumes it.
+    """
+    try:
+        source = resolve_under(BATCH_DIR, source)
+        output = resolve_under(BATCH_DIR, output)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Paths must be inside the batch directory.")
+    if not os.path.exists(source):
+        raise HTTPException(status_code=400, detail="Source not found.")
+    if not os.path.isdir(os.path.dirname(output)):
+        raise HTTPException(status_code=400, detail="Output directory not found.")
+    job = BatchJob(source, output, generate_replies=generate_replies, root=BATCH_DIR)
+    batch_jobs[job.id] = job
+    asyncio.create_task(job.run())
+    logger.info(f"Started batch job {job.id} for {source} -> {output}")
+    return job.status()
+
+
+@app.get("/batch_jobs/{job_id}")
+async def get_batch_job(job_id: str):
+    """
+    Reports progress and throughput of a batch job.
+    """
+    job = batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found.")
+    return job.status()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    True if an If-None-Match header (a comma-separated list of ETags, or *)
+    names the ETag. Uses the weak comparison the header calls for: a W/
+    prefix on either side is ignored.
+    """
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+
+def memory_audio_response(request: Request, data: bytes, headers: dict, media_type: str) -> Response:
+    """
+    Serves audio held in memory, honouring a single-range Range header
+    (bytes=start-end, start- or -suffix) like FileResponse does for files.
+    """
+    headers = {**headers, "Accept-Ranges": "bytes"}
+    range_header = request.headers.get("range", "")
+    if not range_header.startswith("bytes=") or "," in range_header:
+        return Response(content=data, headers=headers, media_type=media_type)
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else len(data) - 1
+        else:
+            start, end = max(0, len(data) - int(last)), len(data) - 1
+    except ValueError:
+        return Response(content=data, headers=headers, media_type=media_type)
+    end = min(end, len(data) - 1)
+    if start > end:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(data)}"})
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+    return Response(content=data[start:end + 1], status_code=206, headers=headers, media_type=media_type)
+
+
 @app.get("/audio/{filename}")
-async def get_audio(filename: str):
+async def get_audio(filename: str, request: Request):
     """
-    Serves synthesized audio files.
+    Serves synthesized audio: prompts from memory, then the TTS cache, then
+    AUDIO_OUTPUT_DIR. Responses carry an ETag and Cache-Control, answer
+    If-None-Match with 304 and support Range requests.
     """
-    file_path = os.path.join(AUDIO_OUTPUT_DIR, filename)
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="Audio file not found.")
-    return FileResponse(file_path, media_type="audio/mpeg")
+    filename = os.path.basename(filename)
+    media_type = media_type_for(filename)
+    clip = hot_audio.get(filename)
+    cached_path = None if clip else tts_cache.get(filename)
+    if clip:
+        data, etag = clip
+        headers = {"ETag": etag, "Cache-Control": PROMPT_CACHE_CONTROL}
+    elif cached_path:
+        # The filename is the content hash, so it doubles as a strong ETag
+        headers = {"ETag": f'"{os.path.splitext(filename)[0]}"', "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    else:
+        file_path = os.path.join(AUDIO_OUTPUT_DIR, filename)
+        if not os.path.exists(file_path):
+            raise HTTPException(status_code=404, detail="Audio file not found.")
+        # FileResponse derives the ETag from the file's size and mtime
+        return FileResponse(file_path, media_type=media_type, headers={"Cache-Control": PROMPT_CACHE_CONTROL})
+
+    if etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if clip:
+        return memory_audio_response(request, data, headers, media_type)
+    return FileResponse(cached_path, media_type=media_type, headers=headers)
 
 
 if __name__ == "__main__":
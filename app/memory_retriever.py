@@ -0,0 +1,84 @@
+import json
+import os
+
+import numpy as np
+from langchain_core.documents import Document
+
+VECTORS_FILE = "vectors.npy"
+TEXTS_FILE = "texts.json"
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Returns a contiguous float32 copy of the vectors scaled to unit length."""
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def save_matrix(directory: str, texts: list, vectors):
+    """
+    Writes chunk texts and their normalized embeddings so NumpyRetriever
+    can load (or memory-map) them without Chroma.
+    """
+    os.makedirs(directory, exist_ok=True)
+    matrix = normalize_rows(vectors)
+    vectors_path = os.path.join(directory, VECTORS_FILE)
+    texts_path = os.path.join(directory, TEXTS_FILE)
+    np.save(f"{vectors_path}.tmp.npy", matrix)
+    with open(f"{texts_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(texts, f, ensure_ascii=False)
+    os.replace(f"{vectors_path}.tmp.npy", vectors_path)
+    os.replace(f"{texts_path}.tmp", texts_path)
+
+
+class NumpyRetriever:
+    """
+    Brute-force retriever over a small knowledge base. Chunk embeddings are
+    held in one contiguous, row-normalized float32 matrix, so top-k is a single
+    matrix-vector product plus argpartition. Drop-in for the LangChain
+    retriever's invoke(); batch_invoke answers several queries in one product.
+    """
+
+    def __init__(self, texts: list, vectors, embeddings, k: int = 2):
+        self.texts = texts
+        self.matrix = vectors if isinstance(vectors, np.memmap) else normalize_rows(vectors)
+        self.embeddings = embeddings
+        self.k = k
+
+    @classmethod
+    def from_directory(cls, directory: str, embeddings, k: int = 2, mmap: bool = False):
+        """Loads a matrix written by save_matrix, memory-mapped if requested."""
+        with open(os.path.join(directory, TEXTS_FILE), "r", encoding="utf-8") as f:
+            texts = json.load(f)
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        return cls(texts, vectors, embeddings, k=k)
+
+    def _top_k(self, scores: np.ndarray) -> np.ndarray:
+        """Indices of the k highest scores along the last axis, best first."""
+        k = min(self.k, scores.shape[-1])
+        if k < scores.shape[-1]:
+            top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+        else:
+            top = np.broadcast_to(np.arange(k), scores.shape[:-1] + (k,))
+        order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1)
+        return np.take_along_axis(top, order, axis=-1)
+
+    def search_vectors(self, query_vectors) -> list:
+        """Returns, for each query vector, the top-k (text index, score) pairs."""
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        scores = queries @ self.matrix.T
+        top = self._top_k(scores)
+        return [[(int(i), float(row[i])) for i in idx] for idx, row in zip(top, scores)]
+
+    def _documents(self, hits: list) -> list:
+        return [Document(page_content=self.texts[i], metadata={"score": score}) for i, score in hits]
+
+    def invoke(self, query: str) -> list:
+        return self.batch_invoke([query])[0]
+
+    def batch_invoke(self, queries: list) -> list:
+        if not self.texts:
+            return [[] for _ in queries]
+        query_vectors = self.embeddings.embed_documents(queries) if len(queries) > 1 else [self.embeddings.embed_query(queries[0])]
+        return [self._documents(hits) for hits in self.search_vectors(query_vectors)]
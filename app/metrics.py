@@ -0,0 +1,139 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+from app.config import CALL_TRACE_DIR, CALL_TRACE_ENABLED
+
+# Phone-call latencies: tens of milliseconds up to the point where Twilio gives up
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "call_stage_seconds", "Time spent running each pipeline stage", ["stage"], buckets=LATENCY_BUCKETS,
+)
+STAGE_WAIT_SECONDS = Histogram(
+    "call_stage_wait_seconds", "Time spent queued for a stage slot", ["stage"], buckets=LATENCY_BUCKETS,
+)
+TURN_SECONDS = Histogram(
+    "call_turn_seconds", "Recording received to last reply chunk ready", buckets=LATENCY_BUCKETS,
+)
+FIRST_AUDIO_SECONDS = Histogram(
+    "call_first_audio_seconds", "Recording received to first reply chunk ready", buckets=LATENCY_BUCKETS,
+)
+TURNS = Counter("call_turns_total", "Processed turns by outcome", ["outcome"])
+CALLS_IN_FLIGHT = Gauge("calls_in_flight", "Turns currently being processed")
+STAGE_QUEUE_DEPTH = Gauge("stage_queue_depth", "Calls waiting for a stage slot", ["stage"])
+STAGE_ACTIVE = Gauge("stage_active", "Calls running in a stage", ["stage"])
+
+# The call (and when its turn started) processed by the current task;
+# inherited by the tasks it creates, e.g. the TTS chunk tasks
+current_call_sid = ContextVar("current_call_sid", default=None)
+current_turn_start = ContextVar("current_turn_start", default=None)
+
+# Timings of the turn processed by the current task, shared with the tasks it
+# creates: {"stages": {stage: seconds, summed over runs}, "first_audio": seconds}
+current_turn_timings = ContextVar("current_turn_timings", default=None)
+
+# call_sid -> list of trace spans, only while CALL_TRACE_ENABLED
+_traces = {}
+
+# Exponentially weighted recent time to first audio, seen by /twilio_voice
+# when it picks an acknowledgement clip; None until a turn has produced audio
+FIRST_AUDIO_SMOOTHING = 0.2
+_expected_first_audio = None
+
+
+def track_stage(stage):
+    """Exports a pipeline Stage's queue depth and active count as gauges."""
+    STAGE_QUEUE_DEPTH.labels(stage.name).set_function(lambda: stage.queued)
+    STAGE_ACTIVE.labels(stage.name).set_function(lambda: stage.active)
+
+
+def _trace(stage: str, seconds: float, wait_seconds: float = None):
+    call_sid = current_call_sid.get()
+    if call_sid is not None:
+        _traces.setdefault(call_sid, []).append({
+            "stage": stage,
+            "seconds": round(seconds, 4),
+            "wait_seconds": round(wait_seconds, 4) if wait_seconds is not None else None,
+            "at": time.time(),
+        })
+
+
+def record(stage: str, seconds: float, wait_seconds: float = None):
+    """Observes one stage run and adds it to the current call's trace and turn timings."""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = current_turn_timings.get()
+    if timings is not None:
+        timings["stages"][stage] = timings["stages"].get(stage, 0.0) + seconds
+    if wait_seconds is not None:
+        STAGE_WAIT_SECONDS.labels(stage).observe(wait_seconds)
+    if CALL_TRACE_ENABLED:
+        _trace(stage, seconds, wait_seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """Times the block as one run of `stage` for the current call."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def start_turn(call_sid: str):
+    """Marks the current task as processing a turn of `call_sid`."""
+    current_call_sid.set(call_sid)
+    current_turn_start.set(time.perf_counter())
+    current_turn_timings.set({"stages": {}, "first_audio": None})
+    CALLS_IN_FLIGHT.inc()
+
+
+def first_audio():
+    """Records time to first audio for the current turn."""
+    global _expected_first_audio
+    start = current_turn_start.get()
+    if start is not None:
+        seconds = time.perf_counter() - start
+        FIRST_AUDIO_SECONDS.observe(seconds)
+        timings = current_turn_timings.get()
+        if timings is not None:
+            timings["first_audio"] = seconds
+        if _expected_first_audio is None:
+            _expected_first_audio = seconds
+        else:
+            _expected_first_audio += FIRST_AUDIO_SMOOTHING * (seconds - _expected_first_audio)
+        if CALL_TRACE_ENABLED:
+            _trace("first_audio", seconds)
+
+
+def expected_first_audio():
+    """How long a new turn can expect to wait for its first reply audio, or None if unknown."""
+    return _expected_first_audio
+
+
+def finish_turn(call_sid: str, outcome: str) -> dict:
+    """
+    Closes a turn: records its duration and outcome and dumps the trace if
+    enabled. Returns the turn's timings: {"turn", "first_audio", "stages"}.
+    """
+    CALLS_IN_FLIGHT.dec()
+    TURNS.labels(outcome).inc()
+    seconds = time.perf_counter() - current_turn_start.get()
+    if outcome == "done":
+        TURN_SECONDS.observe(seconds)
+    if CALL_TRACE_ENABLED:
+        spans = _traces.pop(call_sid, [])
+        path = os.path.join(CALL_TRACE_DIR, f"{call_sid}.jsonl")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"call_sid": call_sid, "outcome": outcome, "spans": spans}) + "\n")
+    return {"turn": seconds, **current_turn_timings.get()}
+
+
+def metrics_payload() -> tuple:
+    """Returns the Prometheus exposition body and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
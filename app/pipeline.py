@@ -0,0 +1,118 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from app.metrics import record, track_stage
+from app.config import (
+    STT_WORKERS, STT_CONCURRENCY, RETRIEVAL_CONCURRENCY, LLM_CONCURRENCY, TTS_CONCURRENCY,
+)
+
+
+# Weight of the latest run in a stage's smoothed run time
+RUN_TIME_SMOOTHING = 0.2
+
+
+class Stage:
+    """
+    One step of the call pipeline (STT, retrieval, LLM, TTS) with its own
+    concurrency limit. Blocking work runs on the stage's executor so it never
+    holds up the event loop; async work runs on the loop under the same limit.
+    Tracks how many calls are waiting (queue depth) and running, and a
+    smoothed run time to estimate how long a new call would wait.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, executor: ThreadPoolExecutor = None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.executor = executor
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.recent_seconds = None
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Holds one of the stage's concurrency slots for the duration of the block.
+        Queue wait and run time are recorded in the stage metrics.
+        """
+        queued_at = time.perf_counter()
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        started_at = time.perf_counter()
+        self.active += 1
+        try:
+            yield
+            self.completed += 1
+        except Exception:
+            # Cancellation and GeneratorExit (a reply cut short by its consumer) are not failures
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+            seconds = time.perf_counter() - started_at
+            if self.recent_seconds is None:
+                self.recent_seconds = seconds
+            else:
+                self.recent_seconds += RUN_TIME_SMOOTHING * (seconds - self.recent_seconds)
+            record(self.name, seconds, wait_seconds=started_at - queued_at)
+
+    def estimated_wait(self) -> float:
+        """Seconds a call arriving now would queue for a slot, judging by recent run times."""
+        if self.active < self.max_concurrency or not self.recent_seconds:
+            return 0.0
+        return (self.queued + 1) * self.recent_seconds / self.max_concurrency
+
+    async def call(self, func, *args):
+        """Awaits the async function func(*args) inside a stage slot."""
+        async with self.slot():
+            return await func(*args)
+
+    async def call_blocking(self, func, *args):
+        """Runs the blocking function func(*args) on the stage executor inside a stage slot."""
+        async with self.slot():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "estimated_wait_s": round(self.estimated_wait(), 3),
+        }
+
+
+# faster-whisper releases the GIL while decoding, so a thread pool sized to the
+# cores gives real parallelism without copying the model into every process.
+stt_executor = ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_CONCURRENCY, thread_name_prefix="retrieval")
+
+stt_stage = Stage("stt", STT_CONCURRENCY, executor=stt_executor)
+retrieval_stage = Stage("retrieval", RETRIEVAL_CONCURRENCY, executor=retrieval_executor)
+llm_stage = Stage("llm", LLM_CONCURRENCY)
+tts_stage = Stage("tts", TTS_CONCURRENCY)
+
+STAGES = [stt_stage, retrieval_stage, llm_stage, tts_stage]
+for _stage in STAGES:
+    track_stage(_stage)
+
+
+def pipeline_stats() -> dict:
+    """Returns queue depth and activity counters for every stage."""
+    return {stage.name: stage.stats() for stage in STAGES}
+
+
+def shutdown_executors():
+    """Stops the stage worker threads; called on server shutdown."""
+    stt_executor.shutdown(wait=False, cancel_futures=True)
+    retrieval_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,96 @@
+import time
+
+import numpy as np
+
+from app.config import SEMANTIC_CACHE_CAPACITY, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL
+
+
+class SemanticCache:
+    """
+    Remembers recent (utterance, reply) pairs by utterance embedding and returns
+    the stored reply for a new utterance whose cosine similarity to a cached one
+    is at least `threshold`. Entries expire after `ttl` seconds; when full, the
+    least recently used entry is replaced.
+    """
+
+    def __init__(self, capacity: int, threshold: float, ttl: float):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._matrix = None  # capacity x dim, rows are unit vectors; allocated on first put
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._created = np.zeros(capacity)
+        self._last_used = np.zeros(capacity)
+        self._entries = [None] * capacity
+        self.lookups = 0
+        self.hits = 0
+        self.saved_llm_ms = 0.0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float):
+        self._valid &= self._created > now - self.ttl
+
+    def lookup(self, vector):
+        """Returns the cached entry closest to the vector if it is similar enough, else None."""
+        now = time.monotonic()
+        self.lookups += 1
+        if self._matrix is None:
+            return None
+        self._expire(now)
+        if not self._valid.any():
+            return None
+
+        scores = self._matrix @ self._normalize(vector)
+        scores[~self._valid] = -np.inf
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        self.hits += 1
+        self._last_used[best] = now
+        entry = self._entries[best]
+        self.saved_llm_ms += entry["llm_ms"]
+        return dict(entry, similarity=float(scores[best]))
+
+    def put(self, vector, utterance: str, reply: str, llm_ms: float):
+        """Stores a reply and how long the LLM took to produce it."""
+        now = time.monotonic()
+        vector = self._normalize(vector)
+        if self._matrix is None:
+            self._matrix = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+        self._expire(now)
+
+        free = np.flatnonzero(~self._valid)
+        slot = int(free[0]) if free.size else int(np.argmin(self._last_used))
+        self._matrix[slot] = vector
+        self._valid[slot] = True
+        self._created[slot] = now
+        self._last_used[slot] = now
+        self._entries[slot] = {"utterance": utterance, "reply": reply, "llm_ms": llm_ms}
+
+    def clear(self):
+        """Drops every entry; counters are kept."""
+        self._valid[:] = False
+        self._entries = [None] * self.capacity
+
+    def stats(self) -> dict:
+        return {
+            "entries": int(self._valid.sum()),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "saved_llm_ms": round(self.saved_llm_ms, 1),
+        }
+
+
+# A capacity of 0 disables the cache
+response_cache = SemanticCache(
+    SEMANTIC_CACHE_CAPACITY, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL
+) if SEMANTIC_CACHE_CAPACITY > 0 else None
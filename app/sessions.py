@@ -0,0 +1,61 @@
+from app.call_state import MemoryCallStore, call_store
+from app.config import SESSION_HISTORY_TOKENS, SESSION_MAX_CALLS, SESSION_MAX_BYTES, SESSION_IDLE_SECONDS
+
+# Rough token count for English text; Ollama doesn't expose its tokenizer
+CHARS_PER_TOKEN = 4
+
+# call_sid -> LLMSession. Saved model contexts are large and backend-specific,
+# so they stay in this process; a turn handled by another worker (or after an
+# eviction) re-sends the compact history instead.
+llm_sessions = MemoryCallStore(SESSION_IDLE_SECONDS, SESSION_MAX_CALLS, SESSION_MAX_BYTES, lambda s: s.nbytes)
+
+# Share of SESSION_MAX_BYTES past which prefetched contexts are not saved,
+# leaving the room to calls already in conversation
+PREFETCH_SESSION_FILL = 0.9
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def compact_history(turns: list, budget: int = SESSION_HISTORY_TOKENS) -> list:
+    """Keeps the most recent [customer, agent] turns that fit in budget tokens."""
+    kept = []
+    for customer, agent in reversed(turns):
+        budget -= estimate_tokens(customer) + estimate_tokens(agent)
+        if budget < 0:
+            break
+        kept.append([customer, agent])
+    return kept[::-1]
+
+
+def get_history(call_sid: str) -> list:
+    return call_store.get(f"history:{call_sid}") or []
+
+
+def add_turn(call_sid: str, customer: str, agent: str):
+    call_store.set(f"history:{call_sid}", compact_history(get_history(call_sid) + [[customer, agent]]))
+
+
+def get_trip_context(call_sid: str):
+    """The trip details prefetched for the call when it started, or None."""
+    return call_store.get(f"trip:{call_sid}")
+
+
+def set_trip_context(call_sid: str, context: str):
+    call_store.set(f"trip:{call_sid}", context)
+
+
+def end_session(call_sid: str):
+    """Frees a call's history, trip details and saved LLM context once it has hung up."""
+    call_store.delete(f"history:{call_sid}", f"trip:{call_sid}")
+    llm_sessions.delete(call_sid)
+
+
+def sessions_nearly_full() -> bool:
+    return llm_sessions.bytes > PREFETCH_SESSION_FILL * llm_sessions.max_bytes
+
+
+def session_stats() -> dict:
+    return {"sessions": len(llm_sessions), "session_bytes": llm_sessions.bytes,
+            "session_max_bytes": llm_sessions.max_bytes, "session_evictions": llm_sessions.evictions}
@@ -1,27 +1,86 @@
-from faster_whisper import WhisperModel
 import os
 
-# Load the Faster Whisper model
-# You might want to make the model size configurable (e.g., 'base', 'small', 'medium', 'large')
-# For local development, 'base' or 'small' might be sufficient.
-try:
-    # Using a smaller model for faster local inference, adjust as needed
+from app.audio import decode_audio_bytes
+from app.config import STT_WORKERS, STT_DEVICE, STT_COMPUTE_TYPE, STT_MODEL_SIZE, STT_PROFILE, STT_VAD
+from app.components import register
+
+# Decoding settings per profile. Greedy decoding without timestamps is several
+# times faster than beam 5 on CPU and is plenty for short phone answers.
+DECODE_PROFILES = {
+    "fast": {"beam_size": 1, "best_of": 1, "temperature": 0.0,
+             "without_timestamps": True, "condition_on_previous_text": False},
+    "balanced": {"beam_size": 2, "best_of": 2, "without_timestamps": True,
+                 "condition_on_previous_text": False},
+    "accurate": {"beam_size": 5},
+}
+
+# Silero VAD drops silence (e.g. the up to 5 s Twilio keeps recording after the
+# caller stops) before decoding, so Whisper only sees speech
+VAD_PARAMETERS = {"min_silence_duration_ms": 500, "speech_pad_ms": 200}
+
+
+def detect_hardware() -> dict:
+    """
+    Resolves "auto" STT settings: float16 on CUDA, int8 on CPU, and a model
+    size the device can decode faster than real time.
+    """
+    import ctranslate2
+    device = STT_DEVICE
+    if device == "auto":
+        device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    compute_type = STT_COMPUTE_TYPE
+    if compute_type == "auto":
+        compute_type = "float16" if device == "cuda" else "int8"
+    model_size = STT_MODEL_SIZE
+    if model_size == "auto":
+        if device == "cuda":
+            model_size = "small"
+        else:
+            model_size = "base" if (os.cpu_count() or 1) >= 4 else "tiny"
+    return {"device": device, "compute_type": compute_type, "model_size": model_size}
+
+
+def load_whisper_model(model_size: str, device: str, compute_type: str):
+    from faster_whisper import WhisperModel
     # The model will be downloaded to ~/.cache/huggingface/hub if not present
-    model = WhisperModel("base", device="cuda", compute_type="float16") # Using GPU for faster inference
-except Exception as e:
-    print(f"Error loading Faster Whisper model: {e}")
-    model = None
+    # num_workers lets the STT stage pool run that many transcriptions in parallel;
+    # on CPU the cores are split between them instead of each worker using all
+    cpu_threads = max(1, (os.cpu_count() or 1) // STT_WORKERS) if device == "cpu" else 0
+    return WhisperModel(model_size, device=device, compute_type=compute_type,
+                        cpu_threads=cpu_threads, num_workers=STT_WORKERS)
+
+
+def _load_whisper_model():
+    settings = detect_hardware()
+    print(f"Loading Faster Whisper '{settings['model_size']}' on {settings['device']} ({settings['compute_type']})")
+    return load_whisper_model(**settings)
+
+
+# The Faster Whisper model is loaded on first use (or by the startup warm-up), not at import
+whisper_model = register("stt", _load_whisper_model)
+
 
-def transcribe_audio(audio_path: str) -> str:
+def transcribe_audio(audio, profile: str = STT_PROFILE, vad: bool = STT_VAD, model=None) -> str:
     """
-    Transcribes an audio file using the Faster Whisper model.
+    Transcribes audio using the Faster Whisper model, with the given decode
+    profile and optional VAD silence trimming. `audio` is a file path, the
+    raw bytes of a recording (decoded in memory, no temp file) or a 16 kHz
+    float32 NumPy array.
     """
+    model = model or whisper_model.get()
     if model is None:
         return "Faster Whisper model not loaded. Cannot transcribe audio."
-    if not os.path.exists(audio_path):
-        return f"Audio file not found: {audio_path}"
+    if isinstance(audio, str) and not os.path.exists(audio):
+        return f"Audio file not found: {audio}"
     try:
-        segments, info = model.transcribe(audio_path, beam_size=5)
+        if isinstance(audio, (bytes, bytearray, memoryview)):
+            audio = decode_audio_bytes(audio)
+        segments, info = model.transcribe(
+            audio,
+            vad_filter=vad,
+            vad_parameters=VAD_PARAMETERS if vad else None,
+            **DECODE_PROFILES[profile],
+        )
         transcribed_text = "".join([segment.text for segment in segments])
         return transcribed_text
     except Exception as e:
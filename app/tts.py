@@ -1,31 +1,252 @@
 import edge_tts
 import asyncio
+import hashlib
 import os
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
 
-# Define the path for saving audio files
-AUDIO_OUTPUT_DIR = "audio_output"
-
-# Ensure the output directory exists
-if not os.path.exists(AUDIO_OUTPUT_DIR):
-    os.makedirs(AUDIO_OUTPUT_DIR)
+from app.audio import AUDIO_FORMATS, transcode_for_telephony
+from app.config import AUDIO_OUTPUT_DIR, TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES, TTS_AUDIO_FORMAT
 
 # Edge-TTS voice - natural sounding English voice
 VOICE = "en-IN-NeerjaExpressiveNeural"
 
+# Edge-TTS default output format; part of the cache key
+OUTPUT_FORMAT = "audio-24khz-48kbitrate-mono-mp3"
+
+# File extension of audio in TTS_AUDIO_FORMAT, e.g. intro.wav for "mulaw"
+AUDIO_EXTENSION = AUDIO_FORMATS[TTS_AUDIO_FORMAT][0]
+
+
+# Temp files younger than this may still be being written by another worker
+TEMP_FILE_GRACE_SECONDS = 10 * 60
+
+# How often a worker re-indexes the cache directory, so files written by the
+# other workers count against the shared byte budget
+RESCAN_SECONDS = 60
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so trivially different strings share one cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text: str, voice: str = VOICE, output_format: str = OUTPUT_FORMAT,
+              audio_format: str = TTS_AUDIO_FORMAT) -> str:
+    key = f"{voice}\n{output_format}\n{audio_format}\n{normalize_text(text)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def media_type_for(filename: str) -> str:
+    return "audio/wav" if filename.endswith(".wav") else "audio/mpeg"
+
+
+class TTSCache:
+    """
+    Content-addressed store of synthesized audio on disk. Files are named by
+    the hash of (voice, output format, normalized text) and evicted least
+    recently used first once the total size exceeds max_bytes.
 
-async def synthesize_speech_async(text: str, output_filename: str) -> str:
+    Every uvicorn worker keeps its own index of the shared directory: a file
+    missing from it is looked up on disk, a hit touches the file so its mtime
+    is the recency all workers see, and the index is rebuilt from the
+    directory every RESCAN_SECONDS, so the budget holds for all of them.
+    Files may vanish at any time (another worker evicted them).
     """
-    Synthesizes speech from text using Edge-TTS and saves it as MP3.
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        # filename -> size in bytes, oldest first
+        self._entries = OrderedDict()
+        self._scanned_at = 0.0
+        self._scan()
+        self._evict()
+
+    def _scan(self):
+        """
+        Re-indexes the directory, least recently used (oldest mtime) first,
+        and removes temp files abandoned by a crashed writer.
+        """
+        files = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                if ".tmp-" in name:
+                    if now - stat.st_mtime > TEMP_FILE_GRACE_SECONDS:
+                        os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue  # Evicted or committed by another worker meanwhile
+            files.append((stat.st_mtime, name, stat.st_size))
+        self._entries = OrderedDict((name, size) for _, name, size in sorted(files))
+        self.total_bytes = sum(self._entries.values())
+        self._scanned_at = time.monotonic()
+
+    def path_for(self, filename: str) -> str:
+        return os.path.join(self.cache_dir, filename)
+
+    def get(self, filename: str):
+        """Returns the path of a cached file and marks it recently used, or None."""
+        if ".tmp-" in filename:
+            return None
+        path = self.path_for(filename)
+        try:
+            # Touching the file shares its recency with the other workers
+            os.utime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            self._forget(filename)
+            return None
+        self.total_bytes += size - self._entries.get(filename, 0)
+        self._entries[filename] = size
+        self._entries.move_to_end(filename)
+        return path
+
+    def temp_path(self, filename: str) -> str:
+        return self.path_for(f"{filename}.tmp-{uuid.uuid4().hex}")
+
+    def commit(self, temp_path: str, filename: str):
+        """Atomically moves a fully written temp file into the cache."""
+        os.replace(temp_path, self.path_for(filename))
+        if time.monotonic() - self._scanned_at > RESCAN_SECONDS:
+            self._scan()
+        else:
+            size = os.path.getsize(self.path_for(filename))
+            self.total_bytes += size - self._entries.get(filename, 0)
+            self._entries[filename] = size
+        self._entries.move_to_end(filename)
+        self._evict()
+
+    def _forget(self, filename: str):
+        self.total_bytes -= self._entries.pop(filename, 0)
+
+    def _evict(self):
+        # Never evict the newest entry, even if it alone exceeds the budget
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            filename, size = self._entries.popitem(last=False)
+            try:
+                os.remove(self.path_for(filename))
+            except FileNotFoundError:
+                pass  # Already evicted by another worker
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+tts_cache = TTSCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+
+
+class HotAudio:
+    """
+    Prompts played on every call (intro, goodbye) kept in memory with a
+    content ETag, so serving them never touches the disk.
+    """
+
+    def __init__(self):
+        # filename -> (audio bytes, ETag)
+        self._clips = {}
+
+    def load(self, path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        self._clips[os.path.basename(path)] = (data, f'"{hashlib.sha256(data).hexdigest()[:32]}"')
+
+    def get(self, filename: str):
+        return self._clips.get(filename)
+
+
+hot_audio = HotAudio()
+
+# Syntheses in progress, so concurrent requests for the same phrase share one
+_in_flight = {}
+
+
+async def _synthesize_audio(text: str, audio_format: str) -> bytes:
+    """
+    Collects the Edge-TTS MP3 stream in memory and converts it to audio_format
+    (off the event loop, the conversion is CPU work).
+    """
+    communicate = edge_tts.Communicate(text, VOICE)
+    audio = bytearray()
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            audio += chunk["data"]
+    if audio_format == "mp3":
+        return bytes(audio)
+    return await asyncio.to_thread(transcode_for_telephony, bytes(audio), audio_format)
+
+
+async def synthesize_speech_async(text: str, output_filename: str, audio_format: str = "mp3") -> str:
+    """
+    Synthesizes speech from text using Edge-TTS and saves it in audio_format
+    (MP3 by default, see AUDIO_FORMATS).
     """
     output_path = os.path.join(AUDIO_OUTPUT_DIR, output_filename)
     try:
-        communicate = edge_tts.Communicate(text, VOICE)
-        await communicate.save(output_path)
+        audio = await _synthesize_audio(text, audio_format)
+        with open(output_path, "wb") as f:
+            f.write(audio)
         return output_path
     except Exception as e:
         return f"Error synthesizing speech: {e}"
 
 
+async def _synthesize_into_cache(text: str, filename: str) -> str:
+    temp_path = tts_cache.temp_path(filename)
+    try:
+        audio = await _synthesize_audio(text, TTS_AUDIO_FORMAT)
+        with open(temp_path, "wb") as f:
+            f.write(audio)
+        tts_cache.commit(temp_path, filename)
+        return filename
+    except Exception as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return f"Error synthesizing speech: {e}"
+
+
+async def synthesize_cached_async(text: str) -> str:
+    """
+    Returns the cache filename of the spoken text in TTS_AUDIO_FORMAT,
+    synthesizing it only if it is not cached yet. Serve it from
+    tts_cache.path_for(filename).
+    """
+    filename = f"{cache_key(text)}{AUDIO_EXTENSION}"
+    if tts_cache.get(filename):
+        tts_cache.hits += 1
+        return filename
+
+    task = _in_flight.get(filename)
+    if task is None:
+        tts_cache.misses += 1
+        task = asyncio.ensure_future(_synthesize_into_cache(text, filename))
+        _in_flight[filename] = task
+        task.add_done_callback(lambda _: _in_flight.pop(filename, None))
+    else:
+        tts_cache.hits += 1
+    return await asyncio.shield(task)
+
+
 def synthesize_speech(text: str, output_filename: str) -> str:
     """
     Synchronous wrapper for Edge-TTS synthesis.
@@ -57,3 +278,8 @@ if __name__ == "__main__":
         print(f"Speech synthesized and saved to: {audio_file_path}")
     else:
         print(f"Failed to synthesize speech: {audio_file_path}")
+
+    # The second request for the same phrase should come from the cache
+    for _ in range(2):
+        print(f"Cached synthesis: {asyncio.run(synthesize_cached_async(test_text))}")
+    print(f"TTS cache stats: {tts_cache.stats()}")
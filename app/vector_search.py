@@ -1,24 +1,32 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import json
 import os
+import time
 from langchain_community.vectorstores import Chroma
 from langchain_text_splitters import CharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from app.config import KNOWLEDGE_BASE_PATH, CHROMA_DB_PATH
+from app.config import (
+    KNOWLEDGE_BASE_PATH, CHROMA_DB_PATH, EMBEDDING_MATRIX_DIR, INDEX_MANIFEST_PATH, INDEX_BATCH_SIZE,
+    EMBEDDING_MODEL_NAME,
+)
+from app.memory_retriever import save_matrix
+from app.embeddings import get_embedding_service
 
-def build_vector_index():
+
+def export_embedding_matrix(vector_store):
     """
-    Builds a Chroma vector index using a local SentenceTransformer model.
+    Writes the chunks and embeddings stored in Chroma to EMBEDDING_MATRIX_DIR
+    for the in-memory retriever (RETRIEVER_BACKEND=memory).
     """
-    print("Starting to build Chroma vector index with a local model...")
-    
-    try:
-        with open(KNOWLEDGE_BASE_PATH, 'r', encoding='utf-8') as f:
-            knowledge_base_text = f.read()
-        print(f"Successfully loaded knowledge base from: {KNOWLEDGE_BASE_PATH}")
-    except FileNotFoundError:
-        print(f"Error: Knowledge base file not found at {KNOWLEDGE_BASE_PATH}")
-        return
+    data = vector_store.get(include=["documents", "embeddings"])
+    save_matrix(EMBEDDING_MATRIX_DIR, data["documents"], data["embeddings"])
+    print(f"Exported {len(data['documents'])} embeddings to: {EMBEDDING_MATRIX_DIR}")
+
 
+def split_knowledge_base(knowledge_base_text: str) -> list:
+    """
+    Splits the markdown knowledge base into one chunk per "## " section.
+    """
     text_splitter = CharacterTextSplitter(
         separator="\n## ",
         chunk_size=1000,
@@ -27,28 +35,100 @@ def build_vector_index():
         is_separator_regex=False,
     )
     docs = text_splitter.split_text(knowledge_base_text)
-    docs = [docs[0]] + ["## " + doc for doc in docs[1:]]
-    print(f"Split document into {len(docs)} chunks.")
+    return [docs[0]] + ["## " + doc for doc in docs[1:]]
 
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_manifest() -> dict:
+    """
+    Returns the manifest of the last indexing run: the knowledge base file hash
+    and the content hash of every chunk (also used as its Chroma id).
+    """
     try:
-        # Using a popular, lightweight, and multilingual model
-        model_name = "all-MiniLM-L6-v2"
-        # The model will be downloaded automatically on the first run
-        embeddings = HuggingFaceEmbeddings(model_name=model_name)
-        print(f"Initialized local embeddings model: {model_name}")
-    except Exception as e:
-        print(f"Error initializing local embeddings model: {e}")
-        return
+        with open(INDEX_MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"file_hash": None, "chunks": []}
+
+
+def save_manifest(manifest: dict):
+    os.makedirs(os.path.dirname(INDEX_MANIFEST_PATH), exist_ok=True)
+    tmp_path = f"{INDEX_MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, INDEX_MANIFEST_PATH)
+
+
+def build_vector_index(embeddings=None) -> dict:
+    """
+    Incrementally updates the Chroma vector index from the knowledge base.
+    Chunks are identified by content hash: only new or changed chunks are
+    embedded (in batches), removed chunks are deleted, and an unchanged file
+    is skipped without loading the embeddings model. Safe to run repeatedly.
+    Returns a summary of the changes, or None on error.
+    """
+    start = time.perf_counter()
+    print("Updating Chroma vector index with a local model...")
 
     try:
-        vector_store = Chroma.from_texts(
-            texts=docs, 
-            embedding=embeddings,
-            persist_directory=CHROMA_DB_PATH
-        )
-        print(f"Vector index successfully built and saved to: {CHROMA_DB_PATH}")
+        with open(KNOWLEDGE_BASE_PATH, 'r', encoding='utf-8') as f:
+            knowledge_base_text = f.read()
+        print(f"Successfully loaded knowledge base from: {KNOWLEDGE_BASE_PATH}")
+    except FileNotFoundError:
+        print(f"Error: Knowledge base file not found at {KNOWLEDGE_BASE_PATH}")
+        return None
+
+    file_hash = content_hash(knowledge_base_text)
+    manifest = load_manifest()
+    if manifest["file_hash"] == file_hash and os.path.exists(CHROMA_DB_PATH):
+        print("Knowledge base unchanged. Nothing to index.")
+        return {"added": 0, "removed": 0, "unchanged": len(manifest["chunks"]), "seconds": time.perf_counter() - start}
+
+    docs = split_knowledge_base(knowledge_base_text)
+    chunks = {content_hash(doc): doc for doc in docs}
+    print(f"Split document into {len(docs)} chunks.")
+
+    if embeddings is None:
+        try:
+            # The model will be downloaded automatically on the first run
+            embeddings = get_embedding_service()
+            print(f"Initialized local embeddings model: {EMBEDDING_MODEL_NAME} ({embeddings.encoder.name})")
+        except Exception as e:
+            print(f"Error initializing local embeddings model: {e}")
+            return None
+
+    try:
+        vector_store = Chroma(persist_directory=CHROMA_DB_PATH, embedding_function=embeddings)
+        # Compare against what is actually stored, which also clears out
+        # duplicate vectors left behind by earlier non-incremental builds
+        existing_ids = set(vector_store.get(include=[])["ids"])
+        new_ids = [chunk_id for chunk_id in chunks if chunk_id not in existing_ids]
+        removed_ids = sorted(existing_ids - chunks.keys())
+
+        if removed_ids:
+            vector_store.delete(ids=removed_ids)
+        for i in range(0, len(new_ids), INDEX_BATCH_SIZE):
+            batch_ids = new_ids[i:i + INDEX_BATCH_SIZE]
+            vector_store.add_texts(texts=[chunks[chunk_id] for chunk_id in batch_ids], ids=batch_ids)
+
+        print(f"Indexed {len(new_ids)} new chunks, removed {len(removed_ids)}, kept {len(chunks) - len(new_ids)}.")
+        print(f"Vector index successfully updated at: {CHROMA_DB_PATH}")
+        if new_ids or removed_ids or not os.path.exists(EMBEDDING_MATRIX_DIR):
+            export_embedding_matrix(vector_store)
     except Exception as e:
-        print(f"Error creating or saving Chroma index: {e}")
+        print(f"Error updating Chroma index: {e}")
+        return None
+
+    save_manifest({"file_hash": file_hash, "chunks": list(chunks)})
+    return {
+        "added": len(new_ids),
+        "removed": len(removed_ids),
+        "unchanged": len(chunks) - len(new_ids),
+        "seconds": time.perf_counter() - start,
+    }
 
 def load_vector_index():
     """
@@ -59,13 +139,11 @@ def load_vector_index():
         print(f"Error: Chroma DB not found at {CHROMA_DB_PATH}")
         print("Please run `build_vector_index()` first.")
         return None
-    
+
     try:
-        model_name = "all-MiniLM-L6-v2"
-        embeddings = HuggingFaceEmbeddings(model_name=model_name)
         vector_store = Chroma(
-            persist_directory=CHROMA_DB_PATH, 
-            embedding_function=embeddings
+            persist_directory=CHROMA_DB_PATH,
+            embedding_function=get_embedding_service()
         )
         print("Vector index loaded successfully.")
         return vector_store
@@ -74,5 +152,5 @@ def load_vector_index():
         return None
 
 if __name__ == '__main__':
-    print("Running vector search script directly to build the Chroma index with a local model.")
+    print("Running vector search script directly to update the Chroma index with a local model.")
     build_vector_index()
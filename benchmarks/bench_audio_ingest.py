@@ -0,0 +1,68 @@
+"""
+Compares the two ways a downloaded recording can reach Whisper: written to
+AUDIO_UPLOAD_DIR and read back from disk (the old path), or decoded straight
+from the response body into a NumPy buffer. Uses 15-second 8 kHz 16-bit WAVs
+like Twilio's, processed by a thread pool as the STT stage would.
+
+Usage: python -m benchmarks.bench_audio_ingest [--recordings 200] [--workers 8]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.audio import decode_audio_bytes, resample
+
+
+def make_recording(seconds: float = 15.0, rate: int = 8000) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (0.3 * np.sin(2 * np.pi * 300 * t) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def via_disk(directory: str, index: int, content: bytes) -> np.ndarray:
+    path = os.path.join(directory, f"CA{index:04d}_recorded.wav")
+    with open(path, "wb") as f:
+        f.write(content)
+    with wave.open(path) as f:
+        rate = f.getframerate()
+        frames = f.readframes(f.getnframes())
+    os.remove(path)
+    return resample(np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768, rate)
+
+
+def run(label: str, func, recordings: int, workers: int):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(func, range(recordings)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed * 1000 / recordings:>10.3f} {recordings / elapsed:>12.0f}")
+
+
+def main(recordings: int, workers: int):
+    content = make_recording()
+    directory = tempfile.mkdtemp(prefix="audio_uploads_")
+    print(f"{recordings} recordings of {len(content) / 1024:.0f} KB, {workers} workers")
+    print(f"{'path':<10} {'ms/record':>10} {'records/s':>12}")
+    run("disk", lambda i: via_disk(directory, i, content), recordings, workers)
+    run("memory", lambda i: decode_audio_bytes(content), recordings, workers)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recordings", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    main(args.recordings, args.workers)
@@ -0,0 +1,103 @@
+"""
+Measures offline batch transcription throughput (recordings per minute) on
+CPU for increasing process counts. Pass a directory of real recordings for
+meaningful numbers; without one, synthetic 10-second WAVs (tone plus noise)
+are generated, which exercise decoding but not realistic speech.
+
+Before timing, checks with a stand-in pipeline that a group of recordings
+reaches Whisper as one call with every recording's speech clips (VAD off),
+and that each segment is credited to its own recording.
+
+Usage: python -m benchmarks.bench_batch [--recordings DIR] [--count 24] [--processes 1 2 4]
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import struct
+import tempfile
+import wave
+from types import SimpleNamespace
+
+from app import batch
+from app.batch import BatchJob
+
+
+def write_synthetic_wavs(directory: str, count: int, seconds: float = 10.0, rate: int = 16000):
+    for i in range(count):
+        with wave.open(os.path.join(directory, f"synthetic_{i:03d}.wav"), "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(rate)
+            frames = bytearray()
+            for n in range(int(seconds * rate)):
+                sample = 0.3 * math.sin(2 * math.pi * (200 + 20 * i) * n / rate) + 0.05 * random.uniform(-1, 1)
+                frames += struct.pack("<h", int(sample * 32767))
+            f.writeframes(bytes(frames))
+
+
+class RecordingPipeline:
+    """
+    Stand-in for BatchedInferencePipeline: keeps its arguments and returns
+    one segment per clip, whose text is the clip's start time.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append(kwargs)
+        return [SimpleNamespace(start=clip["start"], text=f" {clip['start']:g}")
+                for clip in kwargs["clip_timestamps"]], None
+
+
+def check_clip_batching(directory: str, batch_size: int = 4):
+    """Raises AssertionError unless transcribe_files batches the clips of a whole group in one call."""
+    paths = sorted(os.path.join(directory, name) for name in os.listdir(directory))[:batch_size]
+    pipeline, speech_clips = RecordingPipeline(), batch._speech_clips
+    batch._pipeline = pipeline
+    # One clip per second of each recording, wherever VAD would find speech
+    batch._speech_clips = lambda audio, offset: [{"start": offset + s, "end": offset + s + 0.5}
+                                                 for s in range(int(len(audio) / batch.WHISPER_SAMPLE_RATE))]
+    try:
+        records = batch.transcribe_files(paths, batch_size)
+    finally:
+        batch._pipeline, batch._speech_clips = None, speech_clips
+    assert len(pipeline.calls) == 1, f"expected one pipeline call, got {len(pipeline.calls)}"
+    kwargs = pipeline.calls[0]
+    assert kwargs.get("vad_filter") is False and kwargs.get("batch_size") == batch_size, kwargs
+    seconds = [record["audio_seconds"] for record in records]
+    assert len(kwargs["clip_timestamps"]) == sum(int(s) for s in seconds), "clips missing from the call"
+    offset = 0.0
+    for record, duration in zip(records, seconds):
+        starts = [float(start) for start in record["transcript"].split()]
+        assert starts and all(offset <= start < offset + duration for start in starts), record
+        offset += duration + batch.GAP_SECONDS
+
+
+def main(recordings: str, count: int, process_counts: list):
+    if recordings is None:
+        recordings = tempfile.mkdtemp(prefix="batch_recordings_")
+        write_synthetic_wavs(recordings, count)
+    check_clip_batching(recordings)
+    print("Clip batching check passed")
+
+    print(f"{'processes':>9} {'recordings':>10} {'seconds':>8} {'rec/min':>8}")
+    for processes in process_counts:
+        output = os.path.join(tempfile.mkdtemp(prefix="batch_out_"), "results.jsonl")
+        job = BatchJob(recordings, output, processes=processes, generate_replies=False)
+        status = asyncio.run(job.run())
+        if status["state"] != "done":
+            print(f"Batch job failed: {status['error']}")
+            return
+        print(f"{processes:>9} {status['completed']:>10} {status['elapsed_seconds']:>8.1f} {status['recordings_per_minute']:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recordings", help="Directory of recordings (default: generate synthetic WAVs)")
+    parser.add_argument("--count", type=int, default=24, help="Synthetic recordings to generate")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    main(args.recordings, args.count, args.processes)
@@ -0,0 +1,88 @@
+"""
+Compares the embedding backends on CPU: single-query latency, query
+throughput with many threads asking at once (as the retrieval stage pool
+does), encoding each query on its own versus micro-batched by
+EmbeddingService, memoized repeat lookups, and the RSS the model adds. Each
+backend runs in its own process so RSS numbers don't overlap. The onnx
+backend needs `python -m app.embeddings export` first.
+
+Usage: python -m benchmarks.bench_embeddings [--backends sentence_transformers onnx] [--queries 400] [--threads 16]
+"""
+import argparse
+import multiprocessing
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_retrieval import QUERIES, rss_mb
+
+
+def query(i: int) -> str:
+    # Distinct texts, so nothing is answered from the memo by accident
+    return f"{QUERIES[i % len(QUERIES)]} (call {i})"
+
+
+def throughput(func, queries: int, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(func, range(queries)))
+    return queries / (time.perf_counter() - start)
+
+
+def run_backend(backend: str, queries: int, threads: int, results):
+    from app.embeddings import EmbeddingService, create_encoder
+
+    rss_before = rss_mb()
+    encoder = create_encoder(backend)
+    encoder.encode(QUERIES)  # Warm-up
+    rss = rss_mb() - rss_before
+
+    latencies = []
+    for i in range(min(queries, 200)):
+        start = time.perf_counter()
+        encoder.encode([query(i)])
+        latencies.append(time.perf_counter() - start)
+
+    direct_qps = throughput(lambda i: encoder.encode([query(i)]), queries, threads)
+    service = EmbeddingService(encoder)
+    batched_qps = throughput(lambda i: service.embed_query(query(queries + i)), queries, threads)
+    mean_batch = service.stats()["mean_batch_size"]
+
+    service.embed_query(QUERIES[0])
+    start = time.perf_counter()
+    for _ in range(1000):
+        service.embed_query(QUERIES[0])
+    memo_us = (time.perf_counter() - start) / 1000 * 1e6
+
+    results[backend] = {
+        "query_ms": statistics.median(latencies) * 1000,
+        "direct_qps": direct_qps,
+        "batched_qps": batched_qps,
+        "mean_batch": mean_batch,
+        "memo_us": memo_us,
+        "rss_mb": rss,
+    }
+
+
+def main(backends: list, queries: int, threads: int):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Manager().dict()
+    for backend in backends:
+        process = ctx.Process(target=run_backend, args=(backend, queries, threads, results))
+        process.start()
+        process.join()
+
+    print(f"{queries} queries from {threads} threads")
+    print(f"{'backend':<22} {'query p50':>10} {'per-query':>10} {'batched':>10} {'batch':>6} {'memo hit':>9} {'RSS added':>10}")
+    for backend, r in results.items():
+        print(f"{backend:<22} {r['query_ms']:>7.2f} ms {r['direct_qps']:>6.0f} q/s {r['batched_qps']:>6.0f} q/s "
+              f"{r['mean_batch']:>6.1f} {r['memo_us']:>6.1f} us {r['rss_mb']:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["sentence_transformers", "onnx"])
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+    main(args.backends, args.queries, args.threads)
@@ -0,0 +1,62 @@
+"""
+Measures the per-turn HTTP overhead saved by the shared client registry.
+Each turn downloads a recording and makes one Ollama request, either with a
+fresh client per request (the old behaviour) or with the pooled clients from
+app.http_clients. Stand-in servers answer instantly so only client cost shows.
+
+Usage: python -m benchmarks.bench_http_clients [--turns 200]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.http_clients import close_clients, get_client, send_with_retry
+from benchmarks.fake_services import FakeOllamaServer, FakeRecordingServer
+
+GENERATE_BODY = {"model": "fake", "prompt": "Hello", "stream": False, "options": {"num_predict": 8}}
+
+
+async def fresh_client_turn(ollama_url: str, recording_url: str):
+    async with httpx.AsyncClient() as client:
+        (await client.get(recording_url)).raise_for_status()
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        (await client.post(f"{ollama_url}/api/generate", json=GENERATE_BODY)).raise_for_status()
+
+
+async def pooled_client_turn(ollama_url: str, recording_url: str):
+    (await send_with_retry(get_client("twilio"), "GET", recording_url)).raise_for_status()
+    (await send_with_retry(get_client("ollama"), "POST", f"{ollama_url}/api/generate", json=GENERATE_BODY)).raise_for_status()
+
+
+async def timed(turn, turns: int, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(turns):
+        await turn(*args)
+    return (time.perf_counter() - start) / turns
+
+
+async def main(turns: int):
+    ollama = FakeOllamaServer(first_token_delay=0, token_delay=0).start()
+    recordings = FakeRecordingServer(delay=0).start()
+    args = (ollama.url, recordings.recording_url("CA0001"))
+    try:
+        fresh = await timed(fresh_client_turn, turns, *args)
+        pooled = await timed(pooled_client_turn, turns, *args)
+    finally:
+        await close_clients()
+        ollama.stop()
+        recordings.stop()
+
+    print(f"HTTP overhead per turn over {turns} turns (plain HTTP on localhost, no TLS):")
+    print(f"  fresh clients : {fresh * 1000:7.2f} ms")
+    print(f"  pooled clients: {pooled * 1000:7.2f} ms")
+    print(f"  saved         : {(fresh - pooled) * 1000:7.2f} ms per turn")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns))
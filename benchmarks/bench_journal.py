@@ -0,0 +1,111 @@
+"""
+Measures what recording a turn costs the event loop: a loguru log line, a
+turn record inserted and committed to SQLite on the spot, and the same
+record queued for the CallJournal's batching writer thread. Also reports the
+longest logging call while the log file rotates, with loguru zipping the
+rotated file inline versus main.compress_in_background, how fast the
+journal writer drains its queue and how many files a small --max-bytes
+rolls over to.
+
+Usage: python -m benchmarks.bench_journal [--turns 5000] [--max-bytes 1048576] [--log-lines 200000]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from loguru import logger
+
+from app.journal import COLUMNS, SCHEMA, CallJournal, TurnRecord, journal_files, open_journal
+from app.main import compress_in_background
+from benchmarks.bench_sessions import UTTERANCES
+
+
+def make_record(i: int) -> TurnRecord:
+    return TurnRecord(
+        f"CA{i:06d}", i % 4, time.time(), phone=f"+9100000000{i % 5 + 1:02d}", booking=f"TRV-100{i % 5 + 1}",
+        hotel="Beach Paradise Resort", transcript=UTTERANCES[i % len(UTTERANCES)],
+        reply="Thank you for sharing that. Could you tell me more about the food?", sentiment=0.5,
+        outcome="done", turn_s=2.5, first_audio_s=1.2,
+        stages={"download": 0.05, "stt": 0.5, "retrieval": 0.02, "llm": 0.7, "llm_first_token": 0.15, "tts": 0.4},
+    )
+
+
+def per_call_us(func, turns: int) -> tuple:
+    """Returns (median, p99) microseconds of func(i) over `turns` calls."""
+    times = []
+    for i in range(turns):
+        start = time.perf_counter()
+        func(i)
+        times.append((time.perf_counter() - start) * 1e6)
+    times.sort()
+    return statistics.median(times), times[int(len(times) * 0.99)]
+
+
+def log_line(i: int):
+    logger.info(f"[BG] Transcribed text for CA{i:06d}: {UTTERANCES[i % len(UTTERANCES)]}")
+
+
+def rotation_stall_ms(directory: str, name: str, compression, lines: int) -> float:
+    """Longest logging call, in ms, over `lines` lines with the file rotating every 20 MB."""
+    sink = logger.add(os.path.join(directory, f"{name}.log"), rotation="20 MB", compression=compression, level="INFO")
+    longest = 0.0
+    for i in range(lines):
+        start = time.perf_counter()
+        log_line(i)
+        longest = max(longest, time.perf_counter() - start)
+    logger.remove(sink)
+    return longest * 1000
+
+
+def main(turns: int, max_bytes: int, log_lines: int):
+    directory = tempfile.mkdtemp(prefix="journal-bench-")
+    results = []
+
+    logger.remove()
+    sink = logger.add(os.path.join(directory, "agent.log"), level="INFO")
+    results.append(("log line", *per_call_us(log_line, turns)))
+    logger.remove(sink)
+
+    conn = sqlite3.connect(os.path.join(directory, "direct.db"))
+    conn.execute(SCHEMA)
+    insert = f"INSERT INTO turns ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+    def insert_now(i: int):
+        with conn:
+            conn.execute(insert, make_record(i).row())
+
+    results.append(("record, SQLite commit", *per_call_us(insert_now, turns)))
+    conn.close()
+
+    records = [make_record(i) for i in range(turns)]
+    journal = CallJournal(os.path.join(directory, "journal"), max_bytes=max_bytes, max_queue=turns + 1)
+    start = time.perf_counter()
+    results.append(("record, journal queue", *per_call_us(lambda i: journal.log_turn(records[i]), turns)))
+    journal.close(timeout=60)
+    drain_seconds = time.perf_counter() - start
+
+    print(f"{turns} turns; event loop time per turn")
+    print(f"{'':<24} {'p50':>9} {'p99':>9}")
+    for label, p50, p99 in results:
+        print(f"{label:<24} {p50:>6.1f} us {p99:>6.1f} us")
+    stats = journal.stats()
+    stored = open_journal(os.path.join(directory, "journal")).execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+    print(f"journal writer: {stats['written'] / drain_seconds:.0f} records/s, mean batch {stats['mean_batch_size']}, "
+          f"{stats['dropped']} dropped, {len(journal_files(os.path.join(directory, 'journal')))} files "
+          f"({stats['rollovers']} rollovers), {stored} records read back")
+
+    print(f"longest log call over {log_lines} lines with 20 MB rotation:")
+    print(f"  zip inline            {rotation_stall_ms(directory, 'inline', 'zip', log_lines):>7.1f} ms")
+    print(f"  zip on a thread       {rotation_stall_ms(directory, 'thread', compress_in_background, log_lines):>7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=5000)
+    parser.add_argument("--max-bytes", type=int, default=1024 * 1024, help="Journal rollover size for the run")
+    parser.add_argument("--log-lines", type=int, default=200000, help="Log lines for the rotation test")
+    args = parser.parse_args()
+    main(args.turns, args.max_bytes, args.log_lines)
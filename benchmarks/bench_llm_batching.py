@@ -0,0 +1,84 @@
+"""
+Measures the in-process llama.cpp backend on CPU at 1, 4 and 16 concurrent
+calls: aggregate generated tokens/sec, time to first token and per-call
+latency, with continuous batching (all calls share each decode) and without
+(one sequence, calls decoded one after another). Needs a small GGUF model,
+e.g. a Q4_K_M build of Qwen2.5-0.5B-Instruct or SmolLM2-360M-Instruct.
+
+Usage: python -m benchmarks.bench_llm_batching MODEL.gguf [--concurrency 1 4 16] [--max-tokens 48]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.agent import SYSTEM_PROMPT
+from app.config import LLAMA_THREADS
+from app.llm import LlamaCppBackend
+
+TRIP = "Booking #TRV-1001: Delhi to Goa, 3-night stay at Beach Paradise Resort."
+UTTERANCES = [
+    "The hotel was really nice but the food could have been better.",
+    "Honestly the flight was delayed by three hours and nobody told us.",
+    "We loved the beach, the kids did not want to leave.",
+    "The room was fine, a bit noisy at night though.",
+]
+
+
+def prompt_for(i: int) -> str:
+    return f"""{SYSTEM_PROMPT}
+
+Trip Details: {TRIP}
+
+Customer said: {UTTERANCES[i % len(UTTERANCES)]}
+Your response:"""
+
+
+async def one_call(backend: LlamaCppBackend, i: int, max_tokens: int) -> tuple:
+    """Returns (time to first text, total time) for one streamed reply."""
+    start = time.perf_counter()
+    first_token = None
+    async for _ in backend.stream(prompt_for(i), max_tokens=max_tokens, temperature=0.7):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+    return first_token or 0.0, time.perf_counter() - start
+
+
+async def run_level(backend: LlamaCppBackend, concurrency: int, max_tokens: int) -> dict:
+    tokens_before = backend.generated_tokens
+    start = time.perf_counter()
+    results = await asyncio.gather(*[one_call(backend, i, max_tokens) for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "tokens_per_s": (backend.generated_tokens - tokens_before) / elapsed,
+        "first_token_s": statistics.median(r[0] for r in results),
+        "call_s": statistics.median(r[1] for r in results),
+        "call_max_s": max(r[1] for r in results),
+    }
+
+
+async def main(model_path: str, levels: list, max_tokens: int, threads: int):
+    modes = [("batched", max(levels)), ("sequential", 1)]
+    print(f"{'mode':<11} {'calls':>5} {'tok/s':>8} {'TTFT p50':>9} {'call p50':>9} {'call max':>9}")
+    for mode, sequences in modes:
+        backend = LlamaCppBackend(SYSTEM_PROMPT, model_path=model_path, max_sequences=sequences,
+                                  n_ctx=max(levels) * 512, n_threads=threads)
+        await backend.warm_up()
+        await run_level(backend, 1, 4)  # Warm-up
+        for concurrency in levels:
+            r = await run_level(backend, concurrency, max_tokens)
+            print(f"{mode:<11} {concurrency:>5} {r['tokens_per_s']:>8.1f} {r['first_token_s']:>8.2f}s "
+                  f"{r['call_s']:>8.2f}s {r['call_max_s']:>8.2f}s")
+        stats = backend.stats()
+        print(f"{'':<11} mean batch {stats['mean_batch_tokens']} tokens, "
+              f"{stats['prefix_hits']} prefix reuses of {stats['prefix_tokens']} tokens")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("model_path")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--max-tokens", type=int, default=48)
+    parser.add_argument("--threads", type=int, default=LLAMA_THREADS)
+    args = parser.parse_args()
+    asyncio.run(main(args.model_path, args.concurrency, args.max_tokens, args.threads))
@@ -0,0 +1,99 @@
+"""
+Measures what call-start prefetch saves on a call's first turn with the
+in-process llama.cpp backend: time to the first token and to the first
+sentence of the reply, and prompt tokens evaluated after the customer
+spoke, when the turn retrieves and evaluates its whole prompt, and when the
+trip details were retrieved and the prompt prefix evaluated while the intro
+played. Retrieval is a stand-in with --retrieval-delay. Needs a small GGUF
+model (see bench_llm_batching).
+
+Usage: python -m benchmarks.bench_prefetch MODEL.gguf [--calls 10] [--retrieval-delay 0.08]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app import agent
+from app.config import LLAMA_THREADS
+from app.customers import CustomerStore
+from app.llm import LlamaCppBackend
+from app.sessions import end_session
+from benchmarks.bench_sessions import UTTERANCES
+from benchmarks.fake_services import FakeRetriever
+
+CUSTOMERS = [
+    {"phone": "+910000000001", "name": "Aarav Sharma", "booking": "TRV-1001",
+     "trip": "Delhi to Goa, 3-night stay at Beach Paradise Resort, Jan 15-18, 2026. "
+             "Package included flights, hotel, and airport transfers."},
+    {"phone": "+910000000002", "name": "Priya Patel", "booking": "TRV-1002",
+     "trip": "Mumbai to Manali, 5-night adventure package, Jan 20-25, 2026. "
+             "Included trekking, camping, and local sightseeing."},
+]
+FEEDBACK_TOPICS = ("Feedback topics: hotel quality, transfers, food, activities, value for money, "
+                   "complaints, whether they would recommend us.")
+
+
+async def first_turn(backend: LlamaCppBackend, call_sid: str, query: str) -> tuple:
+    """Returns (time to first token, time to first sentence, prompt tokens evaluated)."""
+    evaluated_before = backend.batched_tokens - backend.generated_tokens
+    first_token = []
+    stream = backend.stream
+
+    async def timed_stream(*args, **kwargs):
+        async for piece in stream(*args, **kwargs):
+            if not first_token:
+                first_token.append(time.perf_counter() - start)
+            yield piece
+
+    backend.stream = timed_stream
+    start = time.perf_counter()
+    first_sentence = None
+    try:
+        async for _ in agent.stream_rag_response(query, call_sid):
+            if first_sentence is None:
+                first_sentence = time.perf_counter() - start
+    finally:
+        del backend.stream
+    evaluated = backend.batched_tokens - backend.generated_tokens - evaluated_before
+    return first_token[0], first_sentence, evaluated
+
+
+async def run(backend: LlamaCppBackend, calls: int, prefetch: bool) -> list:
+    results = []
+    for i in range(calls):
+        call_sid = f"CA{'P' if prefetch else 'C'}{i:04d}"
+        if prefetch:
+            await agent.prefetch_call(call_sid, CUSTOMERS[i % len(CUSTOMERS)]["phone"])
+        results.append(await first_turn(backend, call_sid, UTTERANCES[i % len(UTTERANCES)]))
+        end_session(call_sid)
+    return results
+
+
+async def main(model_path: str, calls: int, retrieval_delay: float, threads: int):
+    backend = LlamaCppBackend(agent.SYSTEM_PROMPT, model_path=model_path, max_sequences=2, n_threads=threads)
+    await backend.warm_up()
+    agent.llm_backend = backend
+    agent.rag_retriever.set(FakeRetriever(FEEDBACK_TOPICS, delay=retrieval_delay))
+    agent.embeddings_model.set(None)  # No semantic cache
+    agent.customer_store.set(CustomerStore(CUSTOMERS))
+
+    await run(backend, 2, prefetch=False)  # Warm-up
+    print(f"{calls} first turns, retrieval {retrieval_delay * 1000:.0f} ms")
+    print(f"{'':<12} {'first token p50':>16} {'first sentence p50':>19} {'tokens after speech':>20}")
+    for label, prefetch in (("no prefetch", False), ("prefetch", True)):
+        results = await run(backend, calls, prefetch)
+        first_tokens, first_sentences, evaluated = zip(*results)
+        print(f"{label:<12} {statistics.median(first_tokens) * 1000:>13.0f} ms "
+              f"{statistics.median([s for s in first_sentences if s]) * 1000:>16.0f} ms "
+              f"{statistics.mean(evaluated):>20.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("model_path")
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--retrieval-delay", type=float, default=0.08, help="Seconds per retrieval")
+    parser.add_argument("--threads", type=int, default=LLAMA_THREADS)
+    args = parser.parse_args()
+    asyncio.run(main(args.model_path, args.calls, args.retrieval_delay, args.threads))
@@ -0,0 +1,85 @@
+"""
+Compares per-query retrieval latency and resident memory of the Chroma
+retriever with the in-memory NumPy retriever. Each backend is loaded in its own
+process so RSS numbers don't overlap. Requires a built index
+(python -m app.vector_search).
+
+Usage: python -m benchmarks.bench_retrieval [--queries 500]
+"""
+import argparse
+import multiprocessing
+import statistics
+import time
+
+QUERIES = [
+    "The hotel was really nice but the food could have been better.",
+    "Our flight to Goa was delayed by three hours.",
+    "The houseboat in Kerala was amazing.",
+    "The trekking guide in Manali was very helpful.",
+    "Scuba diving in the Andamans was the highlight.",
+]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_backend(backend: str, queries: int, results):
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from app.config import CHROMA_DB_PATH, EMBEDDING_MATRIX_DIR
+
+    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+    query_vectors = embeddings.embed_documents(QUERIES)
+    rss_before = rss_mb()
+
+    if backend == "chroma":
+        from langchain_community.vectorstores import Chroma
+        store = Chroma(persist_directory=CHROMA_DB_PATH, embedding_function=embeddings)
+        retriever = store.as_retriever(search_kwargs={"k": 2})
+        search = lambda i: store.similarity_search_by_vector(query_vectors[i % len(QUERIES)], k=2)
+    else:
+        from app.memory_retriever import NumpyRetriever
+        retriever = NumpyRetriever.from_directory(EMBEDDING_MATRIX_DIR, embeddings, k=2, mmap=backend == "memory-mmap")
+        search = lambda i: retriever.search_vectors(query_vectors[i % len(QUERIES)])
+
+    # Search only (precomputed query embeddings) and full invoke (embedding included)
+    search_times = []
+    for i in range(queries):
+        start = time.perf_counter()
+        search(i)
+        search_times.append(time.perf_counter() - start)
+    invoke_times = []
+    for i in range(min(queries, 100)):
+        start = time.perf_counter()
+        retriever.invoke(QUERIES[i % len(QUERIES)])
+        invoke_times.append(time.perf_counter() - start)
+
+    results[backend] = {
+        "search_us": statistics.median(search_times) * 1e6,
+        "invoke_ms": statistics.median(invoke_times) * 1000,
+        "rss_mb": rss_mb() - rss_before,
+    }
+
+
+def main(queries: int):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Manager().dict()
+    for backend in ("chroma", "memory", "memory-mmap"):
+        process = ctx.Process(target=run_backend, args=(backend, queries, results))
+        process.start()
+        process.join()
+
+    print(f"{'backend':<12} {'search (median)':>16} {'invoke (median)':>16} {'RSS added':>10}")
+    for backend, r in results.items():
+        print(f"{backend:<12} {r['search_us']:>13.1f} us {r['invoke_ms']:>13.2f} ms {r['rss_mb']:>7.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    main(args.queries)
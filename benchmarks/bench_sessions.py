@@ -0,0 +1,86 @@
+"""
+Measures how prompt evaluation grows over a multi-turn call with the
+in-process llama.cpp backend: time to first token and prompt tokens
+evaluated per turn when every turn re-sends the whole conversation, and when
+each turn continues the call's saved LLMSession and evaluates only the new
+utterance. Needs a small GGUF model (see bench_llm_batching).
+
+Usage: python -m benchmarks.bench_sessions MODEL.gguf [--turns 8] [--max-tokens 32]
+"""
+import argparse
+import asyncio
+import time
+
+from app.agent import SYSTEM_PROMPT, continuation_prompt
+from app.config import LLAMA_THREADS
+from app.llm import LlamaCppBackend
+from app.llm_backends import LLMSession
+
+TRIP = "Booking #TRV-1001: Delhi to Goa, 3-night stay at Beach Paradise Resort."
+UTTERANCES = [
+    "The hotel was really nice but the food could have been better.",
+    "Breakfast was mostly cold by the time we got there.",
+    "The staff at the front desk were very helpful though.",
+    "The airport transfer was late by about forty minutes.",
+    "We loved the beach, the kids did not want to leave.",
+    "The room was fine, a bit noisy at night though.",
+    "I would book with you again if the price is right.",
+    "No, that is all, thank you for calling.",
+]
+
+
+def full_prompt(history: list, query: str) -> str:
+    conversation = "".join(f"Customer: {customer}\nYou: {agent}\n" for customer, agent in history)
+    if conversation:
+        conversation = f"Conversation so far:\n{conversation}\n"
+    return f"""{SYSTEM_PROMPT}
+
+Trip Details: {TRIP}
+
+{conversation}Customer said: {query}
+Your response:"""
+
+
+async def run_call(backend: LlamaCppBackend, turns: int, max_tokens: int, reuse: bool) -> list:
+    """Returns (time to first text, prompt tokens evaluated) for each turn."""
+    session = LLMSession() if reuse else None
+    history = []
+    results = []
+    for turn in range(turns):
+        query = UTTERANCES[turn % len(UTTERANCES)]
+        prompt = continuation_prompt(query) if reuse and turn else full_prompt(history, query)
+        evaluated_before = backend.batched_tokens - backend.generated_tokens
+        start = time.perf_counter()
+        first_token = None
+        reply = ""
+        async for piece in backend.stream(prompt, max_tokens=max_tokens, temperature=0.7, session=session):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            reply += piece
+        # Every generated token but the last is evaluated too; count prompt tokens only
+        evaluated = backend.batched_tokens - backend.generated_tokens - evaluated_before
+        results.append((first_token or 0.0, evaluated))
+        history.append((query, reply.strip()))
+    return results
+
+
+async def main(model_path: str, turns: int, max_tokens: int, threads: int):
+    backend = LlamaCppBackend(SYSTEM_PROMPT, model_path=model_path, max_sequences=1, n_threads=threads)
+    await backend.warm_up()
+    await run_call(backend, 1, 4, reuse=False)  # Warm-up
+    full = await run_call(backend, turns, max_tokens, reuse=False)
+    reused = await run_call(backend, turns, max_tokens, reuse=True)
+    print(f"{'turn':>4} {'full TTFT':>10} {'tokens':>7} {'session TTFT':>13} {'tokens':>7}")
+    for turn, ((full_s, full_tokens), (reused_s, reused_tokens)) in enumerate(zip(full, reused), 1):
+        print(f"{turn:>4} {full_s:>9.3f}s {full_tokens:>7} {reused_s:>12.3f}s {reused_tokens:>7}")
+    print(f"session restores: {backend.stats()['session_restores']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("model_path")
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=LLAMA_THREADS)
+    args = parser.parse_args()
+    asyncio.run(main(args.model_path, args.turns, args.max_tokens, args.threads))
@@ -0,0 +1,64 @@
+"""
+Compares time-to-first-audio of the blocking reply path (full Ollama reply, then
+one TTS call) with the streaming path (sentence-chunked TTS while the LLM is
+still generating). Runs against local fake Ollama and TTS stand-ins.
+
+Usage: python -m benchmarks.bench_streaming [--runs 5]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app import agent
+from benchmarks.fake_services import FakeOllamaServer, FakeRetriever, FakeTTS
+
+QUERY = "The hotel was really nice but the food could have been better."
+
+
+async def blocking_turn(tts: FakeTTS) -> float:
+    start = time.perf_counter()
+    reply = await asyncio.to_thread(agent.get_rag_response, QUERY)
+    await tts(reply, "reply_blocking.mp3")
+    return time.perf_counter() - start
+
+
+async def streaming_turn(tts: FakeTTS) -> float:
+    start = time.perf_counter()
+    first_chunk = asyncio.get_running_loop().create_future()
+
+    async def synthesize(sentence, filename):
+        await tts(sentence, filename)
+        if not first_chunk.done():
+            first_chunk.set_result(time.perf_counter() - start)
+
+    tasks = []
+    async for sentence in agent.stream_rag_response(QUERY):
+        tasks.append(asyncio.create_task(synthesize(sentence, f"reply_stream_{len(tasks)}.mp3")))
+    await asyncio.gather(*tasks)
+    return first_chunk.result()
+
+
+async def main(runs: int):
+    server = FakeOllamaServer().start()
+    agent.llm_backend.base_url = server.url
+    agent.rag_retriever.set(FakeRetriever())
+    agent.embeddings_model.set(None)
+    tts = FakeTTS()
+    try:
+        blocking = [await blocking_turn(tts) for _ in range(runs)]
+        streaming = [await streaming_turn(tts) for _ in range(runs)]
+    finally:
+        server.stop()
+
+    print(f"Time to first audio over {runs} runs (median):")
+    print(f"  blocking : {statistics.median(blocking) * 1000:7.1f} ms")
+    print(f"  streaming: {statistics.median(streaming) * 1000:7.1f} ms")
+    print(f"  saved    : {(statistics.median(blocking) - statistics.median(streaming)) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.runs))
@@ -0,0 +1,77 @@
+"""
+Reports real-time factor (decode time / audio duration) and word error rate
+for each STT decode profile, with and without VAD trimming, over a fixture set.
+The fixture directory holds WAV files with a same-named .txt reference
+transcript next to each (e.g. answer_01.wav + answer_01.txt).
+
+Usage: python -m benchmarks.bench_stt FIXTURE_DIR [--model-size base] [--device cpu] [--compute-type int8]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+import wave
+
+from app.stt import DECODE_PROFILES, load_whisper_model, transcribe_audio
+
+
+def words(text: str) -> list:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference: list, hypothesis: list) -> int:
+    """Word-level Levenshtein distance (substitutions + insertions + deletions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def load_fixtures(directory: str) -> list:
+    fixtures = []
+    for wav_path in sorted(glob.glob(os.path.join(directory, "*.wav"))):
+        txt_path = os.path.splitext(wav_path)[0] + ".txt"
+        if not os.path.exists(txt_path):
+            continue
+        with wave.open(wav_path) as f:
+            duration = f.getnframes() / f.getframerate()
+        with open(txt_path, encoding="utf-8") as f:
+            fixtures.append((wav_path, duration, words(f.read())))
+    return fixtures
+
+
+def main(fixture_dir: str, model_size: str, device: str, compute_type: str):
+    fixtures = load_fixtures(fixture_dir)
+    if not fixtures:
+        print(f"No WAV + .txt fixture pairs found in {fixture_dir}")
+        return
+    model = load_whisper_model(model_size, device, compute_type)
+    audio_seconds = sum(duration for _, duration, _ in fixtures)
+    reference_words = sum(len(reference) for _, _, reference in fixtures)
+    # Warm-up so the first timed decode doesn't pay one-off initialisation
+    transcribe_audio(fixtures[0][0], model=model)
+
+    print(f"{len(fixtures)} fixtures, {audio_seconds:.1f} s of audio, Whisper {model_size} on {device} ({compute_type})")
+    print(f"{'profile':<10} {'vad':<5} {'RTF':>6} {'WER':>7}")
+    for profile in DECODE_PROFILES:
+        for vad in (False, True):
+            errors = 0
+            start = time.perf_counter()
+            for path, _, reference in fixtures:
+                errors += word_errors(reference, words(transcribe_audio(path, profile=profile, vad=vad, model=model)))
+            rtf = (time.perf_counter() - start) / audio_seconds
+            print(f"{profile:<10} {'on' if vad else 'off':<5} {rtf:>6.3f} {errors / max(reference_words, 1):>7.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("fixture_dir")
+    parser.add_argument("--model-size", default="base")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-type", default="int8")
+    args = parser.parse_args()
+    main(args.fixture_dir, args.model_size, args.device, args.compute_type)
@@ -0,0 +1,102 @@
+"""
+Measures Twilio webhook latency while N calls are being processed at once.
+Drives the real FastAPI app in-process; Whisper, Ollama, the recording host and
+Edge-TTS are replaced by local stand-ins. --inline-stt runs transcription on the
+event loop (the old behaviour) to show how it stalls every other webhook.
+
+Usage: python -m benchmarks.bench_webhooks [--calls 20] [--stt-delay 1.0] [--inline-stt]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import xml.etree.ElementTree as ET
+
+import httpx
+from loguru import logger
+
+from app import agent, main
+from app.pipeline import stt_stage
+from benchmarks.fake_services import (
+    FakeOllamaServer, FakeRecordingServer, FakeRetriever, FakeTTS, fake_transcribe,
+)
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_call(client: httpx.AsyncClient, recordings: FakeRecordingServer, call_sid: str) -> float:
+    start = time.perf_counter()
+    await client.post("/twilio_voice", data={"CallSid": call_sid, "RecordingUrl": recordings.recording_url(call_sid)})
+    path = f"/twilio_result/{call_sid}"
+    while True:
+        response = await client.post(path)
+        if "<Record" in response.text or "<Hangup" in response.text or "<Say" in response.text:
+            return time.perf_counter() - start
+        # Follow the redirect: back to /twilio_result, or to /twilio_goodbye after a shed turn
+        redirect = ET.fromstring(response.text).find("Redirect")
+        if redirect is None:
+            return time.perf_counter() - start
+        path = httpx.URL(redirect.text).path
+        await asyncio.sleep(0.05)
+
+
+async def probe_webhooks(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    """
+    Sends a /twilio_voice (intro branch) request every 10 ms and records its
+    latency from the moment it was due, so time spent waiting for a blocked
+    event loop counts, as it would for a real Twilio request.
+    """
+    due = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        await client.post("/twilio_voice", data={"CallSid": "CA-probe"})
+        now = time.perf_counter()
+        latencies.append(now - due)
+        due = max(due + 0.01, now)
+
+
+async def main_async(calls: int, stt_delay: float, inline_stt: bool):
+    logger.remove()  # Per-request log lines would dominate the timings
+    ollama = FakeOllamaServer().start()
+    recordings = FakeRecordingServer().start()
+    agent.llm_backend.base_url = ollama.url
+    agent.rag_retriever.set(FakeRetriever())
+    agent.embeddings_model.set(None)
+    main.transcribe_audio = fake_transcribe(stt_delay)
+    main.synthesize_cached_async = FakeTTS()
+    if inline_stt:
+        async def call_inline(func, *args):
+            return func(*args)
+        stt_stage.call_blocking = call_inline
+
+    latencies = []
+    stop = asyncio.Event()
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            probe = asyncio.create_task(probe_webhooks(client, stop, latencies))
+            turn_times = await asyncio.gather(*[run_call(client, recordings, f"CA{i:04d}") for i in range(calls)])
+            stop.set()
+            await probe
+    finally:
+        ollama.stop()
+        recordings.stop()
+
+    mode = "inline STT (blocking)" if inline_stt else "STT stage pool"
+    print(f"{calls} concurrent calls, {mode}:")
+    print(f"  webhook latency p50 : {percentile(latencies, 50) * 1000:8.2f} ms")
+    print(f"  webhook latency p99 : {percentile(latencies, 99) * 1000:8.2f} ms")
+    print(f"  webhook latency max : {max(latencies) * 1000:8.2f} ms")
+    print(f"  turn time median    : {statistics.median(turn_times):8.2f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--stt-delay", type=float, default=1.0)
+    parser.add_argument("--inline-stt", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.calls, args.stt_delay, args.inline_stt))
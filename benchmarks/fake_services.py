@@ -0,0 +1,267 @@
+"""
+Local stand-ins for the external services the call pipeline talks to.
+They only mimic the parts of each API the app uses, with configurable latency,
+so benchmarks can run without Ollama, Twilio or Edge-TTS.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A typical two-sentence feedback reply
+DEFAULT_REPLY = (
+    "Thank you so much for sharing that, it sounds like the resort was lovely. "
+    "Could you tell me a little more about the food during your stay?"
+)
+
+
+class FakeOllamaServer:
+    """
+    Serves /api/generate like Ollama. Tokens are emitted one word at a time
+    after first_token_delay, then every token_delay seconds. With "stream": true
+    the reply is NDJSON, otherwise one JSON object once generation "finishes".
+    """
+
+    def __init__(self, reply: str = DEFAULT_REPLY, first_token_delay: float = 0.15,
+                 token_delay: float = 0.02, port: int = 0):
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def tokens(self) -> list:
+        words = self.reply.split(" ")
+        return [w if i == 0 else f" {w}" for i, w in enumerate(words)]
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so clients can keep connections alive between requests
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                fake.requests += 1
+                tokens = fake.tokens()[:body.get("options", {}).get("num_predict", 64)]
+
+                time.sleep(fake.first_token_delay)
+                self.send_response(200)
+                if body.get("stream", True):
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for token in tokens:
+                        line = json.dumps({"model": body.get("model"), "response": token, "done": False})
+                        self.write_chunk(line.encode() + b"\n")
+                        time.sleep(fake.token_delay)
+                    # Like Ollama, the final object carries the context to continue from next turn
+                    context = (body.get("context") or []) + [0] * (len(body.get("prompt", "")) // 4 + len(tokens))
+                    self.write_chunk(json.dumps({"response": "", "done": True, "context": context}).encode() + b"\n")
+                    self.write_chunk(b"")
+                else:
+                    time.sleep(fake.token_delay * len(tokens))
+                    payload = json.dumps({"model": body.get("model"), "response": "".join(tokens), "done": True}).encode()
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeRecordingServer:
+    """
+    Serves GET requests with a fixed WAV-sized payload, like Twilio's
+    recording URLs, after a configurable delay.
+    """
+
+    def __init__(self, payload: bytes = b"\0" * 160_000, delay: float = 0.05, port: int = 0):
+        self.payload = payload
+        self.delay = delay
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def recording_url(self, call_sid: str) -> str:
+        return f"{self.url}/Recordings/{call_sid}.wav"
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                fake.requests += 1
+                time.sleep(fake.delay)
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/x-wav")
+                self.send_header("Content-Length", str(len(fake.payload)))
+                self.end_headers()
+                self.wfile.write(fake.payload)
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeTwilioServer:
+    """
+    Minimal Twilio REST API for outbound calls: POST .../Calls.json creates a
+    call after api_delay, GET .../Calls/{sid}.json reports it in progress for
+    call_duration seconds, then completed. Tracks peak concurrent calls.
+    """
+
+    def __init__(self, api_delay: float = 0.05, call_duration: float = 0.5, port: int = 0):
+        self.api_delay = api_delay
+        self.call_duration = call_duration
+        self.calls = {}  # sid -> created timestamp
+        self.peak_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def active_calls(self, now: float) -> int:
+        return sum(1 for created in self.calls.values() if now - created < self.call_duration)
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, payload: dict, status: int = 200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(fake.api_delay)
+                with fake._lock:
+                    now = time.monotonic()
+                    sid = f"CA{len(fake.calls):032d}"
+                    fake.calls[sid] = now
+                    fake.peak_active = max(fake.peak_active, fake.active_calls(now))
+                self.send_json({"sid": sid, "status": "queued"}, status=201)
+
+            def do_GET(self):
+                sid = self.path.rsplit("/", 1)[-1].removesuffix(".json")
+                created = fake.calls.get(sid)
+                if created is None:
+                    self.send_json({"message": "not found"}, status=404)
+                    return
+                elapsed = time.monotonic() - created
+                if elapsed < fake.call_duration:
+                    self.send_json({"sid": sid, "status": "in-progress"})
+                else:
+                    self.send_json({"sid": sid, "status": "completed", "duration": str(round(fake.call_duration))})
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def fake_transcribe(delay: float = 1.0, text: str = "The hotel was really nice but the food could have been better."):
+    """
+    Returns a blocking stand-in for transcribe_audio that holds the calling
+    thread for `delay` seconds, like a faster-whisper decode.
+    """
+    def transcribe_audio(audio_path: str) -> str:
+        time.sleep(delay)
+        return text
+    return transcribe_audio
+
+
+class FakeTTS:
+    """
+    Drop-in replacement for synthesize_speech_async / synthesize_cached_async
+    that sleeps instead of calling Edge-TTS: base_delay plus per_char_delay
+    for every character.
+    """
+
+    def __init__(self, base_delay: float = 0.12, per_char_delay: float = 0.002):
+        self.base_delay = base_delay
+        self.per_char_delay = per_char_delay
+        self.calls = 0
+
+    async def __call__(self, text: str, output_filename: str = None) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.base_delay + self.per_char_delay * len(text))
+        return output_filename or f"fake_{self.calls}.mp3"
+
+
+class FakeRetriever:
+    """Returns a fixed trip-details document after `delay` seconds, like retriever.invoke()."""
+
+    class _Doc:
+        def __init__(self, page_content):
+            self.page_content = page_content
+
+    def __init__(self, context: str = "Booking #TRV-1001: Delhi to Goa, 3-night stay at Beach Paradise Resort.",
+                 delay: float = 0.0):
+        self.context = context
+        self.delay = delay
+
+    def invoke(self, query: str) -> list:
+        if self.delay:
+            time.sleep(self.delay)
+        return [self._Doc(self.context)]
@@ -0,0 +1,345 @@
+"""
+End-to-end load test: N simulated callers drive the real FastAPI app through
+the Twilio webhook flow (/twilio_voice intro, then per turn a recording and
+/twilio_result polling until the reply has played) while Whisper, Ollama, the recording host and Edge-TTS are local
+stand-ins with configurable latency. Reports throughput, time to first reply
+audio and to the first sound (an acknowledgement clip or the reply), poll
+counts, and compares them with a saved baseline.
+
+Callers all start at once, or arrive at --arrival-rate calls per second to
+test overload. Calls whose turn was shed by admission control hear a
+fallback clip instead of a reply; they are counted as degraded (a gated
+metric, like the latencies), and the served_* metrics cover only the calls
+that got a real reply. Runs with and without admission control (the
+latter serves every turn, so its latencies measure the pipeline alone) are
+compared with separate baselines.
+
+TwiML <Pause> and <Play> are honoured in simulated time: each second of pause
+or audio is slept for --time-scale seconds, so a caller polls at the pace
+Twilio would, only faster.
+
+Stage limits and admission settings are fixed by the options below rather
+than read from the host, so a baseline compares on any machine. A run whose
+settings differ from its baseline's fails instead of passing unchecked.
+
+Usage: python -m benchmarks.load_test [--calls 20] [--arrival-rate 0] [--max-in-flight 4] [--no-admission]
+                                      [--save-baseline] [--baseline PATH] [--tolerance 0.2]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from loguru import logger
+
+from app import agent, main
+from app.journal import CallJournal
+from app.pipeline import stt_stage, llm_stage, tts_stage
+from benchmarks.fake_services import (
+    FakeOllamaServer, FakeRecordingServer, FakeRetriever, FakeTTS, fake_transcribe,
+)
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+# Baselines of the default run and of a --no-admission run
+DEFAULT_BASELINE = os.path.join(BASELINE_DIR, "load_test.json")
+NO_ADMISSION_BASELINE = os.path.join(BASELINE_DIR, "load_test_no_admission.json")
+
+# Stage wait budgets of a run with admission control, as STAGE_WAIT_BUDGETS defaults them
+STAGE_BUDGETS = {"stt": 5.0, "retrieval": 2.0, "llm": 5.0, "tts": 3.0}
+
+# Metric -> True if higher is better; used when comparing with the baseline
+METRICS = {
+    "throughput_calls_per_s": True,
+    "first_audio_p50_s": False,
+    "first_audio_p95_s": False,
+    "turn_p50_s": False,
+    "turn_p95_s": False,
+    "polls_per_turn_mean": False,
+    "degraded": False,
+}
+
+# Returned by CallSimulator.follow() when Twilio would record the next turn
+RECORD = "record"
+
+# Acknowledgement clips as main.pregenerate_prompts would leave them, with
+# the length Edge-TTS gives their text
+ACK_CLIPS = [(0.8, "ack_0.wav"), (1.4, "ack_1.wav"), (3.2, "ack_2.wav")]
+
+# Clips a shed turn plays instead of a reply
+FALLBACK_CLIPS = {f"{clip}{main.AUDIO_EXTENSION}" for clip, _ in main.FALLBACK_CLIPS}
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class CallSimulator:
+    """
+    Plays the part of Twilio for one call: posts the webhooks, follows the
+    TwiML it gets back and records when the first sound and the first reply
+    audio arrive. The caller speaks again whenever a <Record> comes, for
+    `turns` turns.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, call_sid: str, recording_url: str,
+                 time_scale: float, play_seconds: float, turns: int = 1):
+        self.client = client
+        self.call_sid = call_sid
+        self.recording_url = recording_url
+        self.time_scale = time_scale
+        self.play_seconds = play_seconds
+        self.turns = turns
+        self.polls = 0
+        self.first_sound = None
+        self.first_audio = None
+        self.turn_times = []
+        self.degraded = False
+        self.outcome = None
+
+    async def follow(self, twiml: str) -> str:
+        """
+        Acts out one TwiML response. Returns the redirect path to request
+        next, RECORD when the caller's next turn is recorded, or None once
+        the call ended (hang-up or error message).
+        """
+        for verb in ET.fromstring(twiml):
+            if verb.tag == "Pause":
+                await asyncio.sleep(int(verb.get("length", 1)) * self.time_scale)
+            elif verb.tag == "Play":
+                if self.first_sound is None:
+                    self.first_sound = time.perf_counter()
+                clip = verb.text.rsplit("/", 1)[-1]
+                ack_seconds = dict((name, seconds) for seconds, name in ACK_CLIPS).get(clip)
+                if ack_seconds is not None:
+                    await asyncio.sleep(ack_seconds * self.time_scale)
+                    continue
+                if clip in FALLBACK_CLIPS:
+                    self.degraded = True
+                if self.first_audio is None:
+                    self.first_audio = time.perf_counter()
+                await asyncio.sleep(self.play_seconds * self.time_scale)
+            elif verb.tag == "Say":
+                self.outcome = "error"
+                return None
+            elif verb.tag == "Hangup":
+                self.outcome = "done"
+                return None
+            elif verb.tag == "Record":
+                return RECORD
+            elif verb.tag == "Redirect":
+                return httpx.URL(verb.text).path
+        self.outcome = "no_redirect"
+        return None
+
+    async def run(self, delay: float = 0.0):
+        await asyncio.sleep(delay)
+        # The call connects and the intro plays while the caller speaks
+        response = await self.client.post("/twilio_voice", data={"CallSid": self.call_sid})
+        response.raise_for_status()
+        await asyncio.sleep(self.play_seconds * self.time_scale)
+
+        for turn in range(self.turns):
+            start = time.perf_counter()
+            response = await self.client.post(
+                "/twilio_voice", data={"CallSid": self.call_sid, "RecordingUrl": self.recording_url}
+            )
+            path = await self.follow(response.text)
+            while path not in (None, RECORD):
+                self.polls += 1
+                response = await self.client.post(path)
+                path = await self.follow(response.text)
+            self.turn_times.append(time.perf_counter() - start)
+            if turn == 0 and self.first_audio is not None:
+                self.first_audio -= start
+                self.first_sound -= start
+            if path is None:
+                return
+        self.outcome = "done"
+
+
+def summarize(callers: list, wall_seconds: float) -> dict:
+    done = [c for c in callers if c.outcome == "done" and c.first_audio is not None]
+    if not done:
+        return {"calls": len(callers), "completed": 0, "errors": len(callers)}
+    served = [c for c in done if not c.degraded]
+    first_audio = [c.first_audio for c in done]
+    first_sound = [c.first_sound for c in done]
+    turns = [t for c in done for t in c.turn_times]
+    polls = [c.polls / len(c.turn_times) for c in done]
+    results = {
+        "calls": len(callers),
+        "completed": len(done),
+        "errors": len(callers) - len(done),
+        "degraded": len(done) - len(served),
+        "throughput_calls_per_s": round(len(done) / wall_seconds, 3),
+        "first_audio_p50_s": round(percentile(first_audio, 50), 3),
+        "first_audio_p95_s": round(percentile(first_audio, 95), 3),
+        "first_audio_p99_s": round(percentile(first_audio, 99), 3),
+        "first_sound_p50_s": round(percentile(first_sound, 50), 3),
+        "first_sound_p95_s": round(percentile(first_sound, 95), 3),
+        "turn_p50_s": round(percentile(turns, 50), 3),
+        "turn_p95_s": round(percentile(turns, 95), 3),
+        "turn_p99_s": round(percentile(turns, 99), 3),
+        "polls_per_turn_mean": round(statistics.mean(polls), 2),
+        "polls_per_turn_max": round(max(polls), 2),
+    }
+    if served:
+        served_first_audio = [c.first_audio for c in served]
+        results["served_first_audio_p50_s"] = round(percentile(served_first_audio, 50), 3)
+        results["served_first_audio_p99_s"] = round(percentile(served_first_audio, 99), 3)
+    return results
+
+
+def pin_stage(stage, max_concurrency: int):
+    """Sets a stage's limit (and worker threads) for the run, whatever the host's defaults."""
+    stage.max_concurrency = max_concurrency
+    stage._semaphore = asyncio.Semaphore(max_concurrency)
+    if stage.executor is not None:
+        stage.executor.shutdown(wait=False)
+        stage.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=stage.name)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Prints each metric next to its baseline; returns those more than `tolerance` worse."""
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        old, new = baseline["results"].get(name), results.get(name)
+        if old is None or new is None:
+            continue
+        if old == 0:
+            # No relative change from zero (e.g. no degraded calls): any rise counts in full
+            change = float(new > 0) - float(new < 0)
+        else:
+            change = (new - old) / old
+        worse = -change if higher_is_better else change
+        status = "REGRESSION" if worse > tolerance else "ok"
+        print(f"  {name:<24} {old:>9} -> {new:>9} ({change:+.1%}) {status}")
+        if worse > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+async def run_load_test(config: dict) -> dict:
+    logger.remove()  # Per-request log lines would dominate the timings
+    ollama = FakeOllamaServer(first_token_delay=config["ollama_first_token"], token_delay=config["ollama_token"]).start()
+    recordings = FakeRecordingServer(delay=config["recording_delay"]).start()
+    agent.llm_backend.base_url = ollama.url
+    agent.rag_retriever.set(FakeRetriever())
+    agent.embeddings_model.set(None)  # No query vectors, so the semantic cache never short-circuits the LLM
+    main.transcribe_audio = fake_transcribe(config["stt_delay"])
+    main.synthesize_cached_async = FakeTTS(base_delay=config["tts_delay"])
+    main.ack_clips[:] = ACK_CLIPS
+    if main.journal is not None:
+        # Journal the simulated turns (the cost is part of the test), but not into the real journal
+        main.journal = CallJournal(tempfile.mkdtemp(prefix="load-test-journal-"))
+    pin_stage(stt_stage, config["stt_workers"])
+    pin_stage(llm_stage, config["llm_concurrency"])
+    pin_stage(tts_stage, config["tts_concurrency"])
+    if config["admission"]:
+        main.admission.max_in_flight = config["admission_max_in_flight"]
+        main.admission.max_wait = config["admission_max_wait"]
+        main.admission.stage_budgets = dict(STAGE_BUDGETS)
+    else:
+        main.admission.max_in_flight = 0
+        main.admission.stage_budgets = {}
+
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://app", timeout=60) as client:
+            callers = [
+                CallSimulator(client, f"CA{i:04d}", recordings.recording_url(f"CA{i:04d}"),
+                              config["time_scale"], config["play_seconds"], config["turns"])
+                for i in range(config["calls"])
+            ]
+            start = time.perf_counter()
+            interval = 1 / config["arrival_rate"] if config["arrival_rate"] else 0.0
+            await asyncio.gather(*[caller.run(i * interval) for i, caller in enumerate(callers)])
+            wall_seconds = time.perf_counter() - start
+    finally:
+        ollama.stop()
+        recordings.stop()
+    return summarize(callers, wall_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20, help="Concurrent simulated calls")
+    parser.add_argument("--turns", type=int, default=1, help="Replies per call (up to CALL_MAX_TURNS)")
+    parser.add_argument("--arrival-rate", type=float, default=0.0, help="Calls starting per second (0 = all at once)")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="Admission cap on turns in flight (0 = no cap)")
+    parser.add_argument("--no-admission", action="store_true", help="Admit every turn: no cap and no stage budgets")
+    parser.add_argument("--max-wait", type=float, default=4.0, help="Longest wait for admission")
+    parser.add_argument("--stt-workers", type=int, default=1, help="STT stage threads")
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--tts-concurrency", type=int, default=8)
+    parser.add_argument("--stt-delay", type=float, default=0.5, help="Seconds per transcription")
+    parser.add_argument("--ollama-first-token", type=float, default=0.15)
+    parser.add_argument("--ollama-token", type=float, default=0.02, help="Seconds between streamed tokens")
+    parser.add_argument("--tts-delay", type=float, default=0.12, help="Base seconds per synthesized sentence")
+    parser.add_argument("--recording-delay", type=float, default=0.05, help="Recording download latency")
+    parser.add_argument("--time-scale", type=float, default=0.1, help="Real seconds per TwiML second")
+    parser.add_argument("--play-seconds", type=float, default=3.0, help="TwiML seconds each <Play> lasts")
+    parser.add_argument("--baseline", help="Baseline file (default: the one for the admission mode)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON only")
+    args = parser.parse_args()
+
+    config = {
+        "calls": args.calls,
+        "turns": args.turns,
+        "arrival_rate": args.arrival_rate,
+        "stt_delay": args.stt_delay,
+        "ollama_first_token": args.ollama_first_token,
+        "ollama_token": args.ollama_token,
+        "tts_delay": args.tts_delay,
+        "recording_delay": args.recording_delay,
+        "time_scale": args.time_scale,
+        "play_seconds": args.play_seconds,
+        "stt_workers": args.stt_workers,
+        "llm_concurrency": args.llm_concurrency,
+        "tts_concurrency": args.tts_concurrency,
+        "admission": not args.no_admission,
+        "admission_max_in_flight": args.max_in_flight,
+        "admission_max_wait": args.max_wait,
+    }
+    baseline_path = args.baseline or (NO_ADMISSION_BASELINE if args.no_admission else DEFAULT_BASELINE)
+    results = asyncio.run(run_load_test(config))
+
+    if args.json:
+        print(json.dumps({"config": config, "results": results}, indent=2))
+    else:
+        print(f"{results['completed']}/{results['calls']} calls completed "
+              f"({results['errors']} errors, {results.get('degraded', 0)} degraded)")
+        for name, value in results.items():
+            if name not in ("calls", "completed", "errors", "degraded"):
+                print(f"  {name:<24} {value:>9}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["config"] != config:
+            changed = sorted(k for k in config.keys() | baseline["config"].keys()
+                             if config.get(k) != baseline["config"].get(k))
+            print(f"Baseline {baseline_path} was recorded with different settings ({', '.join(changed)}); "
+                  "record one for these settings with --save-baseline.")
+            sys.exit(1)
+        print(f"Compared with baseline (tolerance {args.tolerance:.0%}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions or results["errors"] > baseline["results"].get("errors", 0):
+            print(f"Regressed: {', '.join(regressions) or 'errors'}")
+            sys.exit(1)
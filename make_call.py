@@ -1,3 +1,4 @@
+import argparse
 import os
 from twilio.rest import Client
 from app.config import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER, YOUR_PHONE_NUMBER, NGROK_URL
@@ -13,11 +14,41 @@ def make_call():
         call = client.calls.create(
             to=YOUR_PHONE_NUMBER,
             from_=TWILIO_PHONE_NUMBER,
-            url=f"{NGROK_URL}/twilio_voice"
+            url=f"{NGROK_URL}/twilio_voice",
+            status_callback=f"{NGROK_URL}/twilio_status",
         )
         print(f"Call initiated! SID: {call.sid}")
     except Exception as e:
         print(f"Failed to initiate call: {e}")
 
+def make_campaign_calls(args):
+    from app.dialer import run_campaign
+
+    if not all([TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER, NGROK_URL]):
+        print("Error: Missing configuration. Please check your .env file.")
+        return
+
+    outcomes = run_campaign(
+        args.customers,
+        log_path=args.log,
+        rate=args.rate,
+        max_in_flight=args.max_in_flight,
+        max_queue=args.max_queue,
+    )
+    print(f"Campaign finished. Outcomes: {outcomes}")
+
 if __name__ == "__main__":
-    make_call()
+    parser = argparse.ArgumentParser(description="Call YOUR_PHONE_NUMBER, or run a feedback campaign.")
+    subparsers = parser.add_subparsers(dest="command")
+    campaign = subparsers.add_parser("campaign", help="Dial every customer in a CSV or SQLite file (resumable).")
+    campaign.add_argument("customers", help="CSV file or SQLite database with a 'phone' column")
+    campaign.add_argument("--log", help="Campaign progress database (default: <customers>.campaign.db)")
+    campaign.add_argument("--rate", type=float, default=1.0, help="New calls per second")
+    campaign.add_argument("--max-in-flight", type=int, default=5, help="Max calls connected at once")
+    campaign.add_argument("--max-queue", type=int, default=10, help="Hold off dialing while more turns than this wait in the server pipeline")
+    args = parser.parse_args()
+
+    if args.command == "campaign":
+        make_campaign_calls(args)
+    else:
+        make_call()